@@ -0,0 +1,275 @@
+"""
+Lazily constructed, shared services for the API endpoints.
+
+Nothing is built at import time. Each service, and the client pool behind
+it, is created by the first request that depends on it and then reused by
+every later request, so a pod only loads the libraries and validates the
+settings of the subsystems it actually serves. Background services
+(extraction workers, bulk loaders) are started on first use and stopped by
+``services.shutdown()`` from the application lifespan.
+"""
+import asyncio
+import os
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from fastapi import HTTPException
+from ..core.config import settings
+
+if TYPE_CHECKING:
+    from ..services.answer_cache import AnswerCache
+    from ..services.bigquery_loader import BulkLoader, ReportSink
+    from ..services.comparison import ComparisonService
+    from ..services.embeddings import EmbeddingPipeline
+    from ..services.extraction import ExtractionService
+    from ..services.firestore import FirestoreService
+    from ..services.job_queue import JobQueue
+    from ..services.lexical_index import BM25Index
+    from ..services.query import QueryService
+    from ..services.report_store import ReportStore
+    from ..services.storage import AsyncStorageService
+
+
+class ServiceContainer:
+    """Process-wide registry of lazily built services."""
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+        self._started: List[Any] = []
+        self._start_locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the service called ``name``, building it on first use."""
+        if name not in self._instances:
+            self._instances[name] = factory()
+        return self._instances[name]
+
+    def _is_started(self, service: Any) -> bool:
+        return any(started is service for started in self._started)
+
+    async def get_started(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Like ``get``, but also awaits ``start()`` the first time.
+
+        Callers arriving while the service starts wait for that start
+        instead of getting a service that is not running yet. If ``start()``
+        raises, the instance is dropped (and never stopped), so the next
+        caller builds and starts a fresh one.
+        """
+        service = self.get(name, factory)
+        if self._is_started(service):
+            return service
+        async with self._start_locks.setdefault(name, asyncio.Lock()):
+            service = self.get(name, factory)
+            if not self._is_started(service):
+                try:
+                    await service.start()
+                except BaseException:
+                    self._instances.pop(name, None)
+                    raise
+                self._started.append(service)
+        return service
+
+    def spawn(self, coroutine):
+        """Run a background task that is cancelled on shutdown."""
+        self._tasks.append(asyncio.create_task(coroutine))
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Stop in reverse start order so consumers flush into loaders still running
+        for service in reversed(self._started):
+            await service.stop()
+        self._tasks, self._started, self._instances, self._start_locks = [], [], {}, {}
+
+
+services = ServiceContainer()
+
+
+async def get_storage_service() -> "AsyncStorageService":
+    def build():
+        from ..services.storage import AsyncStorageService, StorageService
+
+        settings.require("Cloud Storage", "GCP_STORAGE_BUCKET")
+        return AsyncStorageService(StorageService(settings.GCP_STORAGE_BUCKET))
+
+    return services.get("storage", build)
+
+
+async def get_firestore_service() -> "FirestoreService":
+    def build():
+        from ..services.firestore import FirestoreService
+
+        service = FirestoreService()
+        # Warm the dedup Bloom filter in the background; it is ignored until ready
+        services.spawn(service.warm_dedup_cache())
+        return service
+
+    # Started so status writes are batched, and stopped last so every buffered write is committed
+    return await services.get_started("firestore", build)
+
+
+async def get_embedding_pipeline() -> Optional["EmbeddingPipeline"]:
+    if not settings.EMBEDDING_ENABLED:
+        return None
+
+    def build():
+        from ..services.embeddings import EmbeddingCache, EmbeddingPipeline, create_embedding_backend
+        from ..services.vector_store import create_vector_store
+
+        settings.require("Embeddings", "PROCESSED_DATA_PATH")
+        return EmbeddingPipeline(
+            create_embedding_backend(),
+            create_vector_store(),
+            EmbeddingCache(os.path.join(settings.PROCESSED_DATA_PATH, "embedding_cache.sqlite"))
+        )
+
+    # Started so it is stopped after the extraction workers, flushing a local vector store
+    return await services.get_started("embedding_pipeline", build)
+
+
+async def get_answer_cache() -> Optional["AnswerCache"]:
+    if not (settings.EMBEDDING_ENABLED and settings.ANSWER_CACHE_ENABLED):
+        return None
+
+    def build():
+        from ..services.answer_cache import AnswerCache
+
+        return AnswerCache(
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_size=settings.ANSWER_CACHE_SIZE
+        )
+
+    return services.get("answer_cache", build)
+
+
+async def get_lexical_index() -> Optional["BM25Index"]:
+    if not (settings.EMBEDDING_ENABLED and settings.SEARCH_HYBRID_ENABLED):
+        return None
+
+    def build():
+        from ..services.lexical_index import BM25Index
+
+        settings.require("Lexical index", "PROCESSED_DATA_PATH")
+        return BM25Index(os.path.join(settings.PROCESSED_DATA_PATH, "lexical_index"))
+
+    return services.get("lexical_index", build)
+
+
+def _report_sink() -> Optional["ReportSink"]:
+    def build():
+        from ..services.bigquery_loader import create_report_sink
+
+        return create_report_sink()
+
+    return services.get("report_sink", build)
+
+
+async def _get_loader(table: str) -> Optional["BulkLoader"]:
+    sink = _report_sink()
+    if sink is None:
+        return None
+
+    def build():
+        from ..services.bigquery_loader import BulkLoader
+
+        return BulkLoader(sink, table)
+
+    return await services.get_started(f"loader:{table}", build)
+
+
+async def get_report_loader() -> Optional["BulkLoader"]:
+    return await _get_loader('financial_reports')
+
+
+async def get_comparison_loader() -> Optional["BulkLoader"]:
+    return await _get_loader('report_comparisons')
+
+
+async def get_job_queue() -> "JobQueue":
+    def build():
+        from ..services.job_queue import JobQueue
+
+        path = settings.JOB_QUEUE_PATH
+        if not path:
+            settings.require("Job queue", "PROCESSED_DATA_PATH")
+            path = os.path.join(settings.PROCESSED_DATA_PATH, "jobs.sqlite")
+        return JobQueue(path)
+
+    return services.get("job_queue", build)
+
+
+async def get_report_store() -> "ReportStore":
+    def build():
+        from ..services.report_store import ReportStore
+
+        settings.require("Report store", "PROCESSED_DATA_PATH")
+        return ReportStore(
+            settings.PROCESSED_DATA_PATH,
+            max_bytes=settings.REPORT_STORE_MAX_BYTES,
+            max_open=settings.REPORT_STORE_MAX_OPEN
+        )
+
+    return services.get("report_store", build)
+
+
+async def get_extraction_service() -> "ExtractionService":
+    storage_service = await get_storage_service()
+    firestore_service = await get_firestore_service()
+    job_queue = await get_job_queue()
+    report_store = await get_report_store()
+    embedding_pipeline = await get_embedding_pipeline()
+    report_loader = await get_report_loader()
+    answer_cache = await get_answer_cache()
+    lexical_index = await get_lexical_index()
+
+    def build():
+        from ..services.extraction import ExtractionService
+
+        return ExtractionService(
+            storage_service.sync,
+            firestore_service,
+            job_queue,
+            report_store,
+            embedding_pipeline,
+            report_loader,
+            answer_cache,
+            lexical_index
+        )
+
+    return await services.get_started("extraction", build)
+
+
+async def get_query_service() -> "QueryService":
+    embedding_pipeline = await get_embedding_pipeline()
+    if embedding_pipeline is None:
+        raise HTTPException(status_code=503, detail="Embeddings are disabled")
+    answer_cache = await get_answer_cache()
+    lexical_index = await get_lexical_index()
+
+    def build():
+        from ..services.query import OpenAIChatBackend, QueryService
+        from ..services.search import HybridSearch
+
+        return QueryService(
+            embedding_pipeline.backend,
+            embedding_pipeline.index,
+            OpenAIChatBackend(),
+            answer_cache,
+            hybrid_search=HybridSearch(embedding_pipeline.index, lexical_index) if lexical_index is not None else None
+        )
+
+    return services.get("query", build)
+
+
+async def get_comparison_service() -> "ComparisonService":
+    report_store = await get_report_store()
+    comparison_loader = await get_comparison_loader()
+
+    def build():
+        from ..services.comparison import ComparisonService
+
+        return ComparisonService(report_store, comparison_loader)
+
+    return services.get("comparison", build)
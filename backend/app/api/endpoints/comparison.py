@@ -0,0 +1,66 @@
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, Depends, HTTPException
+from ...core.config import settings
+from ...models.comparison import ComparisonRequest, ComparisonResponse, LineItemChange, ReportComparison
+from ..deps import get_comparison_service, get_extraction_service
+
+if TYPE_CHECKING:
+    from ...services.comparison import ComparisonService
+    from ...services.extraction import ExtractionService
+
+router = APIRouter()
+
+
+@router.post("/", response_model=ComparisonResponse)
+async def compare_reports(
+    request: ComparisonRequest,
+    comparison_service: "ComparisonService" = Depends(get_comparison_service),
+    extraction_service: "ExtractionService" = Depends(get_extraction_service)
+):
+    """
+    Compare a base report against one or more versions of it.
+
+    A processed report that was evicted from the report store is queued
+    for extraction again and answered with 503 and Retry-After.
+    """
+    if not request.compare_report_ids:
+        raise HTTPException(status_code=400, detail="No reports to compare against")
+    threshold = (
+        settings.COMPARISON_MATERIALITY_THRESHOLD
+        if request.materiality_threshold is None else request.materiality_threshold
+    )
+    try:
+        differences = await comparison_service.compare(
+            request.base_report_id,
+            request.compare_report_ids,
+            threshold
+        )
+    except FileNotFoundError as e:
+        from ...services.report_store import ReportNotFoundError
+
+        if isinstance(e, ReportNotFoundError) and await extraction_service.restore(e.file_hash):
+            raise HTTPException(
+                status_code=503,
+                detail=f"Report {e.file_hash} was evicted and is being extracted again",
+                headers={"Retry-After": str(settings.JOB_QUEUE_RETRY_AFTER_SECONDS)}
+            )
+        raise HTTPException(status_code=404, detail=str(e))
+
+    comparisons = []
+    for compare_report_id in request.compare_report_ids:
+        version = differences[differences["compare_report_id"] == compare_report_id]
+        material = version[version["material"]]
+        material = material.astype(object).where(material.notna(), None)
+        comparisons.append(ReportComparison(
+            compare_report_id=compare_report_id,
+            line_items=len(version),
+            changed=int((version["change_type"] != "unchanged").sum()),
+            material_changes=[LineItemChange(**row) for row in material.drop(
+                columns=["compare_report_id", "material"]
+            ).to_dict(orient="records")]
+        ))
+    return ComparisonResponse(
+        base_report_id=request.base_report_id,
+        materiality_threshold=threshold,
+        comparisons=comparisons
+    )
@@ -1,62 +1,571 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+import os
+import zipfile
+from dataclasses import dataclass
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request
 from ...core.config import settings
-from ...services.storage import StorageService
-from ...models.pdf import PDFResponse
-from datetime import datetime
-from ...services.firestore import FirestoreService
+from ...services.firestore import DuplicateFileError, FirestoreService
+from ...services.job_queue import Lane, QueueSaturatedError
+from ...services.storage import AsyncStorageService, DuplicateObjectError, StagedUpload
+from ...models.pdf import (
+    PDFBatchItem, PDFBatchResponse, PDFFileInfo, PDFFileList, PDFResponse, PDFStatus, ProcessingStatus
+)
+from datetime import date, datetime
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Optional, Tuple
+from ...utils.concurrency import run_blocking
+from ...utils.metrics import UPLOAD_OUTCOMES, track
+from ...utils.streaming import FileTooLargeError, RequestBodyReader, UploadValidationError
+from ..deps import get_extraction_service, get_firestore_service, get_storage_service
+
+if TYPE_CHECKING:
+    from ...services.extraction import ExtractionService
 
 router = APIRouter()
-storage_service = StorageService(settings.GCP_STORAGE_BUCKET)
-firestore_service = FirestoreService()
 
 @router.post("/upload/", response_model=PDFResponse)
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(
+    file: UploadFile = File(...),
+    company_name: Optional[str] = Form(None),
+    report_date: Optional[date] = Form(None),
+    storage_service: AsyncStorageService = Depends(get_storage_service),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+    extraction_service: "ExtractionService" = Depends(get_extraction_service)
+):
     """
     Upload a PDF file for processing.
-    
+
     - Validates file type
-    - Computes file hash
+    - Refuses work with 429 while the extraction queue is saturated
+    - Hashes, validates and uploads the file in a single streaming pass
     - Stores in Google Cloud Storage
     - Returns signed URL for access
+
+    The multipart body is parsed (and spooled) before this runs; use
+    ``/upload/stream`` to send the PDF as the raw request body instead.
+    """
+    return await _upload(
+        file.file, file.filename, file.content_type, _document_fields(company_name, report_date),
+        storage_service, firestore_service, extraction_service,
+        size=file.size
+    )
+
+
+@router.post("/upload/stream", response_model=PDFResponse)
+async def upload_pdf_stream(
+    request: Request,
+    file_name: str = Query(..., description="Name of the uploaded file"),
+    company_name: Optional[str] = Query(None),
+    report_date: Optional[date] = Query(None),
+    storage_service: AsyncStorageService = Depends(get_storage_service),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+    extraction_service: "ExtractionService" = Depends(get_extraction_service)
+):
     """
+    Upload a PDF sent as the raw request body (``Content-Type: application/pdf``).
+
+    The body is hashed, validated and pushed to storage as it arrives, so
+    it is never spooled to memory or disk; otherwise the same as ``/upload/``.
+    """
+    content_length = request.headers.get("content-length")
+    reader = RequestBodyReader(request.stream(), asyncio.get_running_loop())
+    return await _upload(
+        reader, file_name, request.headers.get("content-type") or "application/pdf",
+        _document_fields(company_name, report_date),
+        storage_service, firestore_service, extraction_service,
+        size=int(content_length) if content_length and content_length.isdigit() else None
+    )
+
+
+async def _upload(
+    source: BinaryIO,
+    file_name: str,
+    content_type: Optional[str],
+    document: Dict[str, str],
+    storage_service: AsyncStorageService,
+    firestore_service: FirestoreService,
+    extraction_service: "ExtractionService",
+    size: Optional[int] = None
+) -> PDFResponse:
     # Validate file type
-    if not file.filename.lower().endswith('.pdf'):
+    if not file_name.lower().endswith('.pdf'):
+        UPLOAD_OUTCOMES.labels("rejected").inc()
         raise HTTPException(status_code=400, detail="File must be a PDF")
-    
+    if size is not None and size > settings.MAX_UPLOAD_SIZE:
+        UPLOAD_OUTCOMES.labels("rejected").inc()
+        raise HTTPException(status_code=413, detail="File too large")
+    await _check_capacity(extraction_service, Lane.INTERACTIVE)
+
+    # Each stage is timed and fails with its own error; client errors stay 4xx
     try:
-        # Compute hash first
-        file_hash = storage_service.compute_file_hash(file.file)
-        
-        # Check for duplicates
-        if await firestore_service.check_duplicate(file_hash):
-            raise HTTPException(
-                status_code=409,
-                detail="File already exists"
+        # Hash, validate and stream to a staging object in one read
+        with track("upload", "stage_file") as span:
+            staged = await storage_service.stage_file(source, size=size)
+            span.bytes = staged.file_size
+    except FileTooLargeError as e:
+        UPLOAD_OUTCOMES.labels("rejected").inc()
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadValidationError as e:
+        UPLOAD_OUTCOMES.labels("rejected").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        UPLOAD_OUTCOMES.labels("failed").inc()
+        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+
+    try:
+        with track("upload", "duplicate_check"):
+            duplicate = await firestore_service.check_duplicate(staged.file_hash)
+    except Exception as e:
+        await _discard_quietly(storage_service, staged)
+        UPLOAD_OUTCOMES.labels("failed").inc()
+        raise HTTPException(status_code=500, detail=f"Duplicate check failed: {e}")
+    if duplicate:
+        await _discard_quietly(storage_service, staged)
+        await _reject_duplicate(firestore_service, staged.file_hash, file_name)
+
+    try:
+        # Move the staged object to its content-addressed path (server-side copy)
+        with track("upload", "commit") as span:
+            try:
+                storage_path = await storage_service.commit_staged(staged, file_name)
+            except DuplicateObjectError as e:
+                # Same content is already stored, e.g. by a concurrent upload;
+                # the metadata write below decides which upload is recorded
+                storage_path = e.storage_path
+            span.bytes = staged.file_size
+        with track("upload", "sign_url"):
+            signed_url = await storage_service.generate_signed_url(storage_path, download_name=file_name)
+    except Exception as e:
+        await _discard_quietly(storage_service, staged)
+        UPLOAD_OUTCOMES.labels("failed").inc()
+        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+
+    try:
+        with track("upload", "metadata_write"):
+            await firestore_service.store_file_metadata(
+                staged.file_hash,
+                {
+                    'file_name': file_name,
+                    'aliases': [file_name],
+                    'file_size': staged.file_size,
+                    'storage_path': storage_path,
+                    'content_type': content_type,
+                    'status': ProcessingStatus.QUEUED.value,
+                    'status_message': "Waiting for extraction",
+                    **document
+                }
             )
-        
-        # Upload file to GCS
-        storage_path, _ = storage_service.upload_file(file.file, file.filename)
-        signed_url = storage_service.generate_signed_url(storage_path)
-        
-        # Store metadata in Firestore
-        await firestore_service.store_file_metadata(
-            file_hash,
-            {
-                'file_name': file.filename,
-                'file_size': file.size,
-                'storage_path': storage_path,
-                'content_type': file.content_type
-            }
+    except DuplicateFileError:
+        await _reject_duplicate(firestore_service, staged.file_hash, file_name)
+    except Exception as e:
+        # The object stays in storage; a re-upload of the same content records it without a copy
+        UPLOAD_OUTCOMES.labels("failed").inc()
+        raise HTTPException(status_code=500, detail=f"Metadata write failed: {e}")
+
+    try:
+        await extraction_service.enqueue(staged.file_hash, storage_path)
+    except Exception as e:
+        await _record_unqueued(firestore_service, [staged.file_hash], e)
+        UPLOAD_OUTCOMES.labels("failed").inc()
+        raise HTTPException(status_code=503, detail=f"Could not queue extraction: {e}")
+    UPLOAD_OUTCOMES.labels("uploaded").inc()
+    return PDFResponse(
+        file_name=file_name,
+        file_hash=staged.file_hash,
+        upload_timestamp=datetime.now(),
+        file_size=staged.file_size,
+        storage_path=storage_path,
+        signed_url=signed_url
+    )
+
+
+def _document_fields(company_name: Optional[str], report_date: Optional[date]) -> Dict[str, str]:
+    """Document-level metadata given at upload; copied into every chunk so searches can filter on it."""
+    fields = {}
+    if company_name:
+        fields['company_name'] = company_name
+    if report_date:
+        fields['report_date'] = report_date.isoformat()
+    return fields
+
+
+async def _check_capacity(extraction_service: "ExtractionService", lane: Lane):
+    """Fail fast, before anything is stored, when extraction cannot take more work."""
+    try:
+        await extraction_service.check_capacity(lane)
+    except QueueSaturatedError as e:
+        UPLOAD_OUTCOMES.labels("throttled").inc()
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(settings.JOB_QUEUE_RETRY_AFTER_SECONDS)}
         )
-        
-        return PDFResponse(
-            file_name=file.filename,
-            file_hash=file_hash,
-            upload_timestamp=datetime.now(),
-            file_size=file.size,
-            storage_path=storage_path,
-            signed_url=signed_url
+    except Exception as e:
+        UPLOAD_OUTCOMES.labels("failed").inc()
+        raise HTTPException(status_code=503, detail=f"Job queue unavailable: {e}")
+
+
+async def _record_unqueued(firestore_service: FirestoreService, file_hashes: List[str], error: Exception):
+    # The files are stored and recorded, so a re-upload would be a duplicate;
+    # mark them failed so a backfill picks them up
+    await asyncio.gather(
+        *(
+            firestore_service.update_processing_status(
+                file_hash, ProcessingStatus.FAILED, f"Could not queue extraction: {error}"
+            )
+            for file_hash in file_hashes
+        ),
+        return_exceptions=True
+    )
+
+
+async def _discard_quietly(storage_service: AsyncStorageService, staged: StagedUpload):
+    try:
+        await storage_service.discard_staged(staged)
+    except Exception:
+        pass  # Orphaned staging objects are harmless
+
+
+async def _reject_duplicate(firestore_service: FirestoreService, file_hash: str, file_name: str):
+    """Record ``file_name`` as another name of an existing file, then fail with 409."""
+    try:
+        await firestore_service.add_aliases({file_hash: [file_name]})
+    except Exception:
+        pass  # The alias manifest is best-effort
+    UPLOAD_OUTCOMES.labels("duplicate").inc()
+    raise HTTPException(status_code=409, detail="File already exists")
+
+@dataclass
+class _BatchEntry:
+    file_name: str
+    stream: Optional[BinaryIO] = None
+    size: Optional[int] = None  # Known up front for zip members, whose streams are costly to seek
+    content_type: Optional[str] = None
+    staged: Optional[StagedUpload] = None
+    storage_path: Optional[str] = None
+    signed_url: Optional[str] = None
+    duplicate: bool = False
+    error: Optional[str] = None
+
+
+def _expand_batch_files(files: List[UploadFile]) -> Tuple[List[_BatchEntry], List[zipfile.ZipFile]]:
+    """Turn uploaded PDFs and zip archives into one entry per PDF."""
+    entries = []
+    archives = []
+    for file in files:
+        name = file.filename or ""
+        if name.lower().endswith('.pdf'):
+            entries.append(_BatchEntry(name, stream=file.file, content_type=file.content_type))
+            continue
+        if not name.lower().endswith('.zip'):
+            entries.append(_BatchEntry(name, error="File must be a PDF or zip archive"))
+            continue
+
+        try:
+            archive = zipfile.ZipFile(file.file)
+        except zipfile.BadZipFile:
+            entries.append(_BatchEntry(name, error="Invalid zip archive"))
+            continue
+        archives.append(archive)
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                continue
+            member_name = os.path.basename(info.filename)
+            if not member_name.lower().endswith('.pdf'):
+                entries.append(_BatchEntry(member_name, error="File must be a PDF"))
+            elif info.file_size > settings.MAX_UPLOAD_SIZE:
+                entries.append(_BatchEntry(member_name, error="File too large"))
+            else:
+                entries.append(_BatchEntry(
+                    member_name,
+                    stream=archive.open(info),
+                    size=info.file_size,
+                    content_type="application/pdf"
+                ))
+    return entries, archives
+
+
+def _close_batch(entries: List[_BatchEntry], archives: List[zipfile.ZipFile]):
+    for entry in entries:
+        if isinstance(entry.stream, zipfile.ZipExtFile):
+            entry.stream.close()
+    for archive in archives:
+        archive.close()
+
+
+@router.post("/upload/batch", response_model=PDFBatchResponse)
+async def upload_pdf_batch(
+    files: List[UploadFile] = File(...),
+    company_name: Optional[str] = Form(None, description="Recorded for every file of the batch"),
+    report_date: Optional[date] = Form(None, description="Recorded for every file of the batch"),
+    storage_service: AsyncStorageService = Depends(get_storage_service),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+    extraction_service: "ExtractionService" = Depends(get_extraction_service)
+):
+    """
+    Upload many PDFs, or zip archives of PDFs, in one request.
+
+    - Stages files concurrently, up to BATCH_UPLOAD_CONCURRENCY at a time
+    - Checks all hashes for duplicates in one batched lookup
+    - Stores all metadata in batched writes
+    - Queues extraction in the bulk lane, behind single uploads
+    - Reports success, duplicates and failures per file
+    """
+    await _check_capacity(extraction_service, Lane.BULK)
+    entries, archives = await run_blocking(_expand_batch_files, files)
+    try:
+        if len(entries) > settings.BATCH_MAX_FILES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch exceeds {settings.BATCH_MAX_FILES} files"
+            )
+        await _process_batch(
+            entries, storage_service, firestore_service, extraction_service, _document_fields(company_name, report_date)
         )
-        
+    finally:
+        await run_blocking(_close_batch, entries, archives)
+
+    items = []
+    for entry in entries:
+        file_hash = entry.staged.file_hash if entry.staged else None
+        if entry.error:
+            status = PDFStatus(file_hash=file_hash, status="failed", message=entry.error)
+        elif entry.duplicate:
+            status = PDFStatus(file_hash=file_hash, status="duplicate", message="File already exists")
+        else:
+            status = PDFStatus(file_hash=file_hash, status="uploaded", message="File uploaded")
+        result = None
+        if status.status == "uploaded":
+            result = PDFResponse(
+                file_name=entry.file_name,
+                file_hash=file_hash,
+                upload_timestamp=datetime.now(),
+                file_size=entry.staged.file_size,
+                storage_path=entry.storage_path,
+                signed_url=entry.signed_url
+            )
+        items.append(PDFBatchItem(file_name=entry.file_name, status=status, result=result))
+        UPLOAD_OUTCOMES.labels(status.status).inc()
+
+    return PDFBatchResponse(
+        total=len(items),
+        uploaded=sum(item.status.status == "uploaded" for item in items),
+        duplicates=sum(item.status.status == "duplicate" for item in items),
+        failed=sum(item.status.status == "failed" for item in items),
+        items=items
+    )
+
+
+async def _process_batch(
+    entries: List[_BatchEntry],
+    storage_service: AsyncStorageService,
+    firestore_service: FirestoreService,
+    extraction_service: "ExtractionService",
+    document: Optional[Dict[str, str]] = None
+):
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+
+    async def stage(entry: _BatchEntry):
+        async with semaphore:
+            try:
+                with track("batch_upload", "stage_file") as span:
+                    entry.staged = await storage_service.stage_file(entry.stream, size=entry.size)
+                    span.bytes = entry.staged.file_size
+            except UploadValidationError as e:
+                entry.error = str(e)
+            except Exception as e:
+                entry.error = f"Upload failed: {e}"
+
+    async def commit(entry: _BatchEntry):
+        async with semaphore:
+            try:
+                with track("batch_upload", "commit") as span:
+                    try:
+                        entry.storage_path = await storage_service.commit_staged(entry.staged, entry.file_name)
+                    except DuplicateObjectError as e:
+                        # Stored but not recorded (e.g. an earlier metadata write failed)
+                        entry.storage_path = e.storage_path
+                    span.bytes = entry.staged.file_size
+                with track("batch_upload", "sign_url"):
+                    entry.signed_url = await storage_service.generate_signed_url(
+                        entry.storage_path, download_name=entry.file_name
+                    )
+            except Exception as e:
+                entry.error = f"Upload failed: {e}"
+
+    async def discard(entry: _BatchEntry):
+        async with semaphore:
+            try:
+                await storage_service.discard_staged(entry.staged)
+            except Exception:
+                pass  # Orphaned staging objects are harmless
+
+    await asyncio.gather(*(stage(entry) for entry in entries if not entry.error))
+    staged = [entry for entry in entries if entry.staged and not entry.error]
+
+    # One batched existence lookup for the whole batch
+    try:
+        with track("batch_upload", "duplicate_check"):
+            existing = await firestore_service.check_duplicates(
+                entry.staged.file_hash for entry in staged
+            )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        for entry in staged:
+            entry.error = f"Duplicate check failed: {e}"
+        await asyncio.gather(*(discard(entry) for entry in staged))
+        return
+
+    # Duplicates include repeats within the batch itself
+    seen = set(existing)
+    to_commit = []
+    for entry in staged:
+        if entry.staged.file_hash in seen:
+            entry.duplicate = True
+        else:
+            seen.add(entry.staged.file_hash)
+            to_commit.append(entry)
+    await asyncio.gather(
+        *(discard(entry) for entry in staged if entry.duplicate),
+        *(commit(entry) for entry in to_commit)
+    )
+
+    # One batched metadata write for everything that landed in storage
+    committed = [entry for entry in to_commit if not entry.error]
+    recorded = set(existing)
+    if committed:
+        try:
+            with track("batch_upload", "metadata_write"):
+                duplicates = await firestore_service.store_many_file_metadata({
+                    entry.staged.file_hash: {
+                        'file_name': entry.file_name,
+                        'aliases': [entry.file_name],
+                        'file_size': entry.staged.file_size,
+                        'storage_path': entry.storage_path,
+                        'content_type': entry.content_type,
+                        'status': ProcessingStatus.QUEUED.value,
+                        'status_message': "Waiting for extraction",
+                        **(document or {})
+                    }
+                    for entry in committed
+                })
+        except Exception as e:
+            for entry in committed:
+                entry.error = f"Metadata write failed: {e}"
+        else:
+            recorded.update(entry.staged.file_hash for entry in committed)
+            # Recorded by a concurrent upload since the duplicate check; that upload queued it
+            for entry in committed:
+                entry.duplicate = entry.staged.file_hash in duplicates
+            created = [entry for entry in committed if not entry.duplicate]
+            try:
+                if created:
+                    await extraction_service.enqueue_many(
+                        {entry.staged.file_hash: entry.storage_path for entry in created}, Lane.BULK
+                    )
+            except Exception as e:
+                await _record_unqueued(firestore_service, [entry.staged.file_hash for entry in created], e)
+                for entry in created:
+                    entry.error = f"Could not queue extraction: {e}"
+
+    # Add the names of duplicates to the alias manifest of the recorded file
+    aliases: Dict[str, List[str]] = {}
+    for entry in staged:
+        if entry.duplicate and entry.staged.file_hash in recorded:
+            aliases.setdefault(entry.staged.file_hash, []).append(entry.file_name)
+    if aliases:
+        try:
+            await firestore_service.add_aliases(aliases)
+        except Exception:
+            pass  # The alias manifest is best-effort
+
+
+@router.get("/status/{file_hash}", response_model=PDFStatus)
+async def get_pdf_status(
+    file_hash: str,
+    firestore_service: FirestoreService = Depends(get_firestore_service)
+):
+    """Return the extraction status of an uploaded file."""
+    metadata = await firestore_service.get_file_metadata(file_hash)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return PDFStatus(
+        file_hash=file_hash,
+        status=metadata.get('status', "uploaded"),
+        message=metadata.get('status_message', ""),
+        page_count=metadata.get('page_count'),
+        ocr_pages=metadata.get('ocr_pages'),
+        ocr_failed_pages=metadata.get('ocr_failed_pages') or []
+    )
+
+
+@router.get("/files", response_model=PDFFileList)
+async def list_pdfs(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    name: Optional[str] = Query(None, description="Only files uploaded under this name"),
+    status: Optional[ProcessingStatus] = None,
+    company: Optional[str] = Query(None, description="Only files of this company"),
+    created_after: Optional[datetime] = Query(None, description="Uploaded at or after this time"),
+    created_before: Optional[datetime] = Query(None, description="Uploaded before this time"),
+    firestore_service: FirestoreService = Depends(get_firestore_service)
+):
+    """
+    List uploaded files, newest first, from the Firestore index.
+
+    Filters can be combined. Pass ``next_cursor`` from a response as
+    ``cursor`` to get the next page of the same query; pages are read with
+    an indexed cursor, never an offset, and the bucket is never listed, so
+    the cost is independent of the number of files.
+    """
+    try:
+        files, next_cursor = await firestore_service.list_files(
+            limit,
+            cursor,
+            name,
+            status=status.value if status else None,
+            company_name=company,
+            created_after=created_after,
+            created_before=created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PDFFileList(
+        items=[
+            PDFFileInfo(
+                file_hash=metadata['file_hash'],
+                file_name=metadata.get('file_name'),
+                aliases=metadata.get('aliases', []),
+                file_size=metadata.get('file_size'),
+                storage_path=metadata.get('storage_path'),
+                status=metadata.get('status'),
+                company_name=metadata.get('company_name'),
+                page_count=metadata.get('page_count'),
+                created_at=metadata.get('created_at')
+            )
+            for metadata in files
+        ],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/queue/stats")
+async def queue_stats(extraction_service: "ExtractionService" = Depends(get_extraction_service)):
+    """Queued, running and failed jobs, and the oldest waiting job's age, per stage and lane."""
+    return await extraction_service.scheduler.stats()
+
+
+@router.get("/dedup/stats")
+async def dedup_stats(firestore_service: FirestoreService = Depends(get_firestore_service)):
+    """Hit/miss counters of the local duplicate-detection cache."""
+    return firestore_service.dedup_cache.stats()
+
+@router.get("/metadata-writes/stats")
+async def metadata_write_stats(firestore_service: FirestoreService = Depends(get_firestore_service)):
+    """Pending, buffered and committed writes of the metadata write-behind buffer."""
+    if firestore_service.write_buffer is None:
+        raise HTTPException(status_code=404, detail="Metadata write buffering is disabled")
+    return firestore_service.write_buffer.stats()
+
+@router.get("/signed-urls/stats")
+async def signed_url_stats(storage_service: AsyncStorageService = Depends(get_storage_service)):
+    """Hit/miss counters and signing time saved by the signed URL cache."""
+    return storage_service.sync.signed_url_cache.stats()
@@ -0,0 +1,75 @@
+import json
+import logging
+from typing import TYPE_CHECKING, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from ...models.query import QueryRequest, SearchRequest
+from ..deps import get_answer_cache, get_query_service
+
+if TYPE_CHECKING:
+    from ...services.answer_cache import AnswerCache
+    from ...services.query import QueryService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("")
+async def query(request: QueryRequest, query_service: "QueryService" = Depends(get_query_service)):
+    """
+    Answer a question from the indexed reports, streamed as server-sent events.
+
+    Emits a ``sources`` event with the retrieved chunks, ``token`` events as
+    the answer is generated and a final ``done`` event (or ``error``).
+    """
+    async def events():
+        try:
+            async for event, data in query_service.answer(
+                request.question,
+                top_k=request.top_k,
+                file_hashes=request.file_hashes,
+                company_name=request.company_name,
+                report_date=request.report_date
+            ):
+                yield _sse(event, data)
+        except Exception as e:
+            # Headers are already sent, so report the failure in-stream
+            logger.exception("Query failed")
+            yield _sse("error", {'detail': str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/search")
+async def search(request: SearchRequest, query_service: "QueryService" = Depends(get_query_service)):
+    """
+    Retrieve the chunks for a query without generating an answer.
+
+    With hybrid search enabled, vector and BM25 results are fused by
+    reciprocal rank, so ``score`` is the fused score.
+    """
+    sources = await query_service.search(
+        request.query,
+        top_k=request.top_k,
+        file_hashes=request.file_hashes,
+        company_name=request.company_name,
+        report_date=request.report_date
+    )
+    return {'sources': sources}
+
+
+@router.get("/cache/stats")
+async def answer_cache_stats(answer_cache: Optional["AnswerCache"] = Depends(get_answer_cache)):
+    """Hit rate and latency saved by the semantic answer cache."""
+    if answer_cache is None:
+        raise HTTPException(status_code=404, detail="Answer cache is disabled")
+    return answer_cache.stats()
@@ -1,5 +1,11 @@
+import os
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
+
+class ConfigurationError(RuntimeError):
+    """A subsystem was used without the settings it needs."""
+
 
 class Settings(BaseSettings):
     # API Settings
@@ -10,25 +16,143 @@ class Settings(BaseSettings):
     DEBUG_MODE: bool = False
     
     # Storage Paths
-    PDF_STORAGE_PATH: str
-    PROCESSED_DATA_PATH: str
+    PDF_STORAGE_PATH: Optional[str] = None
+    PROCESSED_DATA_PATH: Optional[str] = None
+    
+    # Uploads
+    UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # Must be a multiple of 256 KB
+    MAX_UPLOAD_SIZE: int = 1024 * 1024 * 1024
+    COMPOSITE_UPLOAD_THRESHOLD: int = 128 * 1024 * 1024  # Larger files are uploaded in parallel parts
+    COMPOSITE_UPLOAD_PART_SIZE: int = 32 * 1024 * 1024
+    COMPOSITE_UPLOAD_PARALLELISM: int = 8  # Parts in flight per upload
+    COMPOSITE_UPLOAD_RETRIES: int = 5  # Attempts per part
+    UPLOAD_MAX_IN_FLIGHT_BYTES: int = 2 * 1024 * 1024 * 1024  # Upload request bodies admitted at once, per process
+    UPLOAD_MAX_BATCH_SIZE: int = 2 * 1024 * 1024 * 1024  # Largest batch upload request body; <= the in-flight budget
+    UPLOAD_RETRY_AFTER_SECONDS: int = 5  # Retry-After sent with 503 responses over the in-flight budget
+    
+    # Concurrency
+    IO_MAX_WORKERS: int = 32  # Threads available for blocking GCS calls
+    BATCH_UPLOAD_CONCURRENCY: int = 8  # Files processed at once per batch request
+    BATCH_MAX_FILES: int = 500
+    
+    # Extraction
+    EXTRACTION_WORKERS: int = os.cpu_count() or 2  # Parser processes
+    EXTRACTION_CONCURRENT_DOCUMENTS: int = 2
+    EXTRACTION_PAGES_PER_TASK: int = 8
+    
+    # OCR of scanned pages (requires pytesseract and the tesseract binary)
+    OCR_ENABLED: bool = True
+    OCR_MIN_TEXT_CHARS: int = 20  # Pages with images and less text than this are OCR'd
+    OCR_LANGUAGE: str = "eng"
+    OCR_DPI: int = 300
+    OCR_PAGE_TIMEOUT_SECONDS: float = 120
+    
+    # Processed report store
+    REPORT_STORE_MAX_BYTES: int = 20 * 1024 * 1024 * 1024  # LRU cap on reports and page_cache/; 0 for none
+    REPORT_STORE_MAX_OPEN: int = 64  # Memory-mapped reports kept open
+    
+    # Job queue
+    JOB_QUEUE_PATH: Optional[str] = None  # Defaults to PROCESSED_DATA_PATH/jobs.sqlite
+    JOB_QUEUE_MAX_DEPTH: int = 1000  # Waiting jobs per stage and lane before new work is refused
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 5  # Backoff before the first retry, doubled per attempt
+    JOB_RETRY_MAX_SECONDS: float = 600
+    JOB_LEASE_SECONDS: float = 300  # Renewed while a job runs; jobs of dead workers are reclaimed after it
+    JOB_POLL_SECONDS: float = 1
+    JOB_QUEUE_RETRY_AFTER_SECONDS: int = 30  # Retry-After sent with 429 responses
+    
+    # Backfill (scripts/backfill.py)
+    BACKFILL_PAGE_SIZE: int = 1000  # Objects per listing page (the GCS maximum)
+    BACKFILL_MAX_IN_FLIGHT_BYTES: int = 512 * 1024 * 1024  # Legacy objects being hashed at once
+    BACKFILL_CONCURRENT_DOWNLOADS: int = 16
+    
+    # Embeddings
+    EMBEDDING_ENABLED: bool = False
+    EMBEDDING_BACKEND: str = "openai"  # "openai" or "sentence-transformers"
+    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    EMBEDDING_CHUNK_SIZE: int = 2000  # Characters
+    EMBEDDING_CHUNK_OVERLAP: int = 200
+    EMBEDDING_BATCH_SIZE: int = 256
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_CONCURRENT_DOCUMENTS: int = 2
+    VECTOR_STORE_BACKEND: str = "pinecone"  # "pinecone" or "local"
+    VECTOR_STORE_QUANTIZE: bool = False  # int8 storage for the local backend
+    VECTOR_DIMENSION: int = 1536
+    PINECONE_UPSERT_BATCH_SIZE: int = 100
+    PINECONE_UPSERT_CONCURRENCY: int = 4
+    
+    # Structured data loading
+    LOADER_SINK: str = "none"  # "bigquery", "sqlite" or "none"
+    LOADER_SOURCE_FORMAT: str = "NEWLINE_DELIMITED_JSON"  # Or "PARQUET"
+    LOADER_BATCH_ROWS: int = 500
+    LOADER_FLUSH_SECONDS: float = 30
+    
+    # Question answering
+    QUERY_CHAT_MODEL: str = "gpt-4o-mini"
+    QUERY_TOP_K: int = 8
+    QUERY_MAX_CONTEXT_CHARS: int = 16_000
+    SEARCH_HYBRID_ENABLED: bool = True  # Fuse BM25 over the extracted chunks with vector results
+    SEARCH_RRF_K: int = 60
+    SEARCH_PREFILTER_CANDIDATES: int = 0  # >0: score only the BM25 top-N vectors (local store only)
+    LEXICAL_INDEX_MERGE_ROWS: int = 50_000  # Pending chunks merged into the on-disk postings
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # Minimum cosine similarity between questions
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
+    ANSWER_CACHE_SIZE: int = 10_000
+    
+    # Report comparison
+    COMPARISON_MATERIALITY_THRESHOLD: float = 1_000  # Absolute change, in the report's own units
+    
+    # Firestore metadata writes
+    FIRESTORE_WRITE_BEHIND: bool = True  # Coalesce status updates into batch commits
+    FIRESTORE_WRITE_BATCH_SIZE: int = 500  # Pending documents that trigger a commit (Firestore max 500)
+    FIRESTORE_WRITE_FLUSH_SECONDS: float = 1.0  # Non-final updates pending this long are lost if the process dies
+    
+    # Duplicate detection
+    DEDUP_CACHE_SIZE: int = 100_000
+    DEDUP_CACHE_TTL_SECONDS: float = 3600
+    DEDUP_BLOOM_ENABLED: bool = False  # Only safe when this instance sees every write
+    DEDUP_BLOOM_CAPACITY: int = 1_000_000
+    DEDUP_BLOOM_ERROR_RATE: float = 0.001
+    
+    # Signed URLs
+    SIGNED_URL_CACHE_SIZE: int = 10_000
+    SIGNED_URL_SAFETY_MARGIN_SECONDS: float = 300  # Minimum validity left on a reused URL
+    
+    # Profiling (requires pyinstrument)
+    PROFILING_ENABLED: bool = False  # Allows ?profile=1 / X-Profile: 1 per request
+    PROFILING_INTERVAL: float = 0.001  # Sampling interval in seconds
+    PROFILING_SAMPLE_RATE: float = 0.0  # Fraction of requests profiled automatically
+    PROFILING_OUTPUT_DIR: Optional[str] = None  # Where sampled profiles are written
     
     # Google Cloud
-    GOOGLE_CLOUD_PROJECT: str
-    GCP_STORAGE_BUCKET: str
-    BIGQUERY_DATASET: str
-    GOOGLE_APPLICATION_CREDENTIALS: str
+    GOOGLE_CLOUD_PROJECT: Optional[str] = None
+    GCP_STORAGE_BUCKET: Optional[str] = None
+    BIGQUERY_DATASET: Optional[str] = None
+    GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None  # Application default credentials if unset
     
     # Pinecone
-    PINECONE_API_KEY: str
-    PINECONE_CLOUD: str
-    PINECONE_REGION: str
-    PINECONE_INDEX_NAME: str
-    PINECONE_ENVIRONMENT: str
+    PINECONE_API_KEY: Optional[str] = None
+    PINECONE_CLOUD: Optional[str] = None
+    PINECONE_REGION: Optional[str] = None
+    PINECONE_INDEX_NAME: Optional[str] = None
+    PINECONE_ENVIRONMENT: Optional[str] = None
     
     # OpenAI
-    OPENAI_API_KEY: str
+    OPENAI_API_KEY: Optional[str] = None
     
+    def require(self, subsystem: str, *names: str):
+        """
+        Fail if any of ``names`` is unset.
+
+        Settings are only validated by the subsystem that uses them, so a
+        pod that never touches Pinecone does not need Pinecone credentials.
+        """
+        missing = [name for name in names if not getattr(self, name)]
+        if missing:
+            raise ConfigurationError(f"{subsystem} requires {', '.join(missing)} to be set")
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,11 +1,44 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .api.endpoints import pdf
+from fastapi.responses import JSONResponse, Response
+from .api.deps import services
+from .api.endpoints import comparison, pdf, query
+from .core.config import ConfigurationError, settings
+from .utils.admission import MULTIPART_OVERHEAD, UploadAdmissionMiddleware, check_limits
+from .utils.concurrency import shutdown_io_executor
+from .utils.metrics import RequestMetricsMiddleware, render_metrics
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services and their clients are built lazily by the first request that needs them
+    yield
+    # Stop whatever was started: extraction workers, then loaders (flushing buffered rows)
+    await services.shutdown()
+    # Let in-flight GCS calls finish before the worker exits
+    shutdown_io_executor()
 
 app = FastAPI(
     title="FinSight AI API",
     description="Financial Document Analysis API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Refuse oversized uploads and uploads over the in-flight byte budget before
+# their body is read; added first so refusals still pass through CORS and metrics
+upload_limits = {
+    "/api/v1/pdf/upload/": settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+    "/api/v1/pdf/upload/stream": settings.MAX_UPLOAD_SIZE,
+    "/api/v1/pdf/upload/batch": settings.UPLOAD_MAX_BATCH_SIZE,
+}
+# Middleware is only built on the first request; fail at startup instead
+check_limits(upload_limits, settings.UPLOAD_MAX_IN_FLIGHT_BYTES)
+app.add_middleware(
+    UploadAdmissionMiddleware,
+    limits=upload_limits,
+    max_in_flight_bytes=settings.UPLOAD_MAX_IN_FLIGHT_BYTES,
+    retry_after=settings.UPLOAD_RETRY_AFTER_SECONDS
 )
 
 # Configure CORS
@@ -16,9 +49,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware)
+if settings.PROFILING_ENABLED:
+    from .utils.profiling import ProfilerMiddleware
+
+    app.add_middleware(
+        ProfilerMiddleware,
+        interval=settings.PROFILING_INTERVAL,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        output_dir=settings.PROFILING_OUTPUT_DIR
+    )
 
 # Include routers
 app.include_router(pdf.router, prefix="/api/v1/pdf", tags=["PDF"])
+app.include_router(query.router, prefix="/api/v1/query", tags=["Query"])
+app.include_router(comparison.router, prefix="/api/v1/comparisons", tags=["Comparison"])
+
+@app.exception_handler(ConfigurationError)
+async def configuration_error_handler(request: Request, exc: ConfigurationError):
+    # A subsystem this pod is not configured for was requested
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 @app.get("/")
 async def root():
@@ -26,4 +76,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class ComparisonRequest(BaseModel):
+    base_report_id: str
+    compare_report_ids: List[str]
+    materiality_threshold: Optional[float] = None
+
+class LineItemChange(BaseModel):
+    line_item: str
+    column: int
+    occurrence: int
+    base_value: Optional[float] = None
+    value: Optional[float] = None
+    delta: Optional[float] = None
+    pct_delta: Optional[float] = None
+    change_type: str
+
+class ReportComparison(BaseModel):
+    compare_report_id: str
+    line_items: int
+    changed: int
+    material_changes: List[LineItemChange]
+
+class ComparisonResponse(BaseModel):
+    base_report_id: str
+    materiality_threshold: float
+    comparisons: List[ReportComparison]
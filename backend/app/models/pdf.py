@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
 
 class PDFResponse(BaseModel):
     file_name: str
@@ -10,7 +11,43 @@ class PDFResponse(BaseModel):
     storage_path: str
     signed_url: Optional[str] = None
 
+class ProcessingStatus(str, Enum):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
 class PDFStatus(BaseModel):
-    file_hash: str
+    file_hash: Optional[str] = None
     status: str
-    message: str 
\ No newline at end of file
+    message: str
+    page_count: Optional[int] = None
+    ocr_pages: Optional[int] = None  # Pages whose text came from OCR
+    ocr_failed_pages: List[int] = []  # Scanned pages OCR could not read (timeout, error, OCR off)
+
+class PDFBatchItem(BaseModel):
+    file_name: str
+    status: PDFStatus
+    result: Optional[PDFResponse] = None
+
+class PDFBatchResponse(BaseModel):
+    total: int
+    uploaded: int
+    duplicates: int
+    failed: int
+    items: List[PDFBatchItem]
+
+class PDFFileInfo(BaseModel):
+    file_hash: str
+    file_name: Optional[str] = None
+    aliases: List[str] = []
+    file_size: Optional[int] = None
+    storage_path: Optional[str] = None
+    status: Optional[str] = None
+    company_name: Optional[str] = None
+    page_count: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class PDFFileList(BaseModel):
+    items: List[PDFFileInfo]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,18 @@
+from datetime import date
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class QueryRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+    file_hashes: Optional[List[str]] = None
+    company_name: Optional[str] = None
+    report_date: Optional[date] = None
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: Optional[int] = Field(None, ge=1, le=50)
+    file_hashes: Optional[List[str]] = None
+    company_name: Optional[str] = None
+    report_date: Optional[date] = None
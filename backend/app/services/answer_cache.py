@@ -0,0 +1,144 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: List[dict]
+    file_hashes: Set[str]
+    scope: str
+    created_at: float
+    latency_seconds: float
+    hits: int = 0
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    A question is a hit when the cosine similarity between its embedding
+    and a cached question's embedding is at least ``similarity_threshold``
+    and both were asked with the same ``scope`` (the retrieval filter).
+    Entries expire after ``ttl_seconds`` and are dropped as soon as a file
+    they cite is re-processed. Embeddings are kept in one matrix so a
+    lookup is a single matrix-vector product. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_size: int = 10_000
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # Allocated on the first put, once the embedding dimension is known
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[CachedAnswer]] = []
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _alive(self, now: float) -> np.ndarray:
+        return np.fromiter(
+            (entry is not None and now - entry.created_at < self.ttl_seconds for entry in self._entries),
+            dtype=bool,
+            count=len(self._entries)
+        )
+
+    def get(self, embedding: Sequence[float], scope: str = "") -> Optional[CachedAnswer]:
+        """Return the most similar live answer above the threshold, if any."""
+        query = self._normalize(embedding)
+        with self._lock:
+            if self._entries:
+                scores = self._vectors[:len(self._entries)] @ query
+                candidates = self._alive(time.time())
+                candidates &= np.fromiter(
+                    (entry is not None and entry.scope == scope for entry in self._entries),
+                    dtype=bool,
+                    count=len(self._entries)
+                )
+                scores[~candidates] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    entry = self._entries[best]
+                    entry.hits += 1
+                    self.hits += 1
+                    self.saved_seconds += entry.latency_seconds
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        embedding: Sequence[float],
+        question: str,
+        answer: str,
+        sources: List[dict],
+        latency_seconds: float,
+        scope: str = ""
+    ):
+        entry = CachedAnswer(
+            question=question,
+            answer=answer,
+            sources=sources,
+            file_hashes={source['file_hash'] for source in sources if source.get('file_hash')},
+            scope=scope,
+            created_at=time.time(),
+            latency_seconds=latency_seconds
+        )
+        vector = self._normalize(embedding)
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                self._compact()
+            row = len(self._entries)
+            if self._vectors is None:
+                self._vectors = np.zeros((64, len(vector)), dtype=np.float32)
+            elif row == len(self._vectors):
+                self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+            self._vectors[row] = vector
+            self._entries.append(entry)
+
+    def _compact(self):
+        """Drop invalidated and expired entries, then the oldest if still full."""
+        keep = np.flatnonzero(self._alive(time.time()))
+        keep = keep[max(0, len(keep) - self.max_size + 1):]
+        self._vectors[:len(keep)] = self._vectors[keep]
+        self._entries = [self._entries[i] for i in keep]
+
+    def invalidate(self, file_hash: str) -> int:
+        """Drop every answer that cites ``file_hash``; returns how many."""
+        with self._lock:
+            dropped = 0
+            for i, entry in enumerate(self._entries):
+                if entry is not None and file_hash in entry.file_hashes:
+                    self._entries[i] = None
+                    dropped += 1
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._alive(time.time()).sum()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "latency_seconds_saved": self.saved_seconds,
+            }
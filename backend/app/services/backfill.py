@@ -0,0 +1,275 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..models.pdf import ProcessingStatus
+from ..utils.concurrency import ByteBudget
+from ..utils.metrics import track
+from ..utils.streaming import UploadValidationError
+from .extraction import EMBED_STAGE, EXTRACT_STAGE, ExtractionService
+from .firestore import FirestoreService
+from .job_queue import Lane, QueueSaturatedError
+from .storage import OBJECTS_PREFIX, STAGING_PREFIX, AsyncStorageService
+
+logger = logging.getLogger(__name__)
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# Statuses a queued or running job is responsible for; they are left alone
+ACTIVE_STATUSES = (ProcessingStatus.QUEUED.value, ProcessingStatus.PROCESSING.value)
+
+
+@dataclass
+class BackfillStats:
+    pages: int = 0
+    listed: int = 0
+    listed_bytes: int = 0
+    hashed: int = 0  # Legacy objects streamed to compute their hash
+    hashed_bytes: int = 0
+    recorded: int = 0  # Objects without metadata that were given a pdf_files document
+    queued: int = 0
+    up_to_date: int = 0
+    invalid: int = 0  # Not a PDF, too large or not named by a hash
+    failed: int = 0
+
+
+class Backfill:
+    """
+    Run every object already in the bucket through the extraction pipeline.
+
+    The listing is walked one page at a time (the next page is fetched
+    while the current one is processed) and the page token is written to a
+    JSON checkpoint after each page is queued, so an interrupted run
+    resumes after the last queued page and memory stays at one page.
+
+    Objects under ``objects/`` are named by their hash. Other prefixes
+    (e.g. legacy ``uploads/``) are streamed through SHA-256 in parallel,
+    bounded by ``max_in_flight_bytes`` of object data and ``downloads``
+    transfers, and copied to their content-addressed path.
+
+    Each page is reconciled against ``pdf_files`` in one batched lookup:
+    objects without metadata get a document, ``done`` files are skipped
+    unless ``reindex`` is set, and everything else is marked queued and
+    put on the bulk lane, waiting while that lane is at capacity so
+    interactive uploads keep priority.
+    """
+
+    def __init__(
+        self,
+        storage_service: AsyncStorageService,
+        firestore_service: FirestoreService,
+        extraction_service: ExtractionService,
+        checkpoint_path: str,
+        page_size: Optional[int] = None,
+        max_in_flight_bytes: Optional[int] = None,
+        downloads: Optional[int] = None,
+        reindex: bool = False,
+        capacity_wait_seconds: float = 5
+    ):
+        self.storage_service = storage_service
+        self.firestore_service = firestore_service
+        self.extraction_service = extraction_service
+        self.checkpoint_path = checkpoint_path
+        self.page_size = page_size or settings.BACKFILL_PAGE_SIZE
+        self.budget = ByteBudget(max_in_flight_bytes or settings.BACKFILL_MAX_IN_FLIGHT_BYTES)
+        self.downloads = asyncio.Semaphore(downloads or settings.BACKFILL_CONCURRENT_DOWNLOADS)
+        self.reindex = reindex
+        self.capacity_wait_seconds = capacity_wait_seconds
+        self.stats = BackfillStats()
+        self.started = time.monotonic()
+        self._checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> dict:
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {'prefixes': {}}
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    async def run(self, prefixes: List[str]) -> BackfillStats:
+        for prefix in prefixes:
+            await self._run_prefix(prefix)
+        return self.stats
+
+    async def _run_prefix(self, prefix: str):
+        state = self._checkpoint['prefixes'].setdefault(prefix, {'page_token': None, 'done': False})
+        if state['done']:
+            logger.info("Skipping %s: completed by an earlier run", prefix)
+            return
+        listing = asyncio.create_task(self.storage_service.list_page(prefix, self.page_size, state['page_token']))
+        while True:
+            blobs, next_token = await listing
+            if next_token is not None:
+                listing = asyncio.create_task(self.storage_service.list_page(prefix, self.page_size, next_token))
+            with track("backfill", "page") as span:
+                span.bytes = await self._process_page(blobs)
+            self.stats.pages += 1
+            state['page_token'], state['done'] = next_token, next_token is None
+            self._save_checkpoint()
+            if next_token is None:
+                return
+
+    async def _process_page(self, blobs: list) -> int:
+        """Reconcile and queue one listing page; returns its size in bytes."""
+        files: Dict[str, dict] = {}
+        page_bytes = 0
+        legacy = []
+        for blob in blobs:
+            if blob.name.startswith(STAGING_PREFIX) or blob.name.endswith("/"):
+                continue
+            self.stats.listed += 1
+            self.stats.listed_bytes += blob.size or 0
+            page_bytes += blob.size or 0
+            if not blob.name.startswith(f"{OBJECTS_PREFIX}/"):
+                legacy.append(blob)
+                continue
+            file_hash = blob.name.rsplit("/", 1)[-1]
+            if HASH_PATTERN.match(file_hash):
+                files[file_hash] = {
+                    'storage_path': blob.name,
+                    'file_size': blob.size,
+                    'content_type': blob.content_type,
+                }
+            else:
+                self.stats.invalid += 1
+
+        for migrated in await asyncio.gather(*(self._migrate(blob) for blob in legacy)):
+            if migrated is not None:
+                file_hash, entry = migrated
+                # The same content under several legacy names: keep every name
+                aliases = files.get(file_hash, {}).get('aliases', []) + entry['aliases']
+                files[file_hash] = {**entry, 'aliases': aliases}
+        if files:
+            await self._reconcile(files)
+        return page_bytes
+
+    async def _migrate(self, blob) -> Optional[Tuple[str, dict]]:
+        """Hash a legacy object and copy it to its content-addressed path."""
+        try:
+            async with self.downloads, self.budget.reserve(blob.size or 0):
+                with track("backfill", "hash") as span:
+                    file_hash, size = await self.storage_service.hash_object(blob.name)
+                    span.bytes = size
+            storage_path = await self.storage_service.adopt_object(blob.name, file_hash)
+        except UploadValidationError as e:
+            logger.warning("Skipping %s: %s", blob.name, e)
+            self.stats.invalid += 1
+            return None
+        except Exception:
+            logger.exception("Backfill of %s failed", blob.name)
+            self.stats.failed += 1
+            return None
+        self.stats.hashed += 1
+        self.stats.hashed_bytes += size
+        return file_hash, {
+            'storage_path': storage_path,
+            'file_size': size,
+            'content_type': blob.content_type,
+            'aliases': [blob.name.rsplit("/", 1)[-1]],
+        }
+
+    async def _reconcile(self, files: Dict[str, dict]):
+        with track("backfill", "reconcile"):
+            metadata = await self.firestore_service.get_many_file_metadata(files)
+        created: Dict[str, dict] = {}
+        updates: Dict[str, dict] = {}
+        aliases: Dict[str, List[str]] = {}
+        queue: Dict[str, str] = {}
+        queued = {
+            'status': ProcessingStatus.QUEUED.value,
+            'status_message': "Waiting for extraction (backfill)",
+        }
+        for file_hash, entry in files.items():
+            names = entry.get('aliases', [])
+            document = metadata.get(file_hash)
+            if document is None:
+                created[file_hash] = {
+                    'file_name': names[0] if names else f"{file_hash}.pdf",
+                    'aliases': names,
+                    'file_size': entry['file_size'],
+                    'storage_path': entry['storage_path'],
+                    'content_type': entry['content_type'],
+                    **queued,
+                }
+                queue[file_hash] = entry['storage_path']
+                continue
+
+            new_names = [name for name in names if name not in document.get('aliases', [])]
+            if new_names:
+                aliases[file_hash] = new_names
+            if document.get('status') == ProcessingStatus.DONE.value and not self.reindex:
+                self.stats.up_to_date += 1
+                continue
+            fields = {}
+            if document.get('status') not in ACTIVE_STATUSES:
+                fields.update(queued, status_updated_at=datetime.now())
+            if document.get('storage_path') != entry['storage_path']:
+                fields['storage_path'] = entry['storage_path']
+            if fields:
+                updates[file_hash] = fields
+            queue[file_hash] = entry['storage_path']
+
+        # Metadata first, as for uploads: a queued job always has a document
+        with track("backfill", "metadata_write"):
+            if created:
+                # Recorded concurrently (e.g. uploaded meanwhile): that writer queued it, keep only the names
+                for file_hash in await self.firestore_service.store_many_file_metadata(created):
+                    names = created.pop(file_hash)['aliases']
+                    if names:
+                        aliases[file_hash] = names
+                    del queue[file_hash]
+            if updates:
+                await self.firestore_service.update_many_file_metadata(updates)
+            if aliases:
+                await self.firestore_service.add_aliases(aliases)
+        self.stats.recorded += len(created)
+        if queue:
+            await self._wait_for_capacity()
+            await self.extraction_service.enqueue_many(queue, Lane.BULK)
+            self.stats.queued += len(queue)
+
+    async def _wait_for_capacity(self):
+        while True:
+            try:
+                await self.extraction_service.check_capacity(Lane.BULK)
+                return
+            except QueueSaturatedError:
+                await asyncio.sleep(self.capacity_wait_seconds)
+
+    async def pipeline_backlog(self) -> Dict[str, int]:
+        """Bulk jobs still waiting or running, per stage."""
+        stats = await self.extraction_service.scheduler.stats()
+        lane = Lane.BULK.name.lower()
+        return {
+            stage: sum(stats.get(stage, {}).get(lane, {}).get(state, 0) for state in ("queued", "running"))
+            for stage in (EXTRACT_STAGE, EMBED_STAGE)
+        }
+
+    async def wait_until_drained(self, poll_seconds: float = 5):
+        """Wait until the bulk lanes of the pipeline are empty (failed jobs excluded)."""
+        while any((await self.pipeline_backlog()).values()):
+            await asyncio.sleep(poll_seconds)
+
+    async def progress(self) -> dict:
+        """Counters, listing and hashing throughput, and the remaining pipeline backlog."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            **asdict(self.stats),
+            'elapsed_seconds': round(elapsed, 1),
+            'objects_per_second': round(self.stats.listed / elapsed, 1),
+            'listed_mb_per_second': round(self.stats.listed_bytes / elapsed / 1e6, 1),
+            'hashed_mb_per_second': round(self.stats.hashed_bytes / elapsed / 1e6, 1),
+            'in_flight_bytes': self.budget.in_flight,
+            'backlog': await self.pipeline_backlog(),
+        }
@@ -0,0 +1,331 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from ..core.config import settings
+from ..utils.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Idempotency key of each table created by scripts/setup_gcp.py
+TABLE_KEYS = {
+    'financial_reports': 'report_id',
+    'report_comparisons': 'comparison_id',
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _flatten_value(value):
+    """Scalar form of a column value; nested values become JSON strings."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _arrow_type(field_type: str):
+    """Arrow type BigQuery loads from Parquet into a column of ``field_type``; JSON is staged as a string."""
+    import pyarrow as pa
+
+    types = {
+        'STRING': pa.string(),
+        'JSON': pa.string(),
+        'BYTES': pa.binary(),
+        'INTEGER': pa.int64(),
+        'INT64': pa.int64(),
+        'FLOAT': pa.float64(),
+        'FLOAT64': pa.float64(),
+        'NUMERIC': pa.decimal128(38, 9),
+        'BOOLEAN': pa.bool_(),
+        'BOOL': pa.bool_(),
+        'DATE': pa.date32(),
+        'DATETIME': pa.timestamp("us"),
+        # Naive datetimes are taken as UTC, as BigQuery does for NDJSON
+        'TIMESTAMP': pa.timestamp("us", tz="UTC"),
+    }
+    if field_type not in types:
+        raise ValueError(f"Unsupported column type for Parquet: {field_type}")
+    return types[field_type]
+
+
+def _parquet_value(value, field_type: str):
+    """``value`` as the Python type Arrow expects for a column of ``field_type``."""
+    if value is None:
+        return None
+    if field_type in ('STRING', 'JSON'):
+        return _flatten_value(value)
+    if field_type == 'DATE':
+        if isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        return value.date() if isinstance(value, datetime) else value
+    if field_type in ('TIMESTAMP', 'DATETIME'):
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value if isinstance(value, datetime) else datetime(value.year, value.month, value.day)
+    if field_type == 'NUMERIC':
+        from decimal import Decimal
+
+        return Decimal(str(value))
+    return value
+
+
+def serialize_rows(rows: List[dict], source_format: str, schema: Optional[Dict[str, str]] = None) -> io.BytesIO:
+    """
+    Serialize rows as newline-delimited JSON or Parquet for a load job.
+
+    Parquet needs ``schema`` (column name -> BigQuery type of the target
+    table): each column is written with the matching Arrow type, so dates
+    and timestamps stay native and all-null columns keep their type. Only
+    JSON values are flattened to strings.
+    """
+    buffer = io.BytesIO()
+    if source_format == "PARQUET":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if schema is None:
+            raise ValueError("Parquet serialization needs the table schema")
+        arrow_schema = pa.schema([(name, _arrow_type(field_type)) for name, field_type in schema.items()])
+        table = pa.table(
+            {
+                name: pa.array([_parquet_value(row.get(name), field_type) for row in rows], _arrow_type(field_type))
+                for name, field_type in schema.items()
+            },
+            schema=arrow_schema
+        )
+        pq.write_table(table, buffer)
+    elif source_format == "NEWLINE_DELIMITED_JSON":
+        for row in rows:
+            buffer.write(json.dumps({key: _flatten_value(value) for key, value in row.items()}).encode("utf-8"))
+            buffer.write(b"\n")
+    else:
+        raise ValueError(f"Unsupported source format: {source_format}")
+    buffer.seek(0)
+    return buffer
+
+
+def staging_schema(schema: list) -> list:
+    """Load-job schema of a staging table for ``schema``; JSON columns are staged as strings."""
+    from google.cloud import bigquery
+
+    return [
+        bigquery.SchemaField(field.name, "STRING" if field.field_type == "JSON" else field.field_type)
+        for field in schema
+    ]
+
+
+class ReportSink(ABC):
+    """Destination for batches of report rows."""
+
+    @abstractmethod
+    def write(self, table: str, rows: List[dict], key: str) -> int:
+        """
+        Write rows, skipping any whose ``key`` is already present.
+
+        Must be idempotent so a retried or replayed batch never duplicates
+        rows. Returns the number of rows in the batch.
+        """
+
+
+class BigQuerySink(ReportSink):
+    """
+    Loads batches into BigQuery with one load job and one MERGE.
+
+    Rows are serialized (NDJSON or Parquet) and loaded into a temporary
+    staging table, then merged into the target on the key column so only
+    new keys are inserted. JSON columns are staged as strings and parsed by
+    the MERGE, which keeps both formats equivalent.
+    """
+
+    def __init__(self, client=None, source_format: Optional[str] = None):
+        from google.cloud import bigquery
+
+        settings.require("BigQuery", "GOOGLE_CLOUD_PROJECT", "BIGQUERY_DATASET")
+        self.bigquery = bigquery
+        self.client = client or bigquery.Client(project=settings.GOOGLE_CLOUD_PROJECT)
+        self.dataset = f"{settings.GOOGLE_CLOUD_PROJECT}.{settings.BIGQUERY_DATASET}"
+        self.source_format = source_format or settings.LOADER_SOURCE_FORMAT
+        self._schemas: Dict[str, list] = {}
+
+    def _schema(self, table: str) -> list:
+        if table not in self._schemas:
+            self._schemas[table] = self.client.get_table(f"{self.dataset}.{table}").schema
+        return self._schemas[table]
+
+    def write(self, table: str, rows: List[dict], key: str) -> int:
+        bigquery = self.bigquery
+        schema = self._schema(table)
+        staging = f"{self.dataset}._staging_{table}_{uuid.uuid4().hex}"
+        job_config = bigquery.LoadJobConfig(
+            source_format=self.source_format,
+            schema=staging_schema(schema),
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        )
+        columns = [field.name for field in schema]
+        values = [
+            f"PARSE_JSON(S.{field.name})" if field.field_type == "JSON" else f"S.{field.name}"
+            for field in schema
+        ]
+        try:
+            buffer = serialize_rows(
+                [{name: row.get(name) for name in columns} for row in rows],
+                self.source_format,
+                {field.name: field.field_type for field in schema}
+            )
+            self.client.load_table_from_file(buffer, staging, job_config=job_config).result()
+            self.client.query(f"""
+                MERGE `{self.dataset}.{table}` T
+                USING (
+                    SELECT * EXCEPT(_row_number) FROM (
+                        SELECT *, ROW_NUMBER() OVER (PARTITION BY {key}) AS _row_number
+                        FROM `{staging}`
+                    ) WHERE _row_number = 1
+                ) S
+                ON T.{key} = S.{key}
+                WHEN NOT MATCHED THEN
+                    INSERT ({", ".join(columns)}) VALUES ({", ".join(values)})
+            """).result()
+        finally:
+            self.client.delete_table(staging, not_found_ok=True)
+        return len(rows)
+
+
+class SQLiteSink(ReportSink):
+    """Local stand-in for BigQuery; tables are created on first write."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._columns: Dict[str, List[str]] = {}
+
+    def _ensure_table(self, table: str, columns: List[str], key: str):
+        if table in self._columns:
+            return
+        definitions = ", ".join(
+            f"{column} TEXT PRIMARY KEY" if column == key else f"{column}"
+            for column in columns
+        )
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definitions})")
+        existing = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        self._columns[table] = existing
+
+    def write(self, table: str, rows: List[dict], key: str) -> int:
+        if not rows:
+            return 0
+        with self._lock:
+            self._ensure_table(table, list(rows[0]), key)
+            columns = self._columns[table]
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(columns)})"
+                f" VALUES ({', '.join('?' * len(columns))})",
+                [[_flatten_value(row.get(column)) for column in columns] for row in rows]
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def count(self, table: str) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BulkLoader:
+    """
+    Write-behind buffer in front of a ReportSink.
+
+    Rows are buffered (deduplicated by key) and flushed as one batch when
+    ``max_rows`` is reached, every ``flush_interval`` seconds, and on stop.
+    """
+
+    def __init__(
+        self,
+        sink: ReportSink,
+        table: str,
+        key: Optional[str] = None,
+        max_rows: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.sink = sink
+        self.table = table
+        self.key = key or TABLE_KEYS[table]
+        self.max_rows = max_rows or settings.LOADER_BATCH_ROWS
+        self.flush_interval = flush_interval or settings.LOADER_FLUSH_SECONDS
+        self._buffer: Dict[str, dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.rows_written = 0
+        self.batches_written = 0
+
+    async def start(self):
+        self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        await self.flush()
+
+    async def add(self, row: dict):
+        self._buffer[row[self.key]] = row
+        if len(self._buffer) >= self.max_rows:
+            await self.flush()
+
+    async def add_many(self, rows: List[dict]):
+        for row in rows:
+            self._buffer[row[self.key]] = row
+        if len(self._buffer) >= self.max_rows:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            rows, self._buffer = list(self._buffer.values()), {}
+            try:
+                await run_blocking(self.sink.write, self.table, rows, self.key)
+            except Exception:
+                # Put the batch back; the sink is idempotent so a retry is safe
+                for row in rows:
+                    self._buffer.setdefault(row[self.key], row)
+                raise
+            self.rows_written += len(rows)
+            self.batches_written += 1
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Periodic flush to %s failed", self.table)
+
+
+def create_report_sink() -> Optional[ReportSink]:
+    """Build the sink selected by LOADER_SINK, or None if loading is disabled."""
+    if settings.LOADER_SINK == "bigquery":
+        return BigQuerySink()
+    if settings.LOADER_SINK == "sqlite":
+        settings.require("SQLite loader sink", "PROCESSED_DATA_PATH")
+        return SQLiteSink(os.path.join(settings.PROCESSED_DATA_PATH, "reports.sqlite"))
+    if settings.LOADER_SINK in ("", "none"):
+        return None
+    raise ValueError(f"Unknown loader sink: {settings.LOADER_SINK}")
@@ -0,0 +1,199 @@
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from ..core.config import settings
+from ..utils.concurrency import run_blocking
+from ..utils.numeric import AMOUNT_TOKEN, DASH_TOKEN, PERCENT_TOKEN, parse_amounts
+from .bigquery_loader import BulkLoader
+from .report_store import ProcessedReport, ReportStore
+from .tables import TABLE_KEY
+
+# Line items are aligned across reports on these columns
+LINE_ITEM_KEY = ["line_item", "column", "occurrence"]
+
+
+def line_items_from_pages(pages: Iterable[dict]) -> pd.DataFrame:
+    """
+    Turn extracted page text into a long table of numeric line items.
+
+    Each text line is split into label tokens and numeric tokens; the
+    numeric tokens are numbered left to right (``column``) and repeated
+    labels are numbered in document order (``occurrence``), which gives a
+    key that stays stable when pages move between report versions.
+    Percentages are skipped as derived values; a lone dash means zero.
+    """
+    lines = pd.DataFrame(
+        [(page['page_number'], line) for page in pages for line in page.get('text', "").splitlines()],
+        columns=["page_number", "text"]
+    )
+    tokens = lines["text"].str.split().explode().dropna()
+    if tokens.empty:
+        return pd.DataFrame(columns=["page_number", *LINE_ITEM_KEY, "value"])
+
+    is_amount = tokens.str.match(AMOUNT_TOKEN)
+    is_percent = tokens.str.match(PERCENT_TOKEN)
+    is_dash = tokens.str.match(DASH_TOKEN)
+    is_number = is_amount | is_percent | is_dash
+
+    labels = tokens[~is_number].groupby(level=0).agg(" ".join)
+    numbers = pd.DataFrame({'token': tokens[is_number], 'dash': is_dash[is_number], 'percent': is_percent[is_number]})
+    numbers["column"] = numbers.groupby(level=0).cumcount()
+    numbers = numbers[~numbers["percent"]]
+    numbers["value"] = parse_amounts(numbers["token"]).where(~numbers["dash"], 0.0)
+    numbers["line_item"] = labels.reindex(numbers.index)
+    numbers["page_number"] = lines["page_number"].reindex(numbers.index)
+    numbers = numbers.dropna(subset=["line_item", "value"])
+    numbers["occurrence"] = numbers.groupby(["line_item", "column"]).cumcount()
+    return numbers[["page_number", *LINE_ITEM_KEY, "value"]].reset_index(drop=True)
+
+
+def line_items_from_tables(values: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn a report's normalized table values (``tables.parquet``) into line items.
+
+    Same output as ``line_items_from_pages``: the row label is the line
+    item, ``column`` the value's position in its row, ``occurrence`` the
+    repeat of (label, column) in document order. Header years and
+    percentages are skipped and values are in the report's own units
+    (the table scale is divided back out) so the materiality threshold
+    means the same on both paths.
+    """
+    amounts = values[(values["kind"] == "amount") & (values["label"] != "")]
+    amounts = amounts.sort_values([*TABLE_KEY, "column"], kind="stable")
+    items = pd.DataFrame({
+        'page_number': amounts["page_number"].to_numpy(),
+        'line_item': amounts["label"].to_numpy(dtype=object),
+        'column': amounts["column"].to_numpy(dtype=np.int64),
+        'value': (amounts["value"] / amounts["scale"]).to_numpy(),
+    })
+    items["occurrence"] = items.groupby(["line_item", "column"]).cumcount()
+    return items[["page_number", *LINE_ITEM_KEY, "value"]]
+
+
+def line_items(reports: Dict[str, ProcessedReport]) -> Dict[str, pd.DataFrame]:
+    """
+    Line items of each report, from its tables when every report has them.
+
+    Labels and columns differ between table rows and text lines, so all
+    reports of a comparison use the same source: page text is the fallback
+    when any report has no tables (normalization failed or found none).
+    """
+    tables = {report_id: report.tables() for report_id, report in reports.items() if report.has_tables}
+    if len(tables) == len(reports) and all(not values.empty for values in tables.values()):
+        return {report_id: line_items_from_tables(values) for report_id, values in tables.items()}
+    return {report_id: line_items_from_pages(report.pages()) for report_id, report in reports.items()}
+
+
+def compare_line_items(
+    base: pd.DataFrame,
+    versions: Dict[str, pd.DataFrame],
+    materiality_threshold: float
+) -> pd.DataFrame:
+    """
+    Compare one base report against N versions in a single vectorized pass.
+
+    All reports are aligned on LINE_ITEM_KEY into one matrix (rows are line
+    items, columns are versions); deltas, percent deltas and materiality
+    flags are then computed as whole-array operations. Returns one row per
+    (version, line item) that is present in either report.
+    """
+    base_values = base.set_index(LINE_ITEM_KEY)["value"]
+    base_values = base_values[~base_values.index.duplicated()]
+    version_ids = list(versions)
+    wide = pd.concat(
+        {
+            version_id: frame.set_index(LINE_ITEM_KEY)["value"].pipe(lambda s: s[~s.index.duplicated()])
+            for version_id, frame in versions.items()
+        },
+        axis=1
+    )
+    index = wide.index.union(base_values.index)
+    values = wide.reindex(index).to_numpy(dtype=np.float64)
+    base_column = base_values.reindex(index).to_numpy(dtype=np.float64)[:, None]
+
+    delta = values - base_column
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_delta = np.where(base_column != 0, delta / np.abs(base_column) * 100, np.nan)
+    base_missing = np.isnan(base_column) & ~np.isnan(values)
+    version_missing = ~np.isnan(base_column) & np.isnan(values)
+    changed = ~np.isnan(delta) & (delta != 0)
+    magnitude = np.where(base_missing, np.abs(values), np.where(version_missing, np.abs(base_column), np.abs(delta)))
+    material = (base_missing | version_missing | changed) & (magnitude >= materiality_threshold)
+
+    change_type = np.full(values.shape, "unchanged", dtype=object)
+    change_type[changed] = "changed"
+    change_type[base_missing] = "added"
+    change_type[version_missing] = "removed"
+
+    count = len(index)
+    keys = index.to_frame(index=False)
+    return pd.DataFrame({
+        'compare_report_id': np.repeat(version_ids, count),
+        **{name: np.tile(keys[name].to_numpy(), len(version_ids)) for name in LINE_ITEM_KEY},
+        'base_value': np.tile(base_column[:, 0], len(version_ids)),
+        'value': values.T.ravel(),
+        'delta': delta.T.ravel(),
+        'pct_delta': pct_delta.T.ravel(),
+        'change_type': change_type.T.ravel(),
+        'material': material.T.ravel(),
+    })
+
+
+def comparison_rows(
+    base_report_id: str,
+    differences: pd.DataFrame,
+    materiality_threshold: float
+) -> List[dict]:
+    """Build one ``report_comparisons`` row per compared version."""
+    rows = []
+    timestamp = datetime.now()
+    columns = [*LINE_ITEM_KEY, "base_value", "value", "delta", "pct_delta", "change_type"]
+    material = differences.loc[differences["material"], ["compare_report_id", *columns]]
+    material = material.astype(object).where(material.notna(), None)
+    by_version = dict(tuple(material.groupby("compare_report_id")))
+    for compare_report_id in differences["compare_report_id"].unique():
+        changes = by_version.get(compare_report_id)
+        rows.append({
+            'comparison_id': hashlib.sha256(
+                f"{base_report_id}:{compare_report_id}:{materiality_threshold}".encode()
+            ).hexdigest(),
+            'base_report_id': base_report_id,
+            'compare_report_id': compare_report_id,
+            'comparison_type': "line_item",
+            'differences': [] if changes is None else changes[columns].to_dict(orient="records"),
+            'comparison_timestamp': timestamp,
+            'materiality_threshold': materiality_threshold,
+        })
+    return rows
+
+
+class ComparisonService:
+    """Compares extracted reports and writes material changes in bulk."""
+
+    def __init__(self, store: ReportStore, loader: Optional[BulkLoader] = None):
+        self.store = store
+        self.loader = loader
+
+    def _compare(self, base_id: str, version_ids: List[str], threshold: float) -> pd.DataFrame:
+        # FileNotFoundError if a report is not in the store
+        items = line_items({report_id: self.store.open(report_id) for report_id in [base_id, *version_ids]})
+        versions = {version_id: items[version_id] for version_id in version_ids}
+        return compare_line_items(items[base_id], versions, threshold)
+
+    async def compare(
+        self,
+        base_id: str,
+        version_ids: List[str],
+        materiality_threshold: Optional[float] = None
+    ) -> pd.DataFrame:
+        """Compare a base report against versions and queue the results for loading."""
+        threshold = (
+            settings.COMPARISON_MATERIALITY_THRESHOLD
+            if materiality_threshold is None else materiality_threshold
+        )
+        differences = await run_blocking(self._compare, base_id, version_ids, threshold)
+        if self.loader is not None:
+            await self.loader.add_many(comparison_rows(base_id, differences, threshold))
+        return differences
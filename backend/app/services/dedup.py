@@ -0,0 +1,109 @@
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over string keys.
+
+    Keys are SHA-256 hex digests, which are already uniformly distributed,
+    so bit positions are derived from the key itself (double hashing)
+    instead of hashing it again.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        try:
+            h1 = int(key[:16], 16)
+            h2 = int(key[16:32], 16) | 1
+        except ValueError:
+            digest = hashlib.sha256(key.encode()).digest()
+            h1 = int.from_bytes(digest[:8], "big")
+            h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DedupCache:
+    """
+    In-process dedup layer keyed by file hash.
+
+    Known hashes are kept in a bounded LRU with a TTL. An optional Bloom
+    filter, once warmed with every hash in the collection, answers definite
+    misses without a Firestore round-trip. Lookups return True (known
+    duplicate), False (definitely new) or None (unknown; ask Firestore).
+
+    Not thread-safe; it is only touched from the event loop.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 100_000,
+        ttl_seconds: float = 3600,
+        bloom: Optional[BloomFilter] = None
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.bloom = bloom
+        self.bloom_ready = False
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bloom_rejections = 0
+
+    def lookup(self, file_hash: str) -> Optional[bool]:
+        """Answer a duplicate check locally if possible."""
+        expires_at = self._entries.get(file_hash)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(file_hash)
+                self.hits += 1
+                return True
+            del self._entries[file_hash]
+
+        if self.bloom is not None and self.bloom_ready and file_hash not in self.bloom:
+            self.bloom_rejections += 1
+            return False
+
+        self.misses += 1
+        return None
+
+    def add(self, file_hash: str):
+        """Record a hash that is known to exist in the collection."""
+        self._entries[file_hash] = time.monotonic() + self.ttl_seconds
+        self._entries.move_to_end(file_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        if self.bloom is not None:
+            self.bloom.add(file_hash)
+
+    def discard(self, file_hash: str):
+        """Forget a hash, e.g. after its metadata document was deleted."""
+        self._entries.pop(file_hash, None)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.bloom_rejections
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bloom_rejections": self.bloom_rejections,
+            "bloom_ready": self.bloom_ready,
+            "local_answer_rate": (self.hits + self.bloom_rejections) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from ..core.config import settings
+from ..utils.concurrency import retry_async, run_blocking
+from .vector_store import VectorStore
+
+
+# Document-level fields copied into every chunk, so searches can be filtered by them
+DOCUMENT_FIELDS = ("company_name", "report_date")
+
+
+@dataclass
+class Chunk:
+    chunk_id: str
+    text: str
+    content_hash: str
+    metadata: dict = field(default_factory=dict)
+
+
+def chunk_pages(
+    pages: Iterable[dict],
+    file_hash: str,
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+    document: Optional[dict] = None
+) -> Iterator[Chunk]:
+    """
+    Split extracted pages into overlapping text chunks.
+
+    Chunks never span pages, so an unchanged page of a revised report yields
+    exactly the same chunks (and content hashes) as before. ``document``
+    (e.g. company_name, report_date) is added to every chunk's metadata.
+    """
+    chunk_size = chunk_size or settings.EMBEDDING_CHUNK_SIZE
+    overlap = settings.EMBEDDING_CHUNK_OVERLAP if overlap is None else overlap
+    step = max(1, chunk_size - overlap)
+    for page in pages:
+        text = " ".join(page.get('text', "").split())
+        for index, start in enumerate(range(0, len(text), step)):
+            piece = text[start:start + chunk_size]
+            yield Chunk(
+                chunk_id=f"{file_hash}-{page['page_number']}-{index}",
+                text=piece,
+                content_hash=hashlib.sha256(piece.encode("utf-8")).hexdigest(),
+                metadata={
+                    **(document or {}),
+                    'file_hash': file_hash,
+                    'page_number': page['page_number'],
+                    'chunk_index': index,
+                    'text': piece,
+                }
+            )
+            if start + chunk_size >= len(text):
+                break
+
+
+class EmbeddingBackend(ABC):
+    """A model that turns a batch of texts into embedding vectors."""
+
+    model_name: str
+    dimension: int
+    max_batch_size: int = 256
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Return a float32 array of shape (len(texts), dimension)."""
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    max_batch_size = 2048  # API limit on inputs per request
+
+    def __init__(self, model_name: Optional[str] = None, dimension: int = 1536):
+        from openai import AsyncOpenAI
+
+        settings.require("OpenAI embeddings", "OPENAI_API_KEY")
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.dimension = dimension
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        response = await self.client.embeddings.create(model=self.model_name, input=texts)
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return np.asarray([item.embedding for item in ordered], dtype=np.float32)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Local model; needs no network once the weights are cached."""
+
+    def __init__(self, model_name: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.model = SentenceTransformer(self.model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = await run_blocking(self.model.encode, texts, batch_size=64, convert_to_numpy=True)
+        return vectors.astype(np.float32, copy=False)
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (content hash, model).
+
+    Backed by SQLite so identical chunks (boilerplate, unchanged pages) are
+    embedded once across reports and restarts.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " content_hash TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (content_hash, model))"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, content_hashes: List[str], model: str) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(content_hashes), 500):
+                batch = content_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, vector FROM embeddings"
+                    f" WHERE model = ? AND content_hash IN ({placeholders})",
+                    [model, *batch]
+                )
+                for content_hash, blob in rows:
+                    found[content_hash] = np.frombuffer(blob, dtype=np.float32)
+            self.hits += len(found)
+            self.misses += len(content_hashes) - len(found)
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray], model: str):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (content_hash, model, vector) VALUES (?, ?, ?)",
+                [(content_hash, model, np.asarray(vector, dtype=np.float32).tobytes())
+                 for content_hash, vector in vectors.items()]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingPipeline:
+    """
+    Chunks -> cached, batched embeddings -> batched, parallel index upserts.
+
+    Unique chunk texts missing from the cache are embedded in batches of
+    ``batch_size`` with at most ``max_concurrency`` requests in flight and
+    exponential backoff on failures. Vectors are then upserted to the index
+    (a Pinecone ``Index`` or InMemoryVectorIndex) in parallel batches.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        index,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        upsert_batch_size: Optional[int] = None,
+        upsert_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.backend = backend
+        self.index = index
+        self.cache = cache
+        self.batch_size = min(batch_size or settings.EMBEDDING_BATCH_SIZE, backend.max_batch_size)
+        self.max_concurrency = max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY
+        self.upsert_batch_size = upsert_batch_size or settings.PINECONE_UPSERT_BATCH_SIZE
+        self.upsert_concurrency = upsert_concurrency or settings.PINECONE_UPSERT_CONCURRENCY
+        self.max_retries = max_retries or settings.EMBEDDING_MAX_RETRIES
+        self.embedded_texts = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        """Write out a local index (LocalVectorStore folds its upsert log into ``index.json``)."""
+        if isinstance(self.index, VectorStore):
+            await run_blocking(self.index.flush)
+
+    async def embed_chunks(self, chunks: List[Chunk]) -> Dict[str, np.ndarray]:
+        """Return embeddings for the chunks keyed by content hash."""
+        texts = {chunk.content_hash: chunk.text for chunk in chunks}
+        vectors = {}
+        if self.cache is not None:
+            vectors = await run_blocking(self.cache.get_many, list(texts), self.backend.model_name)
+
+        missing = [content_hash for content_hash in texts if content_hash not in vectors]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def embed_batch(batch: List[str]) -> Dict[str, np.ndarray]:
+            async with semaphore:
+                embedded = await retry_async(
+                    lambda: self.backend.embed([texts[content_hash] for content_hash in batch]),
+                    attempts=self.max_retries
+                )
+            return dict(zip(batch, embedded))
+
+        results = await asyncio.gather(*(
+            embed_batch(missing[start:start + self.batch_size])
+            for start in range(0, len(missing), self.batch_size)
+        ))
+        new_vectors = {}
+        for result in results:
+            new_vectors.update(result)
+        self.embedded_texts += len(new_vectors)
+
+        if self.cache is not None and new_vectors:
+            await run_blocking(self.cache.put_many, new_vectors, self.backend.model_name)
+        vectors.update(new_vectors)
+        return vectors
+
+    async def index_chunks(self, chunks: List[Chunk], namespace: str = "") -> int:
+        """Embed chunks and upsert them to the index; returns the number upserted."""
+        vectors = await self.embed_chunks(chunks)
+        records = [
+            (chunk.chunk_id, vectors[chunk.content_hash].tolist(), chunk.metadata)
+            for chunk in chunks
+        ]
+        semaphore = asyncio.Semaphore(self.upsert_concurrency)
+
+        async def upsert(batch):
+            async with semaphore:
+                await retry_async(
+                    lambda: run_blocking(self.index.upsert, vectors=batch, namespace=namespace),
+                    attempts=self.max_retries
+                )
+
+        await asyncio.gather(*(
+            upsert(records[start:start + self.upsert_batch_size])
+            for start in range(0, len(records), self.upsert_batch_size)
+        ))
+        return len(records)
+
+    async def index_document(
+        self,
+        file_hash: str,
+        pages_path: str,
+        namespace: str = "",
+        document: Optional[dict] = None
+    ) -> int:
+        """Chunk, embed and index an extracted ``pages.jsonl`` file."""
+        def read_chunks() -> List[Chunk]:
+            with open(pages_path, encoding="utf-8") as f:
+                return list(chunk_pages((json.loads(line) for line in f), file_hash, document=document))
+
+        chunks = await run_blocking(read_chunks)
+        return await self.index_chunks(chunks, namespace=namespace)
+
+
+def create_embedding_backend() -> EmbeddingBackend:
+    """Build the backend selected by EMBEDDING_BACKEND."""
+    if settings.EMBEDDING_BACKEND == "openai":
+        return OpenAIEmbeddingBackend()
+    if settings.EMBEDDING_BACKEND == "sentence-transformers":
+        return SentenceTransformerBackend()
+    raise ValueError(f"Unknown embedding backend: {settings.EMBEDDING_BACKEND}")
@@ -0,0 +1,596 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from ..core.config import settings
+from ..models.pdf import ProcessingStatus
+from ..utils.concurrency import run_blocking
+from ..utils.metrics import track
+from .answer_cache import AnswerCache
+from .bigquery_loader import BulkLoader
+from .embeddings import DOCUMENT_FIELDS, EmbeddingPipeline
+from .firestore import FirestoreService
+from .job_queue import Job, JobQueue, JobScheduler, Lane
+from .lexical_index import BM25Index
+from .report_store import ReportStore, write_text_index
+from .storage import StorageService
+from .tables import write_tables
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_STAGE = "extract"
+EMBED_STAGE = "embed"
+
+
+def count_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF (runs in a worker process)."""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _object_digest(obj, memo: Dict[int, bytes]) -> bytes:
+    """
+    SHA-256 of a PDF object's content, following references.
+
+    Object numbers are not hashed, so the same resources hash alike in any
+    document; referenced objects are digested once per ``memo``.
+    """
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+    from pdfminer.psparser import PSKeyword, PSLiteral
+
+    if isinstance(obj, PDFObjRef):
+        if obj.objid not in memo:
+            memo[obj.objid] = b"cycle"  # Stands in for a reference back into an object being digested
+            memo[obj.objid] = _object_digest(obj.resolve(), memo)
+        return memo[obj.objid]
+    sha256_hash = hashlib.sha256()
+    if isinstance(obj, PDFStream):
+        data = obj.get_rawdata()  # Compressed bytes; no need to decode images or font programs
+        sha256_hash.update(b"stream")
+        sha256_hash.update(_object_digest(obj.attrs, memo))
+        sha256_hash.update(data if data is not None else obj.get_data())
+    elif isinstance(obj, dict):
+        sha256_hash.update(b"dict")
+        for key in sorted(obj, key=str):
+            sha256_hash.update(str(key).encode())
+            sha256_hash.update(_object_digest(obj[key], memo))
+    elif isinstance(obj, (list, tuple)):
+        sha256_hash.update(b"list")
+        for item in obj:
+            sha256_hash.update(_object_digest(item, memo))
+    elif isinstance(obj, (PSLiteral, PSKeyword)):
+        sha256_hash.update(b"name" + repr(obj.name).encode())
+    else:
+        sha256_hash.update(repr(obj).encode())
+    return sha256_hash.digest()
+
+
+def page_content_hash(page, memo: Optional[Dict[int, bytes]] = None) -> str:
+    """
+    Hash the raw drawing instructions of a pdfplumber page.
+
+    Covers the page's content streams, the page geometry and everything
+    its resources resolve to: fonts with their encodings, ToUnicode maps
+    and embedded programs, images, and form XObjects with their own
+    resources. Two pages hash alike only if they draw the same glyphs
+    with the same fonts, but document-level metadata is left out, so an
+    unchanged page hashes the same in every revision of a report. Pass
+    the same ``memo`` for pages of one document to digest shared
+    resources once.
+    """
+    from pdfminer.pdftypes import resolve1
+
+    page_obj = page.page_obj
+    sha256_hash = hashlib.sha256()
+    sha256_hash.update(repr((page.width, page.height, page.rotation)).encode())
+    for stream in page_obj.contents:
+        sha256_hash.update(resolve1(stream).get_data())
+    sha256_hash.update(_object_digest(page_obj.resources or {}, {} if memo is None else memo))
+    return sha256_hash.hexdigest()
+
+
+def _page_cache_path(cache_dir: str, page_hash: str) -> str:
+    return os.path.join(cache_dir, page_hash[:2], f"{page_hash}.json")
+
+
+def _read_cached_page(cache_path: str) -> Optional[dict]:
+    """A cached page result, marked recently used, or None (also if it is evicted meanwhile)."""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            result = json.load(f)
+        # The mtime is the report store's LRU clock for cached pages
+        os.utime(cache_path)
+    except FileNotFoundError:
+        return None
+    return result
+
+
+def extract_page_range(
+    pdf_path: str,
+    start: int,
+    end: int,
+    cache_dir: Optional[str] = None,
+    ocr_min_chars: int = 0
+) -> List[dict]:
+    """
+    Extract text and tables for pages [start, end) (runs in a worker process).
+
+    When ``cache_dir`` is given, results are cached by page content hash and
+    pages seen before (e.g. unchanged pages of a revised report) are reused
+    instead of being parsed again. Pages with images but fewer than
+    ``ocr_min_chars`` characters of text (scans) get ``'ocr': "needed"``.
+    """
+    import pdfplumber
+
+    results = []
+    memo: Dict[int, bytes] = {}
+    with pdfplumber.open(pdf_path, pages=range(start + 1, end + 1)) as pdf:
+        for page in pdf.pages:
+            page_hash = page_content_hash(page, memo)
+            cache_path = _page_cache_path(cache_dir, page_hash) if cache_dir else None
+            result = _read_cached_page(cache_path) if cache_path else None
+            if result is not None:
+                result['cached'] = True
+            else:
+                text = page.extract_text() or ""
+                result = {
+                    'page_hash': page_hash,
+                    'width': float(page.width),
+                    'height': float(page.height),
+                    'text': text,
+                    'tables': page.extract_tables(),
+                    'ocr': "needed" if len("".join(text.split())) < ocr_min_chars and page.images else None,
+                }
+                if cache_path:
+                    _write_atomic(cache_path, result)
+                result['cached'] = False
+            result['page_number'] = page.page_number
+            results.append(result)
+            page.close()  # Drop parsed layout objects before the next page
+    return results
+
+
+def ocr_page(pdf_path: str, page: dict, cache_dir: Optional[str], language: str, dpi: int, timeout: float) -> dict:
+    """
+    OCR one scanned page with Tesseract (runs in a worker process).
+
+    Sets the page's ``text`` and its ``ocr`` outcome: ``done``, ``timeout``
+    (Tesseract is killed after ``timeout`` seconds), ``failed`` or
+    ``unavailable`` (pytesseract or the tesseract binary is missing). Only
+    ``done`` results are written back to the page cache, so the others are
+    retried on the next run.
+    """
+    import pdfplumber
+
+    try:
+        import pytesseract
+    except ImportError:
+        return {**page, 'ocr': "unavailable"}
+
+    with pdfplumber.open(pdf_path, pages=[page['page_number']]) as pdf:
+        image = pdf.pages[0].to_image(resolution=dpi).original
+    try:
+        text = pytesseract.image_to_string(image, lang=language, timeout=timeout)
+    except pytesseract.TesseractNotFoundError:
+        return {**page, 'ocr': "unavailable"}
+    except RuntimeError as e:
+        # pytesseract reports its own timeout as a RuntimeError
+        return {**page, 'ocr': "timeout" if "timeout" in str(e).lower() else "failed"}
+    except pytesseract.TesseractError:
+        return {**page, 'ocr': "failed"}
+
+    page = {**page, 'text': text, 'ocr': "done"}
+    if cache_dir:
+        _write_atomic(
+            _page_cache_path(cache_dir, page['page_hash']),
+            {key: value for key, value in page.items() if key not in ('cached', 'page_number')}
+        )
+    return page
+
+
+def _write_atomic(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class ExtractionResult:
+    page_count: int
+    page_hashes: List[str] = field(default_factory=list)
+    reused_pages: int = 0
+    ocr_pages: int = 0  # Pages whose text came from OCR
+    ocr_failed_pages: List[int] = field(default_factory=list)  # Scans left without text
+
+
+def extract_to_jsonl(
+    pdf_path: str,
+    output_path: str,
+    executor: Executor,
+    pages_per_task: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    ocr: Optional[bool] = None
+) -> ExtractionResult:
+    """
+    Extract a PDF page-by-page on a process pool, writing one JSON line per page.
+
+    Only ``max_in_flight`` tasks are submitted at a time and each finished
+    range is written out immediately, so memory stays flat no matter how
+    many pages the document has. With ``ocr`` (default OCR_ENABLED), scanned
+    pages of a finished range are sent one by one to ``ocr_page`` on the
+    same pool. Tesseract is killed inside the worker once a page's OCR
+    overruns OCR_PAGE_TIMEOUT_SECONDS, and the page is written without text
+    rather than holding up the document or its worker.
+    """
+    pages_per_task = pages_per_task or settings.EXTRACTION_PAGES_PER_TASK
+    max_in_flight = max_in_flight or settings.EXTRACTION_WORKERS * 2
+    ocr = settings.OCR_ENABLED if ocr is None else ocr
+    page_count = executor.submit(count_pages, pdf_path).result()
+    ranges = [
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, pages_per_task)
+    ]
+
+    result = ExtractionResult(page_count=page_count, page_hashes=[""] * page_count)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        run = _ExtractionRun(pdf_path, executor, out, result, cache_dir, ocr)
+        for start, end in ranges:
+            while len(run.pending) >= max_in_flight:
+                run.wait(FIRST_COMPLETED)
+            run.submit(extract_page_range, pdf_path, start, end, cache_dir, settings.OCR_MIN_TEXT_CHARS)
+        while run.pending:
+            run.wait(ALL_COMPLETED)
+    os.replace(tmp_path, output_path)
+    result.ocr_failed_pages.sort()
+    return result
+
+
+class _ExtractionRun:
+    """The in-flight page range and OCR tasks of one ``extract_to_jsonl`` call."""
+
+    def __init__(self, pdf_path: str, executor: Executor, out, result: ExtractionResult, cache_dir, ocr: bool):
+        self.pdf_path = pdf_path
+        self.executor = executor
+        self.out = out
+        self.result = result
+        self.cache_dir = cache_dir
+        self.ocr = ocr
+        # OCR tasks map to their page, page range tasks to None
+        self.pending: Dict[Future, Optional[dict]] = {}
+
+    def submit(self, function, *args):
+        self.pending[self.executor.submit(function, *args)] = None
+
+    def wait(self, return_when: str):
+        done, _ = wait(self.pending, return_when=return_when)
+        for future in done:
+            scanned = self.pending.pop(future)
+            if scanned is None:
+                for page in future.result():
+                    self._page_parsed(page)
+                continue
+            try:
+                self._write(future.result())
+            except Exception:
+                logger.exception("OCR of page %d of %s failed", scanned['page_number'], self.pdf_path)
+                self._write({**scanned, 'ocr': "failed"})
+
+    def _page_parsed(self, page: dict):
+        if self.ocr and page.get('ocr') == "needed":
+            future = self.executor.submit(
+                ocr_page,
+                self.pdf_path,
+                page,
+                self.cache_dir,
+                settings.OCR_LANGUAGE,
+                settings.OCR_DPI,
+                settings.OCR_PAGE_TIMEOUT_SECONDS
+            )
+            self.pending[future] = page
+        else:
+            self._write(page)
+
+    def _write(self, page: dict):
+        result = self.result
+        result.page_hashes[page['page_number'] - 1] = page['page_hash']
+        result.reused_pages += page['cached']
+        if page.get('ocr') == "done":
+            result.ocr_pages += 1
+        elif page.get('ocr') is not None:
+            result.ocr_failed_pages.append(page['page_number'])
+        self.out.write(json.dumps(page, ensure_ascii=False))
+        self.out.write("\n")
+
+
+def build_report_row(file_hash: str, metadata: dict, pages_path: str, page_count: int) -> dict:
+    """Build a ``financial_reports`` row from an extracted document."""
+    tables = []
+    with open(pages_path, encoding="utf-8") as f:
+        for line in f:
+            page = json.loads(line)
+            if page['tables']:
+                tables.append({'page_number': page['page_number'], 'tables': page['tables']})
+    return {
+        'report_id': file_hash,
+        'report_date': metadata.get('report_date'),
+        'report_type': metadata.get('report_type'),
+        'company_name': metadata.get('company_name'),
+        'extracted_data': {'page_count': page_count, 'tables': tables},
+        'upload_timestamp': metadata.get('created_at'),
+        'source_file_path': metadata.get('storage_path'),
+    }
+
+
+class ExtractionService:
+    """
+    Background extraction pipeline fed by uploads.
+
+    Work is held in a durable JobQueue in two stages: ``extract`` (download
+    and parse) and, with an embedding pipeline, ``embed``. Each stage has
+    its own concurrency limit, failed jobs are retried with backoff, and
+    uploads from the interactive lane are processed before bulk ones. The
+    CPU-bound parsing runs on a ProcessPoolExecutor so it neither holds the
+    GIL nor blocks the event loop. Progress is recorded as a
+    ProcessingStatus on the file's ``pdf_files`` document and page results
+    are written to the file's ReportStore directory as ``pages.jsonl``; their
+    tables are normalized into typed values in ``tables.parquet`` and the
+    text is indexed for memory-mapped reads, after which the store evicts
+    least recently used reports over its size cap, keeping those whose
+    embed job has not finished. ``restore`` re-extracts an evicted report.
+
+    Page results are cached by page content hash under
+    ``PROCESSED_DATA_PATH/page_cache``, so a revised report only has its
+    changed pages parsed. The per-page hashes are stored on the metadata
+    document as ``page_hashes``.
+
+    If an embedding pipeline is given, the extracted text is chunked,
+    embedded and indexed before the file is marked done; with a lexical
+    index the chunks are also added to it, and its pending chunks are
+    merged to disk every ``LEXICAL_INDEX_MERGE_ROWS`` chunks and on stop. If a report
+    loader is given, a ``financial_reports`` row is buffered for it.
+    """
+
+    def __init__(
+        self,
+        storage_service: StorageService,
+        firestore_service: FirestoreService,
+        job_queue: JobQueue,
+        report_store: ReportStore,
+        embedding_pipeline: Optional[EmbeddingPipeline] = None,
+        report_loader: Optional[BulkLoader] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        lexical_index: Optional[BM25Index] = None
+    ):
+        settings.require("Extraction", "PDF_STORAGE_PATH", "PROCESSED_DATA_PATH")
+        self.storage_service = storage_service
+        self.firestore_service = firestore_service
+        self.report_store = report_store
+        self.embedding_pipeline = embedding_pipeline
+        self.report_loader = report_loader
+        self.answer_cache = answer_cache
+        self.lexical_index = lexical_index
+        self.scheduler = JobScheduler(job_queue)
+        self.scheduler.register(
+            EXTRACT_STAGE,
+            self._run_extract,
+            concurrency=settings.EXTRACTION_CONCURRENT_DOCUMENTS,
+            on_failure=self._record_failure
+        )
+        if embedding_pipeline is not None:
+            self.scheduler.register(
+                EMBED_STAGE,
+                self._run_embed,
+                concurrency=settings.EMBEDDING_CONCURRENT_DOCUMENTS,
+                on_failure=self._record_failure
+            )
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def start(self):
+        """Start the process pool and the stage workers."""
+        self._executor = ProcessPoolExecutor(max_workers=settings.EXTRACTION_WORKERS)
+        await self.scheduler.start()
+
+    async def stop(self):
+        """Stop the stage workers and shut the process pool down."""
+        await self.scheduler.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self.lexical_index is not None and self.lexical_index.pending_rows:
+            await run_blocking(self.lexical_index.flush)
+
+    async def check_capacity(self, lane: Lane = Lane.INTERACTIVE):
+        """Raise QueueSaturatedError if extraction cannot take more work in ``lane``."""
+        await self.scheduler.check_capacity(EXTRACT_STAGE, lane)
+
+    async def enqueue(self, file_hash: str, storage_path: str, lane: Lane = Lane.INTERACTIVE):
+        """
+        Queue an uploaded file for extraction.
+
+        Callers record the QUEUED status themselves, normally as part of the
+        metadata write that registers the upload.
+        """
+        await self.scheduler.enqueue(EXTRACT_STAGE, file_hash, {'storage_path': storage_path}, lane)
+
+    async def enqueue_many(self, files: Dict[str, str], lane: Lane = Lane.BULK):
+        """Queue many files (``file_hash -> storage_path``) in one transaction."""
+        await self.scheduler.enqueue_many(
+            EXTRACT_STAGE,
+            [(file_hash, {'storage_path': storage_path}) for file_hash, storage_path in files.items()],
+            lane
+        )
+
+    async def _run_extract(self, job: Job):
+        file_hash = job.key
+        restore = job.payload.get('restore', False)
+        if not restore:
+            await self.firestore_service.update_processing_status(
+                file_hash, ProcessingStatus.PROCESSING, "Extracting pages"
+            )
+        # Pinned until the embed job is queued; from then on eviction keeps it until that job finishes
+        with self.report_store.pinned(file_hash):
+            result = await self.extract(file_hash, job.payload['storage_path'])
+            message = f"Extraction complete ({result.reused_pages} of {result.page_count} pages reused"
+            if result.ocr_pages:
+                message += f", {result.ocr_pages} pages OCR'd"
+            if result.ocr_failed_pages:
+                message += f", {len(result.ocr_failed_pages)} scanned pages without text"
+            try:
+                with track("extraction", "tables"):
+                    value_count = await asyncio.wrap_future(self._executor.submit(
+                        write_tables,
+                        self.report_store.pages_path(file_hash),
+                        self.report_store.tables_path(file_hash)
+                    ))
+                message += f", {value_count} table values)"
+            except Exception:
+                # Tables can be rebuilt from pages.jsonl; do not fail the document for them
+                logger.exception("Table normalization failed for %s", file_hash)
+                message += ", tables failed)"
+            with track("extraction", "index") as span:
+                span.bytes = await asyncio.wrap_future(self._executor.submit(
+                    write_text_index,
+                    self.report_store.report_dir(file_hash),
+                    settings.EMBEDDING_CHUNK_SIZE,
+                    settings.EMBEDDING_CHUNK_OVERLAP
+                ))
+            fields = {
+                'page_hashes': result.page_hashes,
+                'ocr_pages': result.ocr_pages,
+                'ocr_failed_pages': result.ocr_failed_pages,
+            }
+            if restore:
+                # Its chunks are still indexed and its status is still done
+                logger.info("Restored evicted report %s: %s", file_hash, message)
+            elif self.embedding_pipeline is None:
+                await self._finish(file_hash, message, result.page_count, **fields)
+            else:
+                await self.firestore_service.update_processing_status(
+                    file_hash,
+                    ProcessingStatus.PROCESSING,
+                    "Waiting for embedding",
+                    page_count=result.page_count,
+                    **fields
+                )
+                await self.scheduler.enqueue(
+                    EMBED_STAGE, file_hash, {'message': message, 'page_count': result.page_count}, job.lane
+                )
+        await self._evict()
+
+    async def _evict(self):
+        """Evict least recently used reports, keeping the ones waiting for their embed job."""
+        keep = await self.scheduler.keys(EMBED_STAGE) if self.embedding_pipeline is not None else set()
+        await run_blocking(self.report_store.evict, keep)
+
+    async def restore(self, file_hash: str) -> bool:
+        """
+        Queue an evicted report for extraction again; False if the file was never processed.
+
+        Only the report store entry is rebuilt: the file keeps its done
+        status and its chunks are not embedded again.
+        """
+        metadata = await self.firestore_service.get_file_metadata(file_hash)
+        if not metadata or metadata.get('status') != ProcessingStatus.DONE.value or not metadata.get('storage_path'):
+            return False
+        await self.scheduler.enqueue(
+            EXTRACT_STAGE, file_hash, {'storage_path': metadata['storage_path'], 'restore': True}
+        )
+        return True
+
+    async def _run_embed(self, job: Job):
+        file_hash = job.key
+        await self.firestore_service.update_processing_status(
+            file_hash, ProcessingStatus.PROCESSING, "Embedding chunks"
+        )
+        metadata = await self.firestore_service.get_file_metadata(file_hash) or {}
+        document = {field: str(metadata[field]) for field in DOCUMENT_FIELDS if metadata.get(field)}
+        with self.report_store.pinned(file_hash), track("extraction", "embed"):
+            report = await run_blocking(self.report_store.open, file_hash)
+            chunks = await run_blocking(lambda: list(report.chunks(document)))
+            chunk_count = await self.embedding_pipeline.index_chunks(chunks)
+        if self.lexical_index is not None:
+            with track("extraction", "lexical_index"):
+                await run_blocking(
+                    self.lexical_index.replace_file,
+                    file_hash,
+                    [(chunk.chunk_id, chunk.text, chunk.metadata) for chunk in chunks]
+                )
+                if self.lexical_index.pending_rows >= settings.LEXICAL_INDEX_MERGE_ROWS:
+                    await run_blocking(self.lexical_index.flush)
+        if self.answer_cache is not None:
+            # Cached answers may quote the previous version of this file
+            self.answer_cache.invalidate(file_hash)
+        await self._finish(
+            file_hash, f"{job.payload['message']}; {chunk_count} chunks indexed", job.payload['page_count']
+        )
+
+    async def _record_failure(self, job: Job, error: Exception, will_retry: bool):
+        if job.payload.get('restore'):
+            return  # The file itself is still done
+        step = "Extraction" if job.stage == EXTRACT_STAGE else "Embedding"
+        if will_retry:
+            await self.firestore_service.update_processing_status(
+                job.key, ProcessingStatus.QUEUED, f"{step} failed, retrying: {error}"
+            )
+        else:
+            await self.firestore_service.update_processing_status(
+                job.key, ProcessingStatus.FAILED, f"{step} failed: {error}"
+            )
+
+    async def extract(self, file_hash: str, storage_path: str) -> ExtractionResult:
+        """Download one file and extract its pages to ``pages.jsonl``."""
+        os.makedirs(settings.PDF_STORAGE_PATH, exist_ok=True)
+        pdf_path = os.path.join(settings.PDF_STORAGE_PATH, f"{file_hash}.pdf")
+        pages_path = self.report_store.pages_path(file_hash)
+        os.makedirs(os.path.dirname(pages_path), exist_ok=True)
+
+        try:
+            blob = self.storage_service.bucket.blob(storage_path)
+            with track("extraction", "download") as span:
+                await run_blocking(blob.download_to_filename, pdf_path)
+                span.bytes = os.path.getsize(pdf_path)
+            with track("extraction", "extract") as span:
+                result = await run_blocking(
+                    extract_to_jsonl,
+                    pdf_path,
+                    pages_path,
+                    self._executor,
+                    cache_dir=self.report_store.page_cache_dir
+                )
+                span.bytes = os.path.getsize(pdf_path)
+        finally:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+        return result
+
+    async def _finish(self, file_hash: str, message: str, page_count: int, **fields):
+        """Buffer the report row, if loading is enabled, and mark the file done."""
+        if self.report_loader is not None:
+            try:
+                metadata = await self.firestore_service.get_file_metadata(file_hash) or {}
+                row = await run_blocking(
+                    build_report_row, file_hash, metadata, self.report_store.pages_path(file_hash), page_count
+                )
+                with track("extraction", "load"):
+                    await self.report_loader.add(row)
+            except Exception:
+                # The row can be rebuilt from pages.jsonl by a backfill
+                logger.exception("Buffering report row failed for %s", file_hash)
+
+        await self.firestore_service.update_processing_status(
+            file_hash,
+            ProcessingStatus.DONE,
+            message,
+            page_count=page_count,
+            **fields
+        )
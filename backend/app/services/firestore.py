@@ -1,26 +1,385 @@
-from google.cloud import firestore
-from google.oauth2 import service_account
+import asyncio
+import logging
 from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from ..core.config import settings
+from ..models.pdf import ProcessingStatus
+from ..utils.metrics import track
+from .dedup import BloomFilter, DedupCache
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of writes Firestore accepts in one batch commit
+FIRESTORE_BATCH_LIMIT = 500
+# Fields returned by list_files; large ones such as page_hashes are not transferred
+LISTING_FIELDS = [
+    'file_name', 'aliases', 'file_size', 'storage_path', 'status', 'company_name', 'page_count', 'created_at'
+]
+
+
+class DuplicateFileError(Exception):
+    """Metadata for this file hash has already been stored."""
+
+
+class MetadataWriteBuffer:
+    """
+    Write-behind buffer for merge writes to ``pdf_files`` documents.
+
+    Writes to the same document are coalesced (later fields win), so a
+    file that goes queued -> processing -> done between flushes costs one
+    write. Pending documents are committed in batches of up to
+    FIRESTORE_BATCH_LIMIT writes when ``max_writes`` are pending, every
+    ``flush_interval`` seconds, and on stop.
+    """
+
+    def __init__(self, db, max_writes: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.db = db
+        self.max_writes = min(max_writes or settings.FIRESTORE_WRITE_BATCH_SIZE, FIRESTORE_BATCH_LIMIT)
+        self.flush_interval = flush_interval or settings.FIRESTORE_WRITE_FLUSH_SECONDS
+        self._buffer: Dict[str, dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self.writes_buffered = 0
+        self.writes_committed = 0
+        self.batches_committed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._timer is not None
+
+    async def start(self):
+        self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            await asyncio.gather(self._timer, return_exceptions=True)
+            self._timer = None
+        await self.flush()
+
+    def pending(self, file_hash: str) -> Optional[dict]:
+        """Fields written for ``file_hash`` that are not committed yet."""
+        return self._buffer.get(file_hash)
+
+    async def add(self, file_hash: str, fields: dict):
+        self._buffer[file_hash] = {**self._buffer.get(file_hash, {}), **fields}
+        self.writes_buffered += 1
+        if len(self._buffer) >= self.max_writes:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                hashes = list(self._buffer)[:self.max_writes]
+                writes = {file_hash: self._buffer.pop(file_hash) for file_hash in hashes}
+                collection = self.db.collection('pdf_files')
+                batch = self.db.batch()
+                for file_hash, fields in writes.items():
+                    batch.set(collection.document(file_hash), fields, merge=True)
+                try:
+                    with track("firestore", "batch_commit"):
+                        await batch.commit()
+                except Exception:
+                    # Put the batch back under any newer writes; merge writes are safe to repeat
+                    for file_hash, fields in writes.items():
+                        self._buffer[file_hash] = {**fields, **self._buffer.get(file_hash, {})}
+                    raise
+                self.writes_committed += len(writes)
+                self.batches_committed += 1
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Periodic flush of metadata writes failed")
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._buffer),
+            'writes_buffered': self.writes_buffered,
+            'writes_committed': self.writes_committed,
+            'batches_committed': self.batches_committed,
+        }
+
 
 class FirestoreService:
-    def __init__(self):
-        credentials = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_APPLICATION_CREDENTIALS
-        )
-        self.db = firestore.Client(
+    def __init__(self, dedup_cache: Optional[DedupCache] = None):
+        # Imported here so the client library only loads when Firestore is used
+        from google.cloud import firestore
+        from google.oauth2 import service_account
+
+        settings.require("Firestore", "GOOGLE_CLOUD_PROJECT")
+        credentials = None
+        if settings.GOOGLE_APPLICATION_CREDENTIALS:
+            credentials = service_account.Credentials.from_service_account_file(
+                settings.GOOGLE_APPLICATION_CREDENTIALS
+            )
+        # Native asyncio client so lookups never block the event loop
+        self.db = firestore.AsyncClient(
             credentials=credentials,
             project=settings.GOOGLE_CLOUD_PROJECT
         )
-    
+        self.dedup_cache = dedup_cache or DedupCache(
+            max_size=settings.DEDUP_CACHE_SIZE,
+            ttl_seconds=settings.DEDUP_CACHE_TTL_SECONDS,
+            bloom=BloomFilter(
+                settings.DEDUP_BLOOM_CAPACITY,
+                settings.DEDUP_BLOOM_ERROR_RATE
+            ) if settings.DEDUP_BLOOM_ENABLED else None
+        )
+        self.write_buffer = MetadataWriteBuffer(self.db) if settings.FIRESTORE_WRITE_BEHIND else None
+
+    async def start(self):
+        """Start the write-behind buffer; until then metadata writes go straight to Firestore."""
+        if self.write_buffer is not None:
+            await self.write_buffer.start()
+
+    async def stop(self):
+        """Commit buffered metadata writes."""
+        if self.write_buffer is not None:
+            await self.write_buffer.stop()
+
+    def _buffering(self) -> bool:
+        return self.write_buffer is not None and self.write_buffer.running
+
+    def _with_pending(self, file_hash: str, metadata: Optional[dict]) -> Optional[dict]:
+        """``metadata`` with the buffered writes for ``file_hash`` applied, so reads see them."""
+        pending = self.write_buffer.pending(file_hash) if self.write_buffer is not None else None
+        if pending is None:
+            return metadata
+        return {**(metadata or {}), **pending}
+
     async def check_duplicate(self, file_hash: str) -> bool:
         """Check if file hash already exists."""
+        cached = self.dedup_cache.lookup(file_hash)
+        if cached is not None:
+            return cached
+
         doc_ref = self.db.collection('pdf_files').document(file_hash)
-        doc = doc_ref.get()
+        doc = await doc_ref.get()
+        if doc.exists:
+            self.dedup_cache.add(file_hash)
         return doc.exists
-    
+
     async def store_file_metadata(self, file_hash: str, metadata: dict):
-        """Store file metadata in Firestore."""
+        """
+        Store file metadata in Firestore.
+
+        The document is created only if it does not exist, so of two
+        concurrent uploads of the same content exactly one is recorded; the
+        other gets DuplicateFileError.
+        """
+        from google.api_core import exceptions
+
         doc_ref = self.db.collection('pdf_files').document(file_hash)
         metadata['created_at'] = datetime.now()
-        doc_ref.set(metadata) 
\ No newline at end of file
+        try:
+            await doc_ref.create(metadata)
+        except exceptions.AlreadyExists:
+            self.dedup_cache.add(file_hash)
+            raise DuplicateFileError(file_hash)
+        self.dedup_cache.add(file_hash)
+
+    async def check_duplicates(self, file_hashes: Iterable[str]) -> Set[str]:
+        """Return the hashes that already exist, using one batched lookup."""
+        existing = set()
+        unknown = []
+        for file_hash in dict.fromkeys(file_hashes):
+            cached = self.dedup_cache.lookup(file_hash)
+            if cached:
+                existing.add(file_hash)
+            elif cached is None:
+                unknown.append(file_hash)
+
+        if unknown:
+            collection = self.db.collection('pdf_files')
+            refs = [collection.document(file_hash) for file_hash in unknown]
+            async for doc in self.db.get_all(refs):
+                if doc.exists:
+                    existing.add(doc.id)
+                    self.dedup_cache.add(doc.id)
+        return existing
+
+    async def store_many_file_metadata(self, items: Dict[str, dict]) -> Set[str]:
+        """
+        Store metadata for many files in batched commits.
+
+        As in ``store_file_metadata``, documents are only ever created, so a
+        file recorded concurrently (e.g. by another upload) is not
+        overwritten. Firestore rejects a whole batch if one of its documents
+        exists; that batch is then retried one file at a time. Returns the
+        hashes that already had a document.
+        """
+        from google.api_core import exceptions
+
+        collection = self.db.collection('pdf_files')
+        created_at = datetime.now()
+        entries = list(items.items())
+        duplicates: Set[str] = set()
+        for start in range(0, len(entries), FIRESTORE_BATCH_LIMIT):
+            chunk = entries[start:start + FIRESTORE_BATCH_LIMIT]
+            batch = self.db.batch()
+            for file_hash, metadata in chunk:
+                metadata['created_at'] = created_at
+                batch.create(collection.document(file_hash), metadata)
+            try:
+                await batch.commit()
+            except exceptions.AlreadyExists:
+                results = await asyncio.gather(
+                    *(self.store_file_metadata(file_hash, metadata) for file_hash, metadata in chunk),
+                    return_exceptions=True
+                )
+                for (file_hash, _), result in zip(chunk, results):
+                    if isinstance(result, DuplicateFileError):
+                        duplicates.add(file_hash)
+                    elif isinstance(result, Exception):
+                        raise result
+            for file_hash, _ in chunk:
+                self.dedup_cache.add(file_hash)
+        return duplicates
+
+    async def get_many_file_metadata(self, file_hashes: Iterable[str]) -> Dict[str, dict]:
+        """Metadata of the known files among ``file_hashes``, in one batched lookup."""
+        collection = self.db.collection('pdf_files')
+        hashes = list(dict.fromkeys(file_hashes))
+        if not hashes:
+            return {}
+        found = {
+            doc.id: doc.to_dict()
+            async for doc in self.db.get_all([collection.document(file_hash) for file_hash in hashes])
+            if doc.exists
+        }
+        return {
+            file_hash: metadata
+            for file_hash in hashes
+            if (metadata := self._with_pending(file_hash, found.get(file_hash))) is not None
+        }
+
+    async def update_many_file_metadata(self, items: Dict[str, dict]):
+        """Merge fields into many metadata documents in batched commits."""
+        if self._buffering():
+            for file_hash, fields in items.items():
+                await self.write_buffer.add(file_hash, fields)
+            return
+        collection = self.db.collection('pdf_files')
+        entries = list(items.items())
+        for start in range(0, len(entries), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for file_hash, fields in entries[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.set(collection.document(file_hash), fields, merge=True)
+            await batch.commit()
+
+    async def add_aliases(self, aliases: Dict[str, Iterable[str]]):
+        """
+        Record more names a stored file was uploaded under.
+
+        Each ``pdf_files`` document keeps an ``aliases`` array, the manifest
+        of every name its content-addressed object is known by, so re-uploads
+        under a new name need no copy in storage. The documents must exist.
+        """
+        from google.cloud import firestore
+
+        collection = self.db.collection('pdf_files')
+        entries = [(file_hash, list(names)) for file_hash, names in aliases.items() if names]
+        for start in range(0, len(entries), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for file_hash, names in entries[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.update(collection.document(file_hash), {'aliases': firestore.ArrayUnion(names)})
+            await batch.commit()
+
+    async def list_files(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        file_name: Optional[str] = None,
+        status: Optional[str] = None,
+        company_name: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Page through stored files, newest first, from the metadata index.
+
+        ``cursor`` is the hash of the last file of the previous page and
+        ``file_name`` matches any alias. Each equality filter is served by a
+        composite index on (field, created_at) from firestore.indexes.json;
+        Firestore merges them for combined filters. Only LISTING_FIELDS are
+        read. Returns the page and the cursor of the next page (None on the
+        last page).
+        """
+        from google.cloud import firestore
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        collection = self.db.collection('pdf_files')
+        query = collection
+        if file_name:
+            query = query.where(filter=FieldFilter('aliases', 'array_contains', file_name))
+        if status:
+            query = query.where(filter=FieldFilter('status', '==', status))
+        if company_name:
+            query = query.where(filter=FieldFilter('company_name', '==', company_name))
+        if created_after:
+            query = query.where(filter=FieldFilter('created_at', '>=', created_after))
+        if created_before:
+            query = query.where(filter=FieldFilter('created_at', '<', created_before))
+        query = query.order_by('created_at', direction=firestore.Query.DESCENDING).select(LISTING_FIELDS)
+        if cursor:
+            last = await collection.document(cursor).get(field_paths=['created_at'])
+            if not last.exists:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            query = query.start_after(last)
+
+        # One extra document tells whether there is a next page
+        docs = [doc async for doc in query.limit(limit + 1).stream()]
+        page = [{'file_hash': doc.id, **doc.to_dict()} for doc in docs[:limit]]
+        next_cursor = page[-1]['file_hash'] if len(docs) > limit else None
+        return page, next_cursor
+
+    async def update_processing_status(
+        self,
+        file_hash: str,
+        status: ProcessingStatus,
+        message: str,
+        **fields
+    ):
+        """
+        Record the processing status of a file on its metadata document.
+
+        Once the service is started, the write goes through the write-behind
+        buffer and reaches Firestore with the next batch commit. Final
+        statuses (done, failed) are committed before this returns: the job
+        that reports them is deleted next, and nothing would rewrite a
+        status lost with the process.
+        """
+        fields = {
+            'status': ProcessingStatus(status).value,
+            'status_message': message,
+            'status_updated_at': datetime.now(),
+            **fields
+        }
+        if self._buffering():
+            await self.write_buffer.add(file_hash, fields)
+            if status in (ProcessingStatus.DONE, ProcessingStatus.FAILED):
+                await self.write_buffer.flush()
+            return
+        await self.db.collection('pdf_files').document(file_hash).set(fields, merge=True)
+
+    async def get_file_metadata(self, file_hash: str) -> Optional[dict]:
+        """Return the metadata document for a file, or None if it is unknown."""
+        doc = await self.db.collection('pdf_files').document(file_hash).get()
+        return self._with_pending(file_hash, doc.to_dict() if doc.exists else None)
+
+    async def warm_dedup_cache(self):
+        """Load every known file hash into the dedup Bloom filter."""
+        bloom = self.dedup_cache.bloom
+        if bloom is None:
+            return
+        from google.cloud.firestore_v1.field_path import FieldPath
+
+        # Project onto the document name only; no field data is transferred
+        query = self.db.collection('pdf_files').select([FieldPath.document_id()])
+        async for doc in query.stream():
+            bloom.add(doc.id)
+        self.dedup_cache.bloom_ready = True
@@ -0,0 +1,377 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from ..core.config import settings
+from ..utils.concurrency import backoff_delay, run_blocking
+from ..utils.metrics import JOB_OUTCOMES, QUEUE_JOBS, QUEUE_OLDEST_SECONDS, QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("queued", "running", "failed")
+
+
+class Lane(IntEnum):
+    """Priority lanes of a stage; lower values are always claimed first."""
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class QueueSaturatedError(Exception):
+    """A stage has too many waiting jobs in a lane to accept more work."""
+
+    def __init__(self, stage: str, lane: Lane, depth: int):
+        super().__init__(f"The {stage} queue is saturated ({depth} {lane.name.lower()} jobs waiting)")
+        self.stage = stage
+        self.lane = lane
+        self.depth = depth
+
+
+@dataclass
+class Job:
+    job_id: int
+    stage: str
+    key: str
+    lane: Lane
+    payload: dict
+    attempts: int  # Including the current one
+    enqueued_at: float
+
+
+class JobQueue:
+    """
+    Durable job queue backed by SQLite.
+
+    A job belongs to a stage and is identified by a key (e.g. the file hash)
+    that is queued at most once per stage. Claims are leases: a worker
+    renews the lease while it runs a job, and a job whose worker died is
+    claimable again once the lease expires, so queued work survives crashes
+    and restarts. Several processes may share the database file. Within a
+    stage, interactive jobs are always claimed before bulk ones.
+    Finished jobs are deleted; jobs out of attempts stay as ``failed``.
+    """
+
+    def __init__(self, path: str, lease_seconds: Optional[float] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " stage TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " lane INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " enqueued_at REAL NOT NULL,"
+            " available_at REAL NOT NULL,"
+            " lease_until REAL,"
+            " last_error TEXT,"
+            " UNIQUE (stage, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (stage, state, lane, available_at)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def enqueue(self, stage: str, key: str, payload: dict, lane: Lane = Lane.INTERACTIVE):
+        self.enqueue_many(stage, [(key, payload)], lane)
+
+    def enqueue_many(self, stage: str, jobs: Iterable[Tuple[str, dict]], lane: Lane = Lane.INTERACTIVE):
+        """
+        Queue jobs in one transaction.
+
+        A key that is already queued or running is not queued twice, but is
+        promoted to ``lane`` if that is more urgent; a failed one is reset
+        and queued again.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO jobs (stage, key, lane, payload, state, enqueued_at, available_at)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?)"
+                " ON CONFLICT (stage, key) DO UPDATE SET"
+                "  lane = MIN(lane, excluded.lane),"
+                "  payload = CASE WHEN state = 'failed' THEN excluded.payload ELSE payload END,"
+                "  attempts = CASE WHEN state = 'failed' THEN 0 ELSE attempts END,"
+                "  enqueued_at = CASE WHEN state = 'failed' THEN excluded.enqueued_at ELSE enqueued_at END,"
+                "  available_at = CASE WHEN state = 'failed' THEN excluded.available_at ELSE available_at END,"
+                "  state = CASE WHEN state = 'failed' THEN 'queued' ELSE state END",
+                [(stage, key, int(lane), json.dumps(payload), now, now) for key, payload in jobs]
+            )
+            self._conn.commit()
+
+    def claim(self, stage: str) -> Optional[Job]:
+        """Lease the most urgent available job of a stage, or return None."""
+        now = time.time()
+        with self._lock:
+            # A single UPDATE ... RETURNING is atomic across processes sharing the file
+            row = self._conn.execute(
+                "UPDATE jobs SET state = 'running', lease_until = ?, attempts = attempts + 1"
+                " WHERE job_id = ("
+                "  SELECT job_id FROM jobs WHERE stage = ? AND ("
+                "   (state = 'queued' AND available_at <= ?)"
+                "   OR (state = 'running' AND lease_until < ?))"
+                "  ORDER BY lane, available_at, job_id LIMIT 1)"
+                " RETURNING job_id, stage, key, lane, payload, attempts, enqueued_at",
+                (now + self.lease_seconds, stage, now, now)
+            ).fetchone()
+            self._conn.commit()
+        if row is None:
+            return None
+        job_id, stage, key, lane, payload, attempts, enqueued_at = row
+        return Job(job_id, stage, key, Lane(lane), json.loads(payload), attempts, enqueued_at)
+
+    def renew(self, job_id: int):
+        """Extend the lease of a running job."""
+        self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND state = 'running'",
+            (time.time() + self.lease_seconds, job_id)
+        )
+
+    def complete(self, job_id: int):
+        self._execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def retry(self, job_id: int, delay: float, error: str):
+        """Queue a job again after ``delay`` seconds."""
+        self._execute(
+            "UPDATE jobs SET state = 'queued', lease_until = NULL, available_at = ?, last_error = ?"
+            " WHERE job_id = ?",
+            (time.time() + delay, error, job_id)
+        )
+
+    def release(self, job_id: int):
+        """Return an interrupted job to the queue without counting the attempt."""
+        self._execute(
+            "UPDATE jobs SET state = 'queued', lease_until = NULL, attempts = MAX(attempts - 1, 0)"
+            " WHERE job_id = ?",
+            (job_id,)
+        )
+
+    def fail(self, job_id: int, error: str):
+        """Give up on a job; it is kept as ``failed`` until it is enqueued again."""
+        self._execute(
+            "UPDATE jobs SET state = 'failed', lease_until = NULL, last_error = ? WHERE job_id = ?",
+            (error, job_id)
+        )
+
+    def keys(self, stage: str) -> Set[str]:
+        """Keys of the jobs of a stage that are queued or running."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM jobs WHERE stage = ? AND state != 'failed'", (stage,)
+            ).fetchall()
+        return {key for key, in rows}
+
+    def depth(self, stage: str, lane: Lane) -> int:
+        """Number of jobs waiting (not yet running) in one lane of a stage."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE stage = ? AND state = 'queued' AND lane = ?",
+                (stage, int(lane))
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Dict[str, dict]]:
+        """Job counts per state and the oldest waiting job's age, per stage and lane."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, lane, state, COUNT(*), MIN(enqueued_at) FROM jobs GROUP BY stage, lane, state"
+            ).fetchall()
+        stats: Dict[str, Dict[str, dict]] = {}
+        for stage, lane, state, count, oldest in rows:
+            entry = stats.setdefault(stage, {}).setdefault(
+                Lane(lane).name.lower(), {**dict.fromkeys(JOB_STATES, 0), 'oldest_seconds': 0.0}
+            )
+            entry[state] = count
+            if state == "queued":
+                entry['oldest_seconds'] = round(now - oldest, 3)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+
+JobHandler = Callable[[Job], Awaitable[None]]
+FailureHandler = Callable[[Job, Exception, bool], Awaitable[None]]
+
+
+@dataclass
+class _Stage:
+    name: str
+    handler: JobHandler
+    concurrency: int
+    max_attempts: int
+    on_failure: Optional[FailureHandler]
+
+
+class JobScheduler:
+    """
+    Runs registered stage handlers on jobs claimed from a JobQueue.
+
+    Each stage gets ``concurrency`` asyncio workers, which is its limit on
+    jobs in flight. A handler that raises is retried with exponential
+    backoff until ``max_attempts``; ``on_failure(job, error, will_retry)``
+    lets the stage record that. Workers poll the queue every
+    ``JOB_POLL_SECONDS`` and are woken at once by jobs enqueued through
+    the scheduler. ``check_capacity`` is the backpressure hook: producers
+    call it before accepting work and get QueueSaturatedError when a lane
+    already holds ``JOB_QUEUE_MAX_DEPTH`` waiting jobs.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        max_depth: Optional[int] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.queue = queue
+        self.max_depth = max_depth or settings.JOB_QUEUE_MAX_DEPTH
+        self.poll_interval = poll_interval or settings.JOB_POLL_SECONDS
+        self._stages: Dict[str, _Stage] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def register(
+        self,
+        stage: str,
+        handler: JobHandler,
+        concurrency: int,
+        max_attempts: Optional[int] = None,
+        on_failure: Optional[FailureHandler] = None
+    ):
+        self._stages[stage] = _Stage(
+            stage, handler, concurrency, max_attempts or settings.JOB_MAX_ATTEMPTS, on_failure
+        )
+
+    async def start(self):
+        for stage in self._stages.values():
+            self._wakeups[stage.name] = asyncio.Event()
+            self._workers.extend(
+                asyncio.create_task(self._work(stage)) for _ in range(stage.concurrency)
+            )
+        self._workers.append(asyncio.create_task(self._publish_metrics()))
+
+    async def stop(self):
+        """Cancel the workers; interrupted jobs go back to the queue."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enqueue(self, stage: str, key: str, payload: dict, lane: Lane = Lane.INTERACTIVE):
+        await run_blocking(self.queue.enqueue, stage, key, payload, lane)
+        self._wake(stage)
+
+    async def enqueue_many(self, stage: str, jobs: List[Tuple[str, dict]], lane: Lane = Lane.INTERACTIVE):
+        if jobs:
+            await run_blocking(self.queue.enqueue_many, stage, jobs, lane)
+            self._wake(stage)
+
+    async def check_capacity(self, stage: str, lane: Lane = Lane.INTERACTIVE):
+        """Raise QueueSaturatedError if the lane cannot take more work right now."""
+        depth = await run_blocking(self.queue.depth, stage, lane)
+        if depth >= self.max_depth:
+            raise QueueSaturatedError(stage, lane, depth)
+
+    async def stats(self) -> Dict[str, Dict[str, dict]]:
+        return await run_blocking(self.queue.stats)
+
+    async def keys(self, stage: str) -> Set[str]:
+        """Keys of the queued and running jobs of a stage."""
+        return await run_blocking(self.queue.keys, stage)
+
+    def _wake(self, stage: str):
+        wakeup = self._wakeups.get(stage)
+        if wakeup is not None:
+            wakeup.set()
+
+    async def _work(self, stage: _Stage):
+        wakeup = self._wakeups[stage.name]
+        while True:
+            try:
+                job = await run_blocking(self.queue.claim, stage.name)
+            except Exception:
+                logger.exception("Claiming a %s job failed", stage.name)
+                job = None
+            if job is None:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if job.attempts == 1:
+                QUEUE_WAIT_SECONDS.labels(stage.name, job.lane.name.lower()).observe(time.time() - job.enqueued_at)
+            await self._run(stage, job)
+
+    async def _run(self, stage: _Stage, job: Job):
+        renewer = asyncio.create_task(self._renew_lease(job))
+        try:
+            await stage.handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back instead of waiting out its lease. The
+            # release runs on the I/O pool (SQLite may wait on a lock held by another
+            # process) and is shielded so a second cancellation cannot abandon it
+            await asyncio.shield(run_blocking(self.queue.release, job.job_id))
+            raise
+        except Exception as e:
+            will_retry = job.attempts < stage.max_attempts
+            logger.exception(
+                "%s job %s failed (attempt %d/%d)", stage.name, job.key, job.attempts, stage.max_attempts
+            )
+            if will_retry:
+                delay = backoff_delay(job.attempts - 1, settings.JOB_RETRY_BASE_SECONDS, settings.JOB_RETRY_MAX_SECONDS)
+                await run_blocking(self.queue.retry, job.job_id, delay, repr(e))
+                JOB_OUTCOMES.labels(stage.name, "retried").inc()
+            else:
+                await run_blocking(self.queue.fail, job.job_id, repr(e))
+                JOB_OUTCOMES.labels(stage.name, "failed").inc()
+            if stage.on_failure is not None:
+                try:
+                    await stage.on_failure(job, e, will_retry)
+                except Exception:
+                    logger.exception("Failure handler of %s job %s failed", stage.name, job.key)
+        else:
+            await run_blocking(self.queue.complete, job.job_id)
+            JOB_OUTCOMES.labels(stage.name, "done").inc()
+        finally:
+            renewer.cancel()
+
+    async def _renew_lease(self, job: Job):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await run_blocking(self.queue.renew, job.job_id)
+            except Exception:
+                logger.exception("Renewing the lease of %s job %s failed", job.stage, job.key)
+
+    async def _publish_metrics(self):
+        # Gauges for autoscaling; refreshed from the database so other processes' jobs count too
+        while True:
+            try:
+                stats = await self.stats()
+                for stage in self._stages:
+                    for lane in Lane:
+                        entry = stats.get(stage, {}).get(lane.name.lower(), {})
+                        for state in JOB_STATES:
+                            QUEUE_JOBS.labels(stage, lane.name.lower(), state).set(entry.get(state, 0))
+                        QUEUE_OLDEST_SECONDS.labels(stage, lane.name.lower()).set(entry.get('oldest_seconds', 0))
+            except Exception:
+                logger.exception("Publishing queue metrics failed")
+            await asyncio.sleep(max(self.poll_interval, 5))
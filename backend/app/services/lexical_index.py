@@ -0,0 +1,329 @@
+import json
+import os
+import re
+import shutil
+import threading
+from contextlib import suppress
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from .vector_store import VectorMatch
+
+# Keeps account numbers, GL codes and amounts whole: "4010-200", "gl.1234", "1,234.5"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./,'][a-z0-9]+)*")
+MAX_TF = np.iinfo(np.uint16).max
+POSTINGS = ("term_offsets", "doc_rows", "tfs")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _Postings:
+    """Postings of a set of documents, grouped by term id (CSR layout)."""
+
+    def __init__(self, term_offsets: np.ndarray, doc_rows: np.ndarray, tfs: np.ndarray):
+        self.term_offsets = term_offsets
+        self.doc_rows = doc_rows
+        self.tfs = tfs
+
+    @classmethod
+    def build(cls, term_ids: np.ndarray, doc_rows: np.ndarray, tfs: np.ndarray, vocabulary_size: int) -> "_Postings":
+        order = np.lexsort((doc_rows, term_ids))
+        counts = np.bincount(term_ids, minlength=vocabulary_size)
+        term_offsets = np.zeros(vocabulary_size + 1, dtype=np.int64)
+        np.cumsum(counts, out=term_offsets[1:])
+        return cls(term_offsets, doc_rows[order].astype(np.int32), tfs[order].astype(np.uint16))
+
+    @classmethod
+    def empty(cls) -> "_Postings":
+        return cls(np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16))
+
+    def to_coo(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        term_ids = np.repeat(np.arange(len(self.term_offsets) - 1), np.diff(self.term_offsets))
+        return term_ids, np.asarray(self.doc_rows), np.asarray(self.tfs)
+
+    def lookup(self, term_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(term position, doc rows, tfs)`` of all postings of ``term_ids``."""
+        known = term_ids[term_ids < len(self.term_offsets) - 1]
+        starts, ends = self.term_offsets[known], self.term_offsets[known + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+        # Flat indices of every posting of every term, without a Python loop per term
+        index = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        positions = np.repeat(np.flatnonzero(term_ids < len(self.term_offsets) - 1), lengths)
+        return positions, self.doc_rows[index], self.tfs[index]
+
+
+class BM25Index:
+    """
+    Local BM25 inverted index over chunk text.
+
+    Postings are NumPy arrays in CSR layout (``term_offsets`` into parallel
+    ``doc_rows`` int32 / ``tfs`` uint16 arrays), memory-mapped from the
+    current snapshot under ``path``. New chunks go to a small in-memory
+    delta that is searched alongside; ``flush()`` merges the delta, drops
+    deleted chunks and writes the arrays plus ``index.json`` (ids, metadata,
+    vocabulary) into a new ``v<N>`` directory, then switches to it by
+    replacing the ``CURRENT`` pointer file, so a crash leaves either the old
+    or the new snapshot whole. Changes since the last flush are also
+    appended to ``delta.jsonl`` and replayed when the index is opened, so
+    they survive a crash. Search scores
+    all query terms at once with ``bincount`` and returns VectorMatch
+    results so they can be fused with vector search.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pointer_path = os.path.join(path, "CURRENT")
+        self._snapshot = self._current_snapshot()
+        self._remove_stale_snapshots()
+        # Indexes written before snapshots keep their files at the top level until the next flush
+        snapshot_dir = os.path.join(path, self._snapshot) if self._snapshot else path
+        index_path = os.path.join(snapshot_dir, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                state = json.load(f)
+            self._ids: List[Optional[str]] = state["ids"]
+            self._metadata: List[dict] = state["metadata"]
+            self._terms: Dict[str, int] = {term: term_id for term_id, term in enumerate(state["terms"])}
+            self._base = self._load_postings(snapshot_dir)
+            self._doc_lengths = np.array(np.load(os.path.join(snapshot_dir, "doc_lengths.npy")))
+        else:
+            self._ids, self._metadata, self._terms = [], [], {}
+            self._base = _Postings.empty()
+            self._doc_lengths = np.zeros(0, dtype=np.int32)
+        self._rows: Dict[str, int] = {chunk_id: row for row, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._file_hashes = np.array([metadata.get('file_hash', "") for metadata in self._metadata], dtype=object)
+        self._alive = np.array([chunk_id is not None for chunk_id in self._ids], dtype=bool)
+        self._flushed_rows = len(self._ids)
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._delta: Optional[_Postings] = None
+        self._log_path = os.path.join(path, "delta.jsonl")
+        self._replay()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def pending_rows(self) -> int:
+        """Chunks added since the last flush."""
+        return len(self._ids) - self._flushed_rows
+
+    def _current_snapshot(self) -> Optional[str]:
+        with suppress(FileNotFoundError), open(self._pointer_path, encoding="utf-8") as f:
+            return f.read().strip()
+        return None
+
+    def _remove_stale_snapshots(self):
+        """Delete snapshots other than the current one, e.g. one a crash left half-written."""
+        for name in os.listdir(self.path):
+            if re.fullmatch(r"v\d+", name) and name != self._snapshot:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    @staticmethod
+    def _load_postings(directory: str) -> _Postings:
+        return _Postings(*(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in POSTINGS))
+
+    def _term_ids(self, tokens: List[str], add: bool) -> np.ndarray:
+        if add:
+            return np.fromiter(
+                (self._terms.setdefault(token, len(self._terms)) for token in tokens), dtype=np.int64, count=len(tokens)
+            )
+        return np.unique(np.fromiter(
+            (self._terms[token] for token in tokens if token in self._terms), dtype=np.int64
+        ))
+
+    def add(self, chunks: Iterable[Tuple[str, str, dict]]):
+        """Index ``(chunk_id, text, metadata)`` records, replacing chunks with the same id."""
+        chunks = list(chunks)
+        with self._lock:
+            self._log({'add': chunks})
+            self._add(chunks)
+
+    def delete(self, ids: Iterable[str]):
+        ids = list(ids)
+        with self._lock:
+            self._log({'delete': ids})
+            self._delete(ids)
+
+    def replace_file(self, file_hash: str, chunks: Iterable[Tuple[str, str, dict]]):
+        """Re-index a report: drop all of its chunks, then add ``chunks``."""
+        chunks = list(chunks)
+        with self._lock:
+            self._log({'replace_file': file_hash, 'add': chunks})
+            self._drop_file(file_hash)
+            self._add(chunks)
+
+    def _log(self, change: dict):
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(change, ensure_ascii=False) + "\n")
+
+    def _replay(self):
+        """Re-apply the changes logged since the last flush; they are pending again."""
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "rb+") as f:
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    # Torn by a crash mid-write; cut it off so later changes append cleanly
+                    f.truncate(f.tell() - len(line))
+                    break
+                change = json.loads(line)
+                if 'replace_file' in change:
+                    self._drop_file(change['replace_file'])
+                self._delete(change.get('delete', ()))
+                self._add(change.get('add', ()))
+
+    def _add(self, chunks: Iterable[Sequence]):
+        term_ids, doc_rows, lengths = [], [], []
+        for chunk_id, text, metadata in chunks:
+            if chunk_id in self._rows:
+                self._delete_row(self._rows.pop(chunk_id))
+            row = len(self._ids)
+            self._ids.append(chunk_id)
+            self._metadata.append(metadata or {})
+            self._rows[chunk_id] = row
+            tokens = self._term_ids(tokenize(text), add=True)
+            term_ids.append(tokens)
+            doc_rows.append(np.full(len(tokens), row, dtype=np.int64))
+            lengths.append(len(tokens))
+        if not lengths:
+            return
+        term_ids, doc_rows = np.concatenate(term_ids), np.concatenate(doc_rows)
+        # Term frequencies per (document, term) pair in one pass
+        pairs, tfs = np.unique(doc_rows << 32 | term_ids, return_counts=True)
+        self._pending.append((pairs & 0xFFFFFFFF, pairs >> 32, np.minimum(tfs, MAX_TF)))
+        self._delta = None
+        self._doc_lengths = np.concatenate([self._doc_lengths, np.asarray(lengths, dtype=np.int32)])
+        self._file_hashes = np.concatenate([
+            self._file_hashes,
+            np.array([metadata.get('file_hash', "") for metadata in self._metadata[-len(lengths):]], dtype=object)
+        ])
+        self._alive = np.concatenate([self._alive, np.ones(len(lengths), dtype=bool)])
+
+    def _delete_row(self, row: int):
+        self._alive[row] = False
+        self._ids[row] = None
+        self._metadata[row] = {}
+
+    def _delete(self, ids: Iterable[str]):
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id, None)
+            if row is not None:
+                self._delete_row(row)
+
+    def _drop_file(self, file_hash: str):
+        for row in np.flatnonzero(self._alive & (self._file_hashes == file_hash)):
+            del self._rows[self._ids[row]]
+            self._delete_row(row)
+
+    def _tiers(self) -> List[_Postings]:
+        if self._pending and self._delta is None:
+            term_ids, doc_rows, tfs = (np.concatenate(parts) for parts in zip(*self._pending))
+            self._delta = _Postings.build(term_ids, doc_rows, tfs, len(self._terms))
+        return [self._base] if self._delta is None else [self._base, self._delta]
+
+    def search(self, query: str, top_k: int = 10, file_hashes: Optional[Sequence[str]] = None) -> List[VectorMatch]:
+        """The ``top_k`` chunks by BM25 score for ``query``, best first."""
+        with self._lock:
+            term_ids = self._term_ids(tokenize(query), add=False)
+            if not len(term_ids) or not self._alive.any():
+                return []
+            lookups = [tier.lookup(term_ids) for tier in self._tiers()]
+            positions, rows, tfs = (np.concatenate(parts) for parts in zip(*lookups))
+            # Deleted chunks stay in the postings until the next flush
+            alive = self._alive[rows]
+            positions, rows, tfs = positions[alive], rows[alive], tfs[alive]
+
+            alive_lengths = self._doc_lengths[self._alive]
+            count, average_length = len(alive_lengths), max(alive_lengths.mean(), 1.0)
+            df = np.bincount(positions, minlength=len(term_ids))
+            idf = np.log1p((count - df + 0.5) / (df + 0.5))
+            tfs = tfs.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[rows] / average_length)
+            weights = idf[positions] * tfs * (self.k1 + 1) / (tfs + norm)
+            scores = np.bincount(rows, weights=weights, minlength=len(self._ids))
+
+            mask = self._alive & (scores > 0)
+            if file_hashes is not None:
+                mask &= np.isin(self._file_hashes, list(file_hashes))
+            candidates = np.flatnonzero(mask)
+            if not len(candidates):
+                return []
+            k = min(top_k, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [VectorMatch(self._ids[row], float(scores[row]), self._metadata[row]) for row in top]
+
+    def flush(self):
+        """Merge pending chunks into the on-disk postings and drop deleted ones."""
+        with self._lock:
+            term_ids, doc_rows, tfs = (
+                np.concatenate(parts) for parts in zip(self._base.to_coo(), *self._pending)
+            ) if self._pending else self._base.to_coo()
+            # Renumber rows so deleted chunks take no space
+            new_rows = np.cumsum(self._alive) - 1
+            keep = self._alive[doc_rows]
+            term_ids, doc_rows, tfs = term_ids[keep], new_rows[doc_rows[keep]], tfs[keep]
+            alive = np.flatnonzero(self._alive)
+            self._ids = [self._ids[row] for row in alive]
+            self._metadata = [self._metadata[row] for row in alive]
+            self._doc_lengths = self._doc_lengths[alive]
+            self._file_hashes = self._file_hashes[alive]
+            self._alive = np.ones(len(alive), dtype=bool)
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            postings = _Postings.build(term_ids, doc_rows, tfs, len(self._terms))
+
+            arrays = {
+                'term_offsets': postings.term_offsets,
+                'doc_rows': postings.doc_rows,
+                'tfs': postings.tfs,
+                'doc_lengths': self._doc_lengths,
+            }
+            version = int(self._snapshot[1:]) + 1 if self._snapshot else 1
+            snapshot = f"v{version}"
+            snapshot_dir = os.path.join(self.path, snapshot)
+            os.makedirs(snapshot_dir, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(snapshot_dir, f"{name}.npy"), array)
+            with open(os.path.join(snapshot_dir, "index.json"), "w", encoding="utf-8") as f:
+                terms = sorted(self._terms, key=self._terms.get)
+                json.dump({"ids": self._ids, "metadata": self._metadata, "terms": terms}, f)
+            # The snapshot becomes current in one rename; until then the old one and the log are untouched
+            tmp_path = f"{self._pointer_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self._pointer_path)
+            # Replaying the log over the new postings would be harmless, so a crash here loses nothing
+            with suppress(FileNotFoundError):
+                os.remove(self._log_path)
+            self._base = self._load_postings(snapshot_dir)
+            self._snapshot = snapshot
+            self._remove_stale_snapshots()
+            for file_name in [f"{name}.npy" for name in arrays] + ["index.json"]:
+                with suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.path, file_name))
+            self._pending, self._delta = [], None
+            self._flushed_rows = len(self._ids)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[VectorMatch]], top_k: int, k: int = 60) -> List[VectorMatch]:
+    """
+    Fuse ranked lists by reciprocal rank: each id scores ``sum(1 / (k + rank))``.
+
+    Scores of different retrievers (cosine, BM25) are not comparable, ranks
+    are. The metadata of an id comes from the first list it appears in.
+    """
+    scores: Dict[str, float] = {}
+    metadata: Dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            scores[match.id] = scores.get(match.id, 0.0) + 1.0 / (k + rank)
+            metadata.setdefault(match.id, match.metadata)
+    fused = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [VectorMatch(match_id, scores[match_id], metadata[match_id]) for match_id in fused]
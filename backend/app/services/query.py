@@ -0,0 +1,192 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from ..core.config import settings
+from ..utils.concurrency import retry_async, run_blocking
+from ..utils.metrics import track
+from .answer_cache import AnswerCache
+from .embeddings import EmbeddingBackend
+from .search import HybridSearch
+from .vector_store import VectorMatch, VectorStore, combine_filters
+
+SYSTEM_PROMPT = (
+    "You are a financial analyst assistant. Answer the question using only "
+    "the report excerpts provided. Cite excerpts by their [number]. If the "
+    "excerpts do not contain the answer, say so."
+)
+
+
+class ChatBackend(ABC):
+    """A chat model that streams the tokens of its reply."""
+
+    model_name: str
+
+    @abstractmethod
+    def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Yield the reply to ``messages`` token by token."""
+
+
+class OpenAIChatBackend(ChatBackend):
+    def __init__(self, model_name: Optional[str] = None):
+        from openai import AsyncOpenAI
+
+        settings.require("OpenAI chat", "OPENAI_API_KEY")
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.model_name = model_name or settings.QUERY_CHAT_MODEL
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=0,
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def build_messages(question: str, matches: List[VectorMatch], max_context_chars: int) -> List[Dict[str, str]]:
+    """Prompt with the retrieved chunks, best first, up to ``max_context_chars``."""
+    excerpts, used = [], 0
+    for number, match in enumerate(matches, start=1):
+        text = match.metadata.get('text', "")
+        if excerpts and used + len(text) > max_context_chars:
+            break
+        used += len(text)
+        excerpts.append(f"[{number}] (page {match.metadata.get('page_number')})\n{text}")
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "Excerpts:\n\n" + "\n\n".join(excerpts) + f"\n\nQuestion: {question}"},
+    ]
+
+
+def document_filter(company_name: Optional[str] = None, report_date: Optional[date] = None) -> Optional[dict]:
+    """Filter on the document fields copied into chunk metadata (see ``embeddings.DOCUMENT_FIELDS``)."""
+    fields = {}
+    if company_name:
+        fields['company_name'] = company_name
+    if report_date:
+        fields['report_date'] = report_date.isoformat()
+    return fields or None
+
+
+def source_of(match: VectorMatch) -> dict:
+    return {
+        'id': match.id,
+        'score': match.score,
+        'file_hash': match.metadata.get('file_hash'),
+        'page_number': match.metadata.get('page_number'),
+    }
+
+
+class QueryService:
+    """
+    Retrieval-augmented answers, streamed as events.
+
+    The question is embedded once; the embedding is first looked up in the
+    semantic answer cache, and only on a miss are chunks retrieved from the
+    vector store (fused with BM25 results if a HybridSearch is given) and
+    the chat model called. ``answer`` yields
+    ``(event, data)`` pairs: ``sources``, then ``token`` events, then ``done``.
+    """
+
+    def __init__(
+        self,
+        embedding_backend: EmbeddingBackend,
+        vector_store: VectorStore,
+        chat_backend: ChatBackend,
+        cache: Optional[AnswerCache] = None,
+        top_k: Optional[int] = None,
+        max_context_chars: Optional[int] = None,
+        hybrid_search: Optional[HybridSearch] = None
+    ):
+        self.embedding_backend = embedding_backend
+        self.vector_store = vector_store
+        self.chat_backend = chat_backend
+        self.cache = cache
+        self.top_k = top_k or settings.QUERY_TOP_K
+        self.max_context_chars = max_context_chars or settings.QUERY_MAX_CONTEXT_CHARS
+        self.hybrid_search = hybrid_search
+
+    async def embed_question(self, question: str):
+        with track("query", "embed"):
+            return (await retry_async(lambda: self.embedding_backend.embed([question]), attempts=3))[0]
+
+    async def retrieve(
+        self,
+        question: str,
+        embedding,
+        top_k: int,
+        file_hashes: Optional[List[str]] = None,
+        document: Optional[dict] = None
+    ) -> List[VectorMatch]:
+        """
+        The ``top_k`` chunks for ``question``, best first, optionally filtered (see ``document_filter``).
+
+        ``file_hashes=None`` searches every report; an empty list matches nothing.
+        """
+        if file_hashes is not None and not file_hashes:
+            return []
+        with track("query", "retrieve"):
+            if self.hybrid_search is not None:
+                return await run_blocking(
+                    self.hybrid_search.search, question, embedding, top_k, file_hashes, document
+                )
+            filter = combine_filters({'file_hash': {'$in': file_hashes}} if file_hashes else None, document)
+            return await run_blocking(self.vector_store.query, embedding, top_k, filter)
+
+    async def search(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        file_hashes: Optional[List[str]] = None,
+        company_name: Optional[str] = None,
+        report_date: Optional[date] = None
+    ) -> List[dict]:
+        """Retrieve sources for ``question`` without generating an answer."""
+        top_k = top_k or self.top_k
+        embedding = await self.embed_question(question)
+        document = document_filter(company_name, report_date)
+        matches = await self.retrieve(question, embedding, top_k, file_hashes, document)
+        return [source_of(match) for match in matches]
+
+    async def answer(
+        self,
+        question: str,
+        top_k: Optional[int] = None,
+        file_hashes: Optional[List[str]] = None,
+        company_name: Optional[str] = None,
+        report_date: Optional[date] = None
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        start = time.perf_counter()
+        top_k = top_k or self.top_k
+        document = document_filter(company_name, report_date)
+        # Answers are only shared between questions asked over the same chunks
+        scope = json.dumps([None if file_hashes is None else sorted(file_hashes), top_k, document], sort_keys=True)
+        embedding = await self.embed_question(question)
+
+        if self.cache is not None:
+            with track("query", "cache_lookup"):
+                cached = await run_blocking(self.cache.get, embedding, scope)
+            if cached is not None:
+                yield "sources", {'sources': cached.sources, 'cached': True}
+                yield "token", {'text': cached.answer}
+                yield "done", {'cached': True, 'latency_ms': (time.perf_counter() - start) * 1000}
+                return
+
+        matches = await self.retrieve(question, embedding, top_k, file_hashes, document)
+        sources = [source_of(match) for match in matches]
+        yield "sources", {'sources': sources, 'cached': False}
+
+        tokens = []
+        async for token in self.chat_backend.stream(build_messages(question, matches, self.max_context_chars)):
+            tokens.append(token)
+            yield "token", {'text': token}
+
+        latency = time.perf_counter() - start
+        if self.cache is not None and matches:
+            await run_blocking(self.cache.put, embedding, question, "".join(tokens), sources, latency, scope)
+        yield "done", {'cached': False, 'latency_ms': latency * 1000}
@@ -0,0 +1,403 @@
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+from typing import Collection, Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from ..core.config import settings
+from ..utils.metrics import REPORT_STORE_BYTES, REPORT_STORE_EVICTIONS
+from .embeddings import Chunk, chunk_pages
+from .tables import read_tables
+
+logger = logging.getLogger(__name__)
+
+# Per-report files; report.json is written last and marks the text index complete
+PAGES_FILE = "pages.jsonl"
+TABLES_FILE = "tables.parquet"
+MANIFEST_FILE = "report.json"
+# Page results cached by content hash (see extraction.extract_page_range)
+PAGE_CACHE_DIR = "page_cache"
+
+PAGE_INDEX_DTYPE = np.dtype([("page_number", "<i4"), ("start", "<i8"), ("end", "<i8")])
+CHUNK_INDEX_DTYPE = np.dtype([
+    ("page_number", "<i4"), ("chunk_index", "<i4"), ("start", "<i8"), ("end", "<i8"), ("content_hash", "V32")
+])
+_REPORT_DIR = re.compile(r"^[0-9a-f]{64}$")
+
+
+def write_text_index(report_dir: str, chunk_size: int, overlap: int) -> int:
+    """
+    Write the memory-mappable text of a report from its ``pages.jsonl`` (runs in a worker process).
+
+    Page texts and embedding chunks are each concatenated as UTF-8 into a
+    ``.txt`` file with a ``.npy`` index of byte offsets. Returns the number
+    of bytes written.
+    """
+    file_hash = os.path.basename(os.path.normpath(report_dir))
+    with open(os.path.join(report_dir, PAGES_FILE), encoding="utf-8") as f:
+        pages = sorted(
+            ({'page_number': page['page_number'], 'text': page.get('text', "")} for page in map(json.loads, f)),
+            key=lambda page: page['page_number']
+        )
+    chunks = list(chunk_pages(pages, file_hash, chunk_size, overlap))
+
+    page_index = np.zeros(len(pages), dtype=PAGE_INDEX_DTYPE)
+    page_index["page_number"] = [page['page_number'] for page in pages]
+    chunk_index = np.zeros(len(chunks), dtype=CHUNK_INDEX_DTYPE)
+    chunk_index["page_number"] = [chunk.metadata['page_number'] for chunk in chunks]
+    chunk_index["chunk_index"] = [chunk.metadata['chunk_index'] for chunk in chunks]
+    chunk_index["content_hash"] = [bytes.fromhex(chunk.content_hash) for chunk in chunks]
+
+    written = 0
+    for name, texts, index in (
+        ("pages", [page['text'] for page in pages], page_index),
+        ("chunks", [chunk.text for chunk in chunks], chunk_index),
+    ):
+        encoded = [text.encode("utf-8") for text in texts]
+        index["end"] = np.cumsum([len(data) for data in encoded], dtype=np.int64)
+        index["start"] = index["end"] - [len(data) for data in encoded]
+        written += _write_file(os.path.join(report_dir, f"{name}.txt"), b"".join(encoded))
+        tmp_path = os.path.join(report_dir, f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, index)
+        os.replace(tmp_path, os.path.join(report_dir, f"{name}.npy"))
+        written += index.nbytes
+
+    manifest = {
+        'file_hash': file_hash,
+        'page_count': len(pages),
+        'chunk_count': len(chunks),
+        'chunk_size': chunk_size,
+        'chunk_overlap': overlap,
+    }
+    written += _write_file(os.path.join(report_dir, MANIFEST_FILE), json.dumps(manifest).encode())
+    return written
+
+
+def _write_file(path: str, data: bytes) -> int:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def _map(path: str):
+    """Map a file read-only; empty files (mmap cannot map them) become empty bytes."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ReportNotFoundError(FileNotFoundError):
+    """A report was never extracted or has been evicted."""
+
+    def __init__(self, file_hash: str):
+        super().__init__(f"No processed report for {file_hash}")
+        self.file_hash = file_hash
+
+
+class ProcessedReport:
+    """
+    Read-only, memory-mapped view of one processed report.
+
+    ``page_bytes`` and ``chunk_bytes`` return memoryviews into the mapped
+    text files, so random access copies nothing and only touches the pages
+    of the file it reads; the ``*_text`` methods decode that slice.
+    """
+
+    def __init__(self, report_dir: str):
+        self.report_dir = report_dir
+        self.file_hash = os.path.basename(os.path.normpath(report_dir))
+        with open(os.path.join(report_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._page_index = np.load(os.path.join(report_dir, "pages.npy"), mmap_mode="r")
+        self._chunk_index = np.load(os.path.join(report_dir, "chunks.npy"), mmap_mode="r")
+        self._page_text = memoryview(_map(os.path.join(report_dir, "pages.txt")))
+        self._chunk_text = memoryview(_map(os.path.join(report_dir, "chunks.txt")))
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_index)
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self._chunk_index)
+
+    @property
+    def page_numbers(self) -> np.ndarray:
+        return self._page_index["page_number"]
+
+    def _page_row(self, page_number: int) -> int:
+        row = int(np.searchsorted(self._page_index["page_number"], page_number))
+        if row >= len(self._page_index) or self._page_index["page_number"][row] != page_number:
+            raise KeyError(f"{self.file_hash} has no page {page_number}")
+        return row
+
+    def page_bytes(self, page_number: int) -> memoryview:
+        """UTF-8 text of a page, without copying it out of the mapped file."""
+        row = self._page_index[self._page_row(page_number)]
+        return self._page_text[int(row["start"]):int(row["end"])]
+
+    def page_text(self, page_number: int) -> str:
+        return str(self.page_bytes(page_number), "utf-8")
+
+    def pages(self) -> Iterator[dict]:
+        """Pages as ``{'page_number', 'text'}`` dicts, in page order."""
+        text = self._page_text
+        for page_number, start, end in self._page_index.tolist():
+            yield {'page_number': page_number, 'text': str(text[start:end], "utf-8")}
+
+    def chunk_bytes(self, row: int) -> memoryview:
+        entry = self._chunk_index[row]
+        return self._chunk_text[int(entry["start"]):int(entry["end"])]
+
+    def chunk_text(self, row: int) -> str:
+        return str(self.chunk_bytes(row), "utf-8")
+
+    def chunks(self, document: Optional[dict] = None) -> Iterator[Chunk]:
+        """
+        The report's embedding chunks, as ``chunk_pages`` would produce them.
+
+        Chunks are re-cut from the page text if the stored ones were made
+        with a different chunk size or overlap than the current settings.
+        ``document`` fields are added to every chunk's metadata.
+        """
+        if (
+            self.manifest['chunk_size'] != settings.EMBEDDING_CHUNK_SIZE
+            or self.manifest['chunk_overlap'] != settings.EMBEDDING_CHUNK_OVERLAP
+        ):
+            yield from chunk_pages(self.pages(), self.file_hash, document=document)
+            return
+        text = self._chunk_text
+        for page_number, chunk_index, start, end, content_hash in self._chunk_index.tolist():
+            piece = str(text[start:end], "utf-8")
+            yield Chunk(
+                chunk_id=f"{self.file_hash}-{page_number}-{chunk_index}",
+                text=piece,
+                content_hash=content_hash.hex(),
+                metadata={
+                    **(document or {}),
+                    'file_hash': self.file_hash,
+                    'page_number': page_number,
+                    'chunk_index': chunk_index,
+                    'text': piece,
+                }
+            )
+
+    @property
+    def has_tables(self) -> bool:
+        return os.path.exists(os.path.join(self.report_dir, TABLES_FILE))
+
+    def tables(self) -> pd.DataFrame:
+        """Typed table values (see ``tables.table_values``)."""
+        return read_tables(os.path.join(self.report_dir, TABLES_FILE))
+
+    def close(self):
+        """Unmap the text files; only for callers that own the report (the store never closes them)."""
+        for name in ("_page_text", "_chunk_text"):
+            view = getattr(self, name)
+            mapped = view.obj
+            view.release()
+            if isinstance(mapped, mmap.mmap):
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # Slices handed out are still alive; the map closes when they are collected
+
+
+class ReportStore:
+    """
+    On-disk store of processed reports, keyed by file hash, with an LRU size cap.
+
+    Each report lives in ``root/<file_hash>/``: the extraction output
+    (``pages.jsonl``), typed tables (``tables.parquet``, read memory-mapped)
+    and a memory-mapped text index of pages and embedding chunks
+    (``pages.txt``/``pages.npy``, ``chunks.txt``/``chunks.npy``). Opening a
+    report marks it used; ``evict()`` deletes least recently used reports
+    and page cache entries (``root/page_cache/``, which counts towards the
+    cap) until the store fits in ``max_bytes``, skipping pinned reports and
+    the ones it is told to keep. Opening an evicted report raises
+    ReportNotFoundError; ``ExtractionService.restore`` extracts it again.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 0, max_open: int = 64):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._open: "OrderedDict[str, ProcessedReport]" = OrderedDict()
+        self._pinned: Dict[str, int] = {}
+        self._hits = self._misses = self._evictions = self._page_evictions = 0
+
+    @property
+    def page_cache_dir(self) -> str:
+        return os.path.join(self.root, PAGE_CACHE_DIR)
+
+    def report_dir(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash)
+
+    def pages_path(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash, PAGES_FILE)
+
+    def tables_path(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash, TABLES_FILE)
+
+    def contains(self, file_hash: str) -> bool:
+        return os.path.exists(os.path.join(self.root, file_hash, MANIFEST_FILE))
+
+    def build(self, file_hash: str) -> int:
+        """Write the text index of an extracted report; see ``write_text_index``."""
+        with self._lock:
+            self._open.pop(file_hash, None)
+        return write_text_index(
+            self.report_dir(file_hash), settings.EMBEDDING_CHUNK_SIZE, settings.EMBEDDING_CHUNK_OVERLAP
+        )
+
+    def open(self, file_hash: str) -> ProcessedReport:
+        """
+        Return the memory-mapped report, marking it recently used.
+
+        Reports extracted before the text index existed are indexed on first
+        open. Raises FileNotFoundError if the report was never extracted or
+        has been evicted (ReportNotFoundError).
+        """
+        with self._lock:
+            report = self._open.get(file_hash)
+            if report is not None:
+                self._open.move_to_end(file_hash)
+                self._hits += 1
+        if report is None:
+            if not self.contains(file_hash):
+                if not os.path.exists(self.pages_path(file_hash)):
+                    raise ReportNotFoundError(file_hash)
+                self.build(file_hash)
+            report = ProcessedReport(self.report_dir(file_hash))
+            with self._lock:
+                self._misses += 1
+                self._open[file_hash] = report
+                # Dropped reports are unmapped once their last reader lets go of them
+                while len(self._open) > self.max_open:
+                    self._open.popitem(last=False)
+        # The directory's mtime is the LRU clock, so recency survives restarts
+        with suppress(FileNotFoundError):
+            os.utime(self.report_dir(file_hash))
+        return report
+
+    @contextmanager
+    def pinned(self, file_hash: str):
+        """Keep a report from being evicted while it is being written or read."""
+        with self._lock:
+            self._pinned[file_hash] = self._pinned.get(file_hash, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pinned[file_hash] -= 1
+                if not self._pinned[file_hash]:
+                    del self._pinned[file_hash]
+
+    def _reports(self) -> List[tuple]:
+        """``(last_used, size, file_hash)`` of every report directory."""
+        reports = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not (entry.is_dir() and _REPORT_DIR.match(entry.name)):
+                    continue
+                try:
+                    size = sum(item.stat().st_size for item in os.scandir(entry.path) if item.is_file())
+                    reports.append((entry.stat().st_mtime, size, entry.name))
+                except FileNotFoundError:
+                    continue  # Removed while scanning
+        return reports
+
+    def _page_cache_entries(self) -> List[tuple]:
+        """``(last_used, size, path)`` of every cached page result."""
+        entries = []
+        if not os.path.isdir(self.page_cache_dir):
+            return entries
+        with os.scandir(self.page_cache_dir) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        if not (entry.name.endswith(".json") and entry.is_file()):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue  # Removed while scanning
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self, keep: Collection[str] = ()) -> List[str]:
+        """
+        Delete least recently used reports and cached pages until the store fits its cap.
+
+        Reports in ``keep`` (e.g. waiting to be embedded) are skipped like
+        pinned ones. Returns the hashes of the evicted reports.
+        """
+        reports = self._reports()
+        pages = self._page_cache_entries()
+        total = sum(size for _, size, _ in reports) + sum(size for _, size, _ in pages)
+        evicted = []
+        page_evictions = 0
+        if self.max_bytes and total > self.max_bytes:
+            candidates = sorted(
+                [(last_used, size, file_hash, True) for last_used, size, file_hash in reports]
+                + [(last_used, size, path, False) for last_used, size, path in pages]
+            )
+            for _, size, name, is_report in candidates:
+                if total <= self.max_bytes:
+                    break
+                if not is_report:
+                    with suppress(FileNotFoundError):
+                        os.remove(name)  # A worker reading it meanwhile treats it as a miss
+                    total -= size
+                    page_evictions += 1
+                    continue
+                with self._lock:
+                    if name in self._pinned or name in keep:
+                        continue
+                    self._open.pop(name, None)
+                # Open maps of the deleted files stay readable until they are dropped
+                shutil.rmtree(self.report_dir(name), ignore_errors=True)
+                total -= size
+                evicted.append(name)
+        if evicted or page_evictions:
+            logger.info(
+                "Evicted %d processed reports and %d cached pages to stay under %d bytes",
+                len(evicted), page_evictions, self.max_bytes
+            )
+            with self._lock:
+                self._evictions += len(evicted)
+                self._page_evictions += page_evictions
+            REPORT_STORE_EVICTIONS.inc(len(evicted))
+        REPORT_STORE_BYTES.set(total)
+        return evicted
+
+    def stats(self) -> Dict[str, float]:
+        reports = self._reports()
+        pages = self._page_cache_entries()
+        page_bytes = sum(size for _, size, _ in pages)
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'reports': len(reports),
+                'bytes': sum(size for _, size, _ in reports) + page_bytes,
+                'page_cache_entries': len(pages),
+                'page_cache_bytes': page_bytes,
+                'page_cache_evictions': self._page_evictions,
+                'max_bytes': self.max_bytes,
+                'open': len(self._open),
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+            }
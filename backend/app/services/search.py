@@ -0,0 +1,61 @@
+from typing import List, Optional, Sequence
+from ..core.config import settings
+from ..utils.metrics import track
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .vector_index import matches_filter
+from .vector_store import LocalVectorStore, VectorMatch, VectorStore, combine_filters
+
+
+class HybridSearch:
+    """
+    Vector and BM25 retrieval fused by reciprocal rank.
+
+    Exact tokens such as account numbers and GL codes are found by the
+    lexical index even when their embeddings are not close to the
+    question's. With ``prefilter_candidates`` set and a LocalVectorStore,
+    the BM25 top-N is also used as the vector candidate set, so only those
+    rows are scored instead of the whole store; when the lexical index
+    finds fewer than ``top_k`` chunks the full vector search runs instead.
+    ``document_filter`` (company, report date) is applied to the vector
+    query and to the lexical results' metadata; an empty ``file_hashes``
+    list matches nothing in either.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        lexical_index: BM25Index,
+        prefilter_candidates: Optional[int] = None,
+        rrf_k: Optional[int] = None
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.prefilter_candidates = (
+            settings.SEARCH_PREFILTER_CANDIDATES if prefilter_candidates is None else prefilter_candidates
+        )
+        self.rrf_k = rrf_k or settings.SEARCH_RRF_K
+
+    def search(
+        self,
+        question: str,
+        embedding,
+        top_k: int,
+        file_hashes: Optional[Sequence[str]] = None,
+        document_filter: Optional[dict] = None
+    ) -> List[VectorMatch]:
+        if file_hashes is not None and not file_hashes:
+            return []  # Restricted to no reports; an empty filter would search them all
+        filter = combine_filters({'file_hash': {'$in': list(file_hashes)}} if file_hashes else None, document_filter)
+        depth = max(top_k, self.prefilter_candidates)
+        with track("query", "lexical"):
+            lexical = self.lexical_index.search(question, depth, file_hashes)
+            if document_filter:
+                lexical = [match for match in lexical if matches_filter(match.metadata, document_filter)]
+
+        with track("query", "vector"):
+            if self.prefilter_candidates and isinstance(self.vector_store, LocalVectorStore) and len(lexical) >= top_k:
+                candidate_ids = [match.id for match in lexical]
+                vector = self.vector_store.query_batch([embedding], top_k, filter, candidate_ids=candidate_ids)[0]
+            else:
+                vector = self.vector_store.query(embedding, top_k, filter)
+        return reciprocal_rank_fusion([vector, lexical[:top_k]], top_k, self.rrf_k)
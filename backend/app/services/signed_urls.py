@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# (storage_path, method, expiration_minutes, download_name)
+SignedURLKey = Tuple[str, str, int, Optional[str]]
+
+
+class SignedURLCache:
+    """
+    Expiry-aware cache of signed URLs.
+
+    A URL is reused until ``safety_margin_seconds`` before it expires, so a
+    client always receives a URL with at least that much validity left.
+    Signing time is recorded so the cache can report the time it saved.
+    Thread-safe, since signing runs on the I/O thread pool.
+    """
+
+    def __init__(self, max_size: int = 10_000, safety_margin_seconds: float = 300):
+        self.max_size = max_size
+        self.safety_margin_seconds = safety_margin_seconds
+        self._entries: "OrderedDict[SignedURLKey, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.signings = 0
+        self.signing_seconds = 0.0
+
+    def get(self, key: SignedURLKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                url, expires_at = entry
+                if expires_at - self.safety_margin_seconds > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return url
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: SignedURLKey, url: str, expires_at: float, signing_seconds: float):
+        with self._lock:
+            self.signings += 1
+            self.signing_seconds += signing_seconds
+            if expires_at - self.safety_margin_seconds <= time.time():
+                return  # Too short-lived to be worth reusing
+            self._entries[key] = (url, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, storage_path: str):
+        """Drop every cached URL for an object, e.g. after it was deleted."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == storage_path]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            avg_signing = self.signing_seconds / self.signings if self.signings else 0.0
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "avg_signing_ms": avg_signing * 1000,
+                "signing_seconds_saved": self.hits * avg_signing,
+            }
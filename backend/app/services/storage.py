@@ -1,53 +1,487 @@
-from google.cloud import storage
-from google.oauth2 import service_account
 import hashlib
-from datetime import datetime, timedelta
-from typing import BinaryIO, Tuple
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
 import os
 from ..core.config import settings
+from ..utils.concurrency import retry_blocking, run_blocking
+from ..utils.metrics import track
+from ..utils.streaming import HashingReader
+from .signed_urls import SignedURLCache
+
+STAGING_PREFIX = "uploads/.staging"
+PARTS_PREFIX = f"{STAGING_PREFIX}/parts"
+OBJECTS_PREFIX = "objects"
+COMPOSE_MAX_SOURCES = 32  # GCS limit per compose request
+# Older parts are uploaded again rather than reused, so the staging lifecycle
+# rule (one day) cannot delete a part between its reuse and the compose
+PART_REUSE_MAX_AGE = timedelta(hours=12)
+
+
+def object_path(file_hash: str) -> str:
+    """Content-addressed location of a file: ``objects/<hash[:2]>/<hash>``."""
+    return f"{OBJECTS_PREFIX}/{file_hash[:2]}/{file_hash}"
+
+
+class DuplicateObjectError(Exception):
+    """The content-addressed object already exists in the bucket."""
+
+    def __init__(self, storage_path: str):
+        super().__init__(f"Object already exists: {storage_path}")
+        self.storage_path = storage_path
+
+
+def _remaining_size(file: BinaryIO) -> Optional[int]:
+    """Bytes left in a seekable stream, or None if it cannot seek."""
+    if not file.seekable():
+        return None
+    position = file.tell()
+    end = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return end - position
+
+
+def _read_exactly(file: BinaryIO, size: int) -> bytes:
+    """Read ``size`` bytes, or fewer only at the end of the stream."""
+    data = file.read(size)
+    if len(data) == size or not data:
+        return data
+    chunks = [data]
+    remaining = size - len(data)
+    while remaining:
+        chunk = file.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _transient_errors() -> tuple:
+    import requests
+    from google.api_core import exceptions
+
+    return (
+        exceptions.TooManyRequests,
+        exceptions.ServerError,
+        requests.ConnectionError,
+        requests.Timeout,
+        ConnectionError,
+    )
+
+
+@dataclass
+class StagedUpload:
+    """An upload that has been streamed to a staging object but not yet committed."""
+    blob_name: str
+    file_hash: str
+    file_size: int
+
 
 class StorageService:
-    def __init__(self, bucket_name: str):
-        # Load credentials from the service account file
-        credentials = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_APPLICATION_CREDENTIALS,
-            scopes=["https://www.googleapis.com/auth/cloud-platform"]
-        )
-        
+    def __init__(
+        self,
+        bucket_name: str,
+        chunk_size: Optional[int] = None,
+        part_size: Optional[int] = None,
+        parallelism: Optional[int] = None,
+        composite_threshold: Optional[int] = None
+    ):
+        # Imported here so the client library only loads when storage is used
+        from google.cloud import storage
+        from google.oauth2 import service_account
+        from requests.adapters import HTTPAdapter
+
+        settings.require("Cloud Storage", "GOOGLE_CLOUD_PROJECT")
+        credentials = None
+        if settings.GOOGLE_APPLICATION_CREDENTIALS:
+            # Load credentials from the service account file
+            credentials = service_account.Credentials.from_service_account_file(
+                settings.GOOGLE_APPLICATION_CREDENTIALS,
+                scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+
         # Initialize storage client with credentials
         self.storage_client = storage.Client(
             credentials=credentials,
             project=settings.GOOGLE_CLOUD_PROJECT
         )
         self.bucket = self.storage_client.bucket(bucket_name)
-    
+        self.chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        self.part_size = part_size or settings.COMPOSITE_UPLOAD_PART_SIZE
+        self.parallelism = parallelism or settings.COMPOSITE_UPLOAD_PARALLELISM
+        self.composite_threshold = (
+            settings.COMPOSITE_UPLOAD_THRESHOLD if composite_threshold is None else composite_threshold
+        )
+        self._part_executor: Optional[ThreadPoolExecutor] = None
+
+        # Every call shares the client's session; size its connection pool for
+        # the I/O pool plus parallel parts so connections are kept alive and reused
+        pool_size = settings.IO_MAX_WORKERS + self.parallelism
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        for scheme in ("https://", "http://"):
+            self.storage_client._http.mount(scheme, adapter)
+        self.signed_url_cache = SignedURLCache(
+            max_size=settings.SIGNED_URL_CACHE_SIZE,
+            safety_margin_seconds=settings.SIGNED_URL_SAFETY_MARGIN_SECONDS
+        )
+
     def compute_file_hash(self, file: BinaryIO) -> str:
         """Compute SHA-256 hash of file content."""
         sha256_hash = hashlib.sha256()
-        for byte_block in iter(lambda: file.read(4096), b""):
+        for byte_block in iter(lambda: file.read(self.chunk_size), b""):
             sha256_hash.update(byte_block)
         file.seek(0)  # Reset file pointer
         return sha256_hash.hexdigest()
-    
+
+    def stage_file(self, file: BinaryIO, max_size: Optional[int] = None, size: Optional[int] = None) -> StagedUpload:
+        """
+        Stream a file to a staging object in a single pass.
+
+        The SHA-256 hash, PDF magic-byte check and size limit are computed
+        while the chunks are pushed through a resumable upload, so the
+        source is read exactly once. Sources of at least
+        ``composite_threshold`` bytes are uploaded as parallel parts instead
+        (see ``_stage_composite``). Give ``size`` for a stream that cannot
+        seek, such as a request body, or that is costly to, such as a zip
+        member (seeking to its end decompresses all of it).
+        """
+        if size is None:
+            size = _remaining_size(file)
+        if size is not None and size >= self.composite_threshold:
+            return self._stage_composite(file, max_size)
+
+        reader = HashingReader(file, max_size=max_size or settings.MAX_UPLOAD_SIZE)
+        blob = self.bucket.blob(
+            f"{STAGING_PREFIX}/{uuid.uuid4().hex}",
+            chunk_size=self.chunk_size
+        )
+        try:
+            blob.upload_from_file(reader, content_type="application/pdf")
+            file_hash = reader.hexdigest()
+        except Exception:
+            self._delete_quietly(blob)
+            raise
+
+        return StagedUpload(
+            blob_name=blob.name,
+            file_hash=file_hash,
+            file_size=reader.bytes_read
+        )
+
+    def _stage_composite(self, file: BinaryIO, max_size: Optional[int] = None) -> StagedUpload:
+        """
+        Upload a large file as parallel parts and compose them server-side.
+
+        The source is still read and hashed once, in order; each part goes
+        to the part pool as soon as it is read, with at most ``parallelism``
+        parts in flight, so memory stays at ``parallelism * part_size``.
+        Parts are retried individually and named by their own SHA-256, so
+        re-uploading a file after a crash skips every part that already
+        reached the bucket. Concurrent uploads of the same file share those
+        parts, so they are never deleted here; the bucket lifecycle rule on
+        the staging prefix clears them (see ``PART_REUSE_MAX_AGE``).
+        """
+        reader = HashingReader(file, max_size=max_size or settings.MAX_UPLOAD_SIZE)
+        executor = self._get_part_executor()
+        part_names: List[str] = []
+        in_flight: Set[Future] = set()
+        try:
+            while True:
+                data = _read_exactly(reader, self.part_size)
+                if not data:
+                    break
+                if len(in_flight) >= self.parallelism:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                name = f"{PARTS_PREFIX}/{hashlib.sha256(data).hexdigest()}"
+                part_names.append(name)
+                in_flight.add(executor.submit(self._upload_part, name, data))
+            file_hash = reader.hexdigest()
+            for future in wait(in_flight).done:
+                future.result()
+            in_flight = set()
+
+            blob = self.bucket.blob(f"{STAGING_PREFIX}/{uuid.uuid4().hex}")
+            with track("composite_upload", "compose") as span:
+                self._compose(blob, part_names)
+                span.bytes = reader.bytes_read
+        except Exception:
+            # Let parts already uploading finish so a retry can skip them
+            for future in in_flight:
+                future.cancel()
+            wait(in_flight)
+            raise
+
+        return StagedUpload(
+            blob_name=blob.name,
+            file_hash=file_hash,
+            file_size=reader.bytes_read
+        )
+
+    def _get_part_executor(self) -> ThreadPoolExecutor:
+        # Separate from the I/O pool: stage_file already runs on an I/O thread
+        if self._part_executor is None:
+            self._part_executor = ThreadPoolExecutor(
+                max_workers=self.parallelism,
+                thread_name_prefix="finsight-parts"
+            )
+        return self._part_executor
+
+    def _upload_part(self, name: str, data: bytes):
+        from google.api_core import exceptions
+
+        blob = self.bucket.blob(name)
+
+        def upload():
+            existing = self.bucket.get_blob(name)
+            if existing is not None and existing.time_created > datetime.now(timezone.utc) - PART_REUSE_MAX_AGE:
+                return  # Uploaded before a crash, or by a concurrent upload of the same file
+            try:
+                # Replacing an old part restarts its lifecycle clock
+                blob.upload_from_string(
+                    data,
+                    content_type="application/octet-stream",
+                    if_generation_match=0 if existing is None else existing.generation,
+                    retry=None
+                )
+            except exceptions.PreconditionFailed:
+                pass  # Written meanwhile by a concurrent upload of the same part
+
+        with track("composite_upload", "part") as span:
+            retry_blocking(upload, attempts=settings.COMPOSITE_UPLOAD_RETRIES, retry_on=_transient_errors())
+            span.bytes = len(data)
+
+    def _compose(self, destination, part_names: List[str]):
+        """Compose parts into ``destination``, in rounds of at most 32 sources."""
+        intermediates = []
+        names = part_names
+        try:
+            while len(names) > COMPOSE_MAX_SOURCES:
+                next_names = []
+                for start in range(0, len(names), COMPOSE_MAX_SOURCES):
+                    intermediate = self.bucket.blob(f"{PARTS_PREFIX}/{uuid.uuid4().hex}")
+                    intermediates.append(intermediate)
+                    self._compose_once(intermediate, names[start:start + COMPOSE_MAX_SOURCES])
+                    next_names.append(intermediate.name)
+                names = next_names
+            destination.content_type = "application/pdf"
+            self._compose_once(destination, names)
+        finally:
+            for intermediate in intermediates:
+                self._delete_quietly(intermediate)
+
+    def _compose_once(self, destination, names: List[str]):
+        sources = [self.bucket.blob(name) for name in names]
+        retry_blocking(
+            lambda: destination.compose(sources),
+            attempts=settings.COMPOSITE_UPLOAD_RETRIES,
+            retry_on=_transient_errors()
+        )
+
+    def commit_staged(self, staged: StagedUpload, file_name: str) -> str:
+        """
+        Move a staged upload to its content-addressed path and return that path.
+
+        The object is keyed by hash alone, so the same content is stored
+        once whatever its name; names are kept in the Firestore alias
+        manifest. The server-side rewrite (the body is not transferred
+        again) only succeeds if the object does not exist yet, so when two
+        uploads of the same content race, the loser gets
+        DuplicateObjectError instead of a second copy.
+        """
+        storage_path = object_path(staged.file_hash)
+        source = self.bucket.blob(staged.blob_name)
+        try:
+            self._rewrite_if_absent(source, storage_path)
+        finally:
+            self._delete_quietly(source)
+
+        return storage_path
+
+    def _rewrite_if_absent(self, source, storage_path: str):
+        """Server-side copy of ``source`` to ``storage_path``, or DuplicateObjectError if it exists."""
+        from google.api_core import exceptions
+
+        destination = self.bucket.blob(storage_path)
+        try:
+            token, _, _ = destination.rewrite(source, if_generation_match=0)
+            while token is not None:
+                token, _, _ = destination.rewrite(source, token=token, if_generation_match=0)
+        except exceptions.PreconditionFailed:
+            raise DuplicateObjectError(storage_path)
+
+    def list_page(
+        self,
+        prefix: str,
+        page_size: int = 1000,
+        page_token: Optional[str] = None
+    ) -> Tuple[list, Optional[str]]:
+        """
+        One page of the objects under ``prefix`` and the token of the next
+        page (None after the last), so a listing can be walked, checkpointed
+        and resumed without holding it in memory.
+        """
+        iterator = self.bucket.list_blobs(prefix=prefix, page_size=page_size, page_token=page_token)
+        page = next(iterator.pages, None)
+        blobs = list(page) if page is not None else []
+        return blobs, iterator.next_page_token
+
+    def hash_object(self, blob_name: str, max_size: Optional[int] = None) -> Tuple[str, int]:
+        """
+        Stream an object through SHA-256 and the PDF checks; returns ``(hash, size)``.
+
+        Only ``chunk_size`` bytes are held at a time. Raises
+        UploadValidationError if the object is not an acceptable PDF.
+        """
+        def read() -> Tuple[str, int]:
+            with self.bucket.blob(blob_name).open("rb", chunk_size=self.chunk_size) as source:
+                reader = HashingReader(source, max_size=max_size or settings.MAX_UPLOAD_SIZE)
+                while reader.read(self.chunk_size):
+                    pass
+                return reader.hexdigest(), reader.bytes_read
+
+        return retry_blocking(read, retry_on=_transient_errors())
+
+    def adopt_object(self, blob_name: str, file_hash: str) -> str:
+        """
+        Copy an object stored under another name (e.g. a legacy ``uploads/``
+        path) to its content-addressed path and return that path. The
+        source is kept; the copy is skipped if the content is already stored.
+        """
+        storage_path = object_path(file_hash)
+        try:
+            self._rewrite_if_absent(self.bucket.blob(blob_name), storage_path)
+        except DuplicateObjectError:
+            pass
+        return storage_path
+
+    def discard_staged(self, staged: StagedUpload):
+        """Delete a staged upload that will not be committed."""
+        self._delete_quietly(self.bucket.blob(staged.blob_name))
+
     def upload_file(self, file: BinaryIO, file_name: str) -> Tuple[str, str]:
         """Upload file to GCS and return storage path and file hash."""
-        file_hash = self.compute_file_hash(file)
-        
-        # Create path with date prefix for better organization
-        date_prefix = datetime.now().strftime("%Y/%m/%d")
-        storage_path = f"uploads/{date_prefix}/{file_hash}/{file_name}"
-        
-        blob = self.bucket.blob(storage_path)
-        blob.upload_from_file(file)
-        
-        return storage_path, file_hash
-    
-    def generate_signed_url(self, storage_path: str, expiration_minutes: int = 30) -> str:
-        """Generate signed URL for file access."""
+        staged = self.stage_file(file)
+        storage_path = self.commit_staged(staged, file_name)
+        return storage_path, staged.file_hash
+
+    def generate_signed_url(
+        self,
+        storage_path: str,
+        expiration_minutes: int = 30,
+        method: str = "GET",
+        download_name: Optional[str] = None
+    ) -> str:
+        """
+        Generate signed URL for file access, reusing a cached one while it is fresh.
+
+        ``download_name`` sets the file name a browser saves the object as,
+        since content-addressed objects are named by hash.
+        """
+        key = (storage_path, method, expiration_minutes, download_name)
+        url = self.signed_url_cache.get(key)
+        if url is not None:
+            return url
+
         blob = self.bucket.blob(storage_path)
+        started = time.perf_counter()
+        expires_at = time.time() + expiration_minutes * 60
         url = blob.generate_signed_url(
             version="v4",
             expiration=timedelta(minutes=expiration_minutes),
-            method="GET"
+            method=method,
+            response_disposition=(
+                f'attachment; filename="{download_name}"' if download_name else None
+            )
+        )
+        self.signed_url_cache.put(key, url, expires_at, time.perf_counter() - started)
+        return url
+
+    def generate_signed_urls(
+        self,
+        storage_paths: Iterable[str],
+        expiration_minutes: int = 30,
+        method: str = "GET"
+    ) -> Dict[str, str]:
+        """Generate signed URLs for many objects, e.g. for a listing page."""
+        return {
+            storage_path: self.generate_signed_url(storage_path, expiration_minutes, method)
+            for storage_path in dict.fromkeys(storage_paths)
+        }
+
+    def _delete_quietly(self, blob):
+        from google.api_core import exceptions
+
+        try:
+            blob.delete()
+        except exceptions.NotFound:
+            pass
+
+
+class AsyncStorageService:
+    """
+    Asyncio facade over StorageService.
+
+    The google-cloud-storage client is synchronous, so every call is run on
+    the bounded I/O thread pool (``IO_MAX_WORKERS``) instead of the event loop.
+    """
+
+    def __init__(self, storage_service: StorageService):
+        self.sync = storage_service
+
+    async def stage_file(
+        self,
+        file: BinaryIO,
+        max_size: Optional[int] = None,
+        size: Optional[int] = None
+    ) -> StagedUpload:
+        return await run_blocking(self.sync.stage_file, file, max_size, size)
+
+    async def commit_staged(self, staged: StagedUpload, file_name: str) -> str:
+        return await run_blocking(self.sync.commit_staged, staged, file_name)
+
+    async def discard_staged(self, staged: StagedUpload):
+        await run_blocking(self.sync.discard_staged, staged)
+
+    async def list_page(
+        self,
+        prefix: str,
+        page_size: int = 1000,
+        page_token: Optional[str] = None
+    ) -> Tuple[list, Optional[str]]:
+        return await run_blocking(self.sync.list_page, prefix, page_size, page_token)
+
+    async def hash_object(self, blob_name: str, max_size: Optional[int] = None) -> Tuple[str, int]:
+        return await run_blocking(self.sync.hash_object, blob_name, max_size)
+
+    async def adopt_object(self, blob_name: str, file_hash: str) -> str:
+        return await run_blocking(self.sync.adopt_object, blob_name, file_hash)
+
+    async def upload_file(self, file: BinaryIO, file_name: str) -> Tuple[str, str]:
+        return await run_blocking(self.sync.upload_file, file, file_name)
+
+    async def generate_signed_url(
+        self,
+        storage_path: str,
+        expiration_minutes: int = 30,
+        method: str = "GET",
+        download_name: Optional[str] = None
+    ) -> str:
+        return await run_blocking(
+            self.sync.generate_signed_url, storage_path, expiration_minutes, method, download_name
+        )
+
+    async def generate_signed_urls(
+        self,
+        storage_paths: Iterable[str],
+        expiration_minutes: int = 30,
+        method: str = "GET"
+    ) -> Dict[str, str]:
+        return await run_blocking(
+            self.sync.generate_signed_urls, list(storage_paths), expiration_minutes, method
         )
-        return url 
\ No newline at end of file
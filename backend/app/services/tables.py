@@ -0,0 +1,169 @@
+import json
+import os
+from typing import Dict, Iterable, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from ..utils.numeric import (
+    AMOUNT_TOKEN, DASH_TOKEN, PERCENT_TOKEN, YEAR_TOKEN, detect_scale, parse_amounts, parse_percentages
+)
+
+TABLE_KEY = ["page_number", "table_index", "row_index"]
+VALUE_KINDS = ["amount", "percent", "year"]
+TABLE_COLUMNS = [*TABLE_KEY, "column", "label", "text", "kind", "value", "scale"]
+
+
+def _empty_values() -> pd.DataFrame:
+    return pd.DataFrame({
+        'page_number': pd.Series(dtype="int32"),
+        'table_index': pd.Series(dtype="int16"),
+        'row_index': pd.Series(dtype="int32"),
+        'column': pd.Series(dtype="int16"),
+        'label': pd.Series(dtype="string"),
+        'text': pd.Series(dtype="string"),
+        'kind': pd.Categorical([], categories=VALUE_KINDS),
+        'value': pd.Series(dtype="float64"),
+        'scale': pd.Series(dtype="float64"),
+    })
+
+
+def table_values(pages: Iterable[dict]) -> pd.DataFrame:
+    """
+    Normalize the pdfplumber tables of extracted pages into typed values.
+
+    Returns one row per numeric token of every table row: its position
+    among the row's values (``column``), the row's text as ``label``, the
+    raw token, its ``kind`` (amount, percent or year) and its float
+    ``value``. Cells are split into tokens because pdfplumber often packs
+    a whole row into one cell. Amounts are multiplied by the table's scale
+    marker (e.g. "(Dollars in Thousands)"), or else the page's; a lone dash
+    is a zero amount (rows of dashes only are dropped), and rows whose only
+    numbers are years are headers.
+    Splitting, matching and parsing are vectorized (pandas/Arrow string
+    kernels) over the whole book; there is no per-cell Python loop.
+    """
+    pages = list(pages)
+    cells = pd.DataFrame(
+        [
+            (page['page_number'], table_index, row_index, cell)
+            for page in pages
+            for table_index, table in enumerate(page.get('tables') or [])
+            for row_index, row in enumerate(table)
+            for cell in row
+            if cell
+        ],
+        columns=["page_number", "table_index", "row_index", "text"]
+    )
+    # Split in Arrow rather than str.split().explode(), which builds a Python list per cell
+    split = pc.utf8_split_whitespace(pa.array(cells["text"], type=pa.string()))
+    tokens = pd.Series(
+        pd.arrays.ArrowStringArray(pc.list_flatten(split)),
+        index=pc.list_parent_indices(split).to_numpy()
+    )
+    tokens = tokens[tokens != ""]
+    if tokens.empty:
+        return _empty_values()
+
+    is_percent = tokens.str.match(PERCENT_TOKEN)
+    is_dash = tokens.str.match(DASH_TOKEN)
+    is_amount = tokens.str.match(AMOUNT_TOKEN) & ~is_dash
+    is_number = is_amount | is_percent | is_dash
+    rows = cells.loc[tokens.index, TABLE_KEY]
+    # A row's cells are adjacent, so a new row starts wherever the key changes
+    cell_row = cells[TABLE_KEY].diff().ne(0).any(axis=1).cumsum()
+    row_id = cell_row.loc[tokens.index]
+
+    # Tokens keep cell order, so each row's label tokens are one contiguous run
+    label_rows = row_id[~is_number].to_numpy()
+    starts = np.flatnonzero(np.r_[True, label_rows[1:] != label_rows[:-1]])
+    runs = pa.ListArray.from_arrays(
+        np.r_[starts, len(label_rows)].astype("int32"),
+        pa.array(tokens[~is_number], type=pa.string())
+    )
+    labels = pd.Series(pc.binary_join(runs, " ").to_numpy(zero_copy_only=False), index=label_rows[starts])
+    values = pd.DataFrame({
+        **{name: rows[name][is_number].to_numpy() for name in TABLE_KEY},
+        'row_id': row_id[is_number].to_numpy(),
+        'text': tokens[is_number].to_numpy(),
+        'percent': is_percent[is_number].to_numpy(),
+        'dash': is_dash[is_number].to_numpy(),
+    })
+    # Rows of dashes only are rules or empty header cells, not zeros
+    values = values[~values["dash"].groupby(values["row_id"]).transform("all")].reset_index(drop=True)
+    values["column"] = values.groupby("row_id").cumcount()
+    values["label"] = labels.reindex(values["row_id"]).fillna("").to_numpy()
+
+    year = values["text"].str.match(YEAR_TOKEN)
+    header_row = year.groupby(values["row_id"]).transform("all")
+    kind = np.select(
+        [values["percent"], header_row & year],
+        ["percent", "year"],
+        default="amount"
+    )
+    values["kind"] = pd.Categorical(kind, categories=VALUE_KINDS)
+
+    # A marker in the table wins over one elsewhere on the page
+    cell_scale = detect_scale(cells["text"])
+    table_scale = cell_scale.groupby([cells["page_number"], cells["table_index"]]).first()
+    page_scale = detect_scale(pd.Series(
+        [page.get('text', "") for page in pages], index=[page['page_number'] for page in pages]
+    ))
+    table_index = pd.MultiIndex.from_arrays([values["page_number"], values["table_index"]])
+    scale = table_scale.reindex(table_index).to_numpy()
+    scale = np.where(np.isnan(scale), page_scale.reindex(values["page_number"]).to_numpy(), scale)
+    values["scale"] = np.where(values["kind"] == "amount", np.nan_to_num(scale, nan=1.0), 1.0)
+
+    percent, dash = values["percent"], values["dash"]
+    parsed = pd.Series(0.0, index=values.index)
+    parsed[percent] = parse_percentages(values["text"][percent])
+    amount = ~percent & ~dash
+    parsed[amount] = parse_amounts(values["text"][amount])
+    values["value"] = parsed * values["scale"]
+    return values[TABLE_COLUMNS].astype({
+        'page_number': "int32",
+        'table_index': "int16",
+        'row_index': "int32",
+        'column': "int16",
+        'label': "string",
+        'text': "string",
+    })
+
+
+def table_frames(values: pd.DataFrame) -> Dict[Tuple[int, int], pd.DataFrame]:
+    """
+    One typed DataFrame per table, keyed by (page_number, table_index).
+
+    Rows are the table's value rows, indexed by (row_index, label); columns
+    are value positions, holding float64 values. Header (year) rows are left out.
+    """
+    body = values[values["kind"] != "year"]
+    wide = body.pivot_table(
+        index=["page_number", "table_index", "row_index", "label"],
+        columns="column",
+        values="value",
+        aggfunc="first",
+        observed=True
+    )
+    return {
+        key: frame.droplevel(["page_number", "table_index"]).dropna(axis=1, how="all")
+        for key, frame in wide.groupby(level=["page_number", "table_index"])
+    }
+
+
+def write_tables(pages_path: str, output_path: str) -> int:
+    """
+    Normalize the tables of ``pages.jsonl`` into a Parquet file (runs in a worker process).
+
+    Returns the number of values written.
+    """
+    with open(pages_path, encoding="utf-8") as f:
+        values = table_values(json.loads(line) for line in f)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    values.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    return len(values)
+
+
+def read_tables(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path, memory_map=True)
@@ -0,0 +1,147 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from ..core.config import settings
+
+
+def get_pinecone_index():
+    """Connect to the Pinecone index created by scripts/setup_pinecone.py."""
+    from pinecone import Pinecone
+
+    settings.require("Pinecone", "PINECONE_API_KEY", "PINECONE_INDEX_NAME")
+    pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+    return pc.Index(settings.PINECONE_INDEX_NAME)
+
+
+def matches_filter(metadata: dict, filter: Optional[dict]) -> bool:
+    """Evaluate the subset of Pinecone's metadata filter language we use."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq" and value != operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$nin" and value in operand:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte") and value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+class InMemoryVectorIndex:
+    """
+    In-memory stand-in for a Pinecone ``Index`` client.
+
+    Implements the ``upsert`` / ``query`` / ``fetch`` / ``delete`` /
+    ``describe_index_stats`` calls the pipeline uses, with brute-force
+    cosine scoring, so tests and benchmarks run without a network.
+    """
+
+    def __init__(self, dimension: int = 1536):
+        self.dimension = dimension
+        self._namespaces: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.upsert_calls = 0
+
+    def upsert(self, vectors: Iterable, namespace: str = "") -> Dict[str, int]:
+        count = 0
+        with self._lock:
+            records = self._namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                if isinstance(vector, dict):
+                    vector_id, values, metadata = vector["id"], vector["values"], vector.get("metadata", {})
+                else:
+                    vector_id, values, *rest = vector
+                    metadata = rest[0] if rest else {}
+                values = np.asarray(values, dtype=np.float32)
+                if values.shape != (self.dimension,):
+                    raise ValueError(f"Vector dimension {values.shape} does not match index dimension {self.dimension}")
+                records[vector_id] = (values, metadata or {})
+                count += 1
+            self.upsert_calls += 1
+        return {"upserted_count": count}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        namespace: str = "",
+        filter: Optional[dict] = None,
+        include_metadata: bool = False,
+        include_values: bool = False
+    ) -> Dict[str, List[dict]]:
+        with self._lock:
+            records = [
+                (vector_id, values, metadata)
+                for vector_id, (values, metadata) in self._namespaces.get(namespace, {}).items()
+                if matches_filter(metadata, filter)
+            ]
+        if not records:
+            return {"matches": []}
+
+        matrix = np.stack([values for _, values, _ in records])
+        query = np.asarray(vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = matrix @ query / np.where(norms == 0, 1, norms)
+        top = np.argsort(-scores)[:top_k]
+
+        matches = []
+        for i in top:
+            vector_id, values, metadata = records[i]
+            match = {"id": vector_id, "score": float(scores[i])}
+            if include_metadata:
+                match["metadata"] = metadata
+            if include_values:
+                match["values"] = values.tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def fetch(self, ids: List[str], namespace: str = "") -> Dict[str, Dict[str, dict]]:
+        with self._lock:
+            records = self._namespaces.get(namespace, {})
+            return {"vectors": {
+                vector_id: {"id": vector_id, "values": records[vector_id][0].tolist(), "metadata": records[vector_id][1]}
+                for vector_id in ids if vector_id in records
+            }}
+
+    def delete(self, ids: Optional[List[str]] = None, namespace: str = "", delete_all: bool = False):
+        with self._lock:
+            if delete_all:
+                self._namespaces.pop(namespace, None)
+                return {}
+            records = self._namespaces.get(namespace, {})
+            for vector_id in ids or []:
+                records.pop(vector_id, None)
+        return {}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: {"vector_count": len(records)} for name, records in self._namespaces.items()}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+        }
@@ -0,0 +1,386 @@
+import json
+import os
+import threading
+from contextlib import suppress
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from ..core.config import settings
+from .vector_index import get_pinecone_index, matches_filter
+
+# Metadata fields kept as columns so filters on them are vectorized
+FILTER_FIELDS = ("file_hash", "company_name", "report_date")
+SCORE_BLOCK_ROWS = 65536
+
+
+@dataclass
+class VectorMatch:
+    id: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+class VectorStore(ABC):
+    """
+    Storage and top-k cosine search over chunk embeddings.
+
+    ``upsert`` takes the same arguments as a Pinecone ``Index`` so the
+    embedding pipeline can write to any store.
+    """
+
+    @abstractmethod
+    def upsert(self, vectors: Iterable, namespace: str = "") -> Dict[str, int]:
+        """Insert or replace ``(id, values, metadata)`` records."""
+
+    @abstractmethod
+    def query(
+        self,
+        vector: Sequence[float],
+        top_k: int = 10,
+        filter: Optional[dict] = None,
+        namespace: str = ""
+    ) -> List[VectorMatch]:
+        """Return the ``top_k`` most similar records, best first."""
+
+    def query_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        top_k: int = 10,
+        filter: Optional[dict] = None,
+        namespace: str = ""
+    ) -> List[List[VectorMatch]]:
+        return [self.query(vector, top_k, filter, namespace) for vector in vectors]
+
+    @abstractmethod
+    def delete(self, ids: Iterable[str], namespace: str = ""):
+        """Remove records by id."""
+
+    def flush(self):
+        """Persist buffered state; a no-op for remote stores."""
+
+
+class PineconeVectorStore(VectorStore):
+    """VectorStore over a Pinecone ``Index`` (or InMemoryVectorIndex)."""
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else get_pinecone_index()
+
+    def upsert(self, vectors: Iterable, namespace: str = "") -> Dict[str, int]:
+        return self.index.upsert(vectors=list(vectors), namespace=namespace)
+
+    def query(self, vector, top_k=10, filter=None, namespace=""):
+        response = self.index.query(
+            vector=list(map(float, vector)),
+            top_k=top_k,
+            filter=filter,
+            namespace=namespace,
+            include_metadata=True
+        )
+        return [
+            VectorMatch(match["id"], float(match["score"]), dict(match.get("metadata") or {}))
+            for match in response["matches"]
+        ]
+
+    def delete(self, ids, namespace=""):
+        self.index.delete(ids=list(ids), namespace=namespace)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vectorized local vector search over a memory-mapped embedding matrix.
+
+    Vectors are L2-normalized on insert so cosine similarity is a single
+    matrix product; a batch of queries is scored at once and the top-k per
+    query is selected with ``argpartition`` rather than a full sort. With
+    ``quantize=True`` vectors are stored as int8 with a per-row scale (4x
+    smaller, slightly approximate scores). Filters on FILTER_FIELDS are
+    evaluated as column masks before scoring.
+
+    Files live under ``path``: ``vectors.f32`` / ``vectors.i8`` (+
+    ``scales.f32``) and ``index.json`` with ids and metadata. Every upsert
+    and delete is also appended to ``delta.jsonl`` once its vectors are
+    written, and replayed when the store is opened, so a crash loses
+    nothing that was acknowledged; ``flush()`` (the embedding pipeline's
+    stop) rewrites ``index.json`` and drops the log. Namespaces are not
+    supported.
+    """
+
+    def __init__(self, path: str, dimension: int = 1536, quantize: bool = False, initial_capacity: int = 1024):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                state = json.load(f)
+            dimension, quantize = state["dimension"], state["quantize"]
+            self._ids: List[Optional[str]] = state["ids"]
+            self._metadata: List[dict] = state["metadata"]
+        else:
+            self._ids, self._metadata = [], []
+        self.dimension = dimension
+        self.quantize = quantize
+        self._log_path = os.path.join(path, "delta.jsonl")
+        self._replay()
+        self._rows: Dict[str, int] = {vector_id: row for row, vector_id in enumerate(self._ids) if vector_id is not None}
+        self._count = len(self._ids)
+        self._check_rows()
+        self._open(max(initial_capacity, self._count))
+
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._alive[:self._count] = [vector_id is not None for vector_id in self._ids]
+        self._columns = {name: np.full(self._capacity, "", dtype=object) for name in FILTER_FIELDS}
+        for row, metadata in enumerate(self._metadata):
+            for name in FILTER_FIELDS:
+                self._columns[name][row] = str(metadata.get(name, ""))
+
+    def _log(self, change: dict):
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(change, ensure_ascii=False) + "\n")
+
+    def _replay(self):
+        """Re-apply the upserts and deletes logged since ``index.json`` was written."""
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "rb+") as f:
+            for line in iter(f.readline, b""):
+                if not line.endswith(b"\n"):
+                    # Torn by a crash mid-write; cut it off so later changes append cleanly
+                    f.truncate(f.tell() - len(line))
+                    break
+                change = json.loads(line)
+                for vector_id, row, metadata in change.get('upsert', ()):
+                    if row == len(self._ids):
+                        self._ids.append(vector_id)
+                        self._metadata.append(metadata)
+                    else:
+                        self._ids[row], self._metadata[row] = vector_id, metadata
+                for row in change.get('delete', ()):
+                    self._ids[row], self._metadata[row] = None, {}
+
+    def _check_rows(self):
+        """Fail if the vector files hold fewer rows than there are ids."""
+        files = [("vectors.i8", self.dimension), ("scales.f32", 4)] if self.quantize else [
+            ("vectors.f32", self.dimension * 4)
+        ]
+        for file_name, row_bytes in files:
+            file_path = os.path.join(self.path, file_name)
+            rows = os.path.getsize(file_path) // row_bytes if os.path.exists(file_path) else 0
+            if rows < self._count:
+                raise RuntimeError(
+                    f"Vector store {self.path} is inconsistent: {self._count} ids but {rows} rows in {file_name}"
+                )
+
+    def _open(self, capacity: int):
+        """(Re)map the vector files with room for ``capacity`` rows."""
+        if self.quantize:
+            self._vectors = self._map("vectors.i8", np.int8, (capacity, self.dimension))
+            self._scales = self._map("scales.f32", np.float32, (capacity,))
+        else:
+            self._vectors = self._map("vectors.f32", np.float32, (capacity, self.dimension))
+            self._scales = None
+        self._capacity = capacity
+
+    def _map(self, file_name: str, dtype, shape: tuple) -> np.memmap:
+        file_path = os.path.join(self.path, file_name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+    def _grow(self, needed: int):
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        self._vectors.flush()
+        self._open(capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        for name in FILTER_FIELDS:
+            column = self._columns[name]
+            self._columns[name] = np.concatenate([column, np.full(capacity - len(column), "", dtype=object)])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def upsert(self, vectors: Iterable, namespace: str = "") -> Dict[str, int]:
+        records = [
+            (vector["id"], vector["values"], vector.get("metadata", {})) if isinstance(vector, dict)
+            else (vector[0], vector[1], vector[2] if len(vector) > 2 else {})
+            for vector in vectors
+        ]
+        if not records:
+            return {"upserted_count": 0}
+        values = np.asarray([record[1] for record in records], dtype=np.float32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            rows = []
+            for vector_id, _, metadata in records:
+                row = self._rows.get(vector_id)
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                    self._rows[vector_id] = row
+                    self._ids.append(vector_id)
+                    self._metadata.append({})
+                rows.append(row)
+            if self._count > self._capacity:
+                self._grow(self._count)
+
+            rows = np.asarray(rows)
+            if self.quantize:
+                scales = np.abs(values).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self._vectors[rows] = np.round(values / scales[:, None]).astype(np.int8)
+                self._scales[rows] = scales
+            else:
+                self._vectors[rows] = values
+            self._alive[rows] = True
+            for row, (_, _, metadata) in zip(rows, records):
+                self._metadata[row] = metadata or {}
+                for name in FILTER_FIELDS:
+                    self._columns[name][row] = str(self._metadata[row].get(name, ""))
+            # The vectors are in the shared mapping already, so the rows the log names are complete
+            self._log({'upsert': [
+                [vector_id, int(row), self._metadata[row]] for (vector_id, _, _), row in zip(records, rows)
+            ]})
+        return {"upserted_count": len(records)}
+
+    def delete(self, ids: Iterable[str], namespace: str = ""):
+        with self._lock:
+            rows = []
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    self._ids[row] = None
+                    self._metadata[row] = {}
+                    rows.append(row)
+            if rows:
+                self._log({'delete': rows})
+
+    def _filter_mask(self, filter: Optional[dict]) -> np.ndarray:
+        mask = self._alive[:self._count].copy()
+        if not filter:
+            return mask
+        for key, condition in filter.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._filter_mask(sub)
+                continue
+            if key not in self._columns:
+                # Fall back to per-row evaluation for unindexed fields
+                rows = np.flatnonzero(mask)
+                keep = [matches_filter(self._metadata[row], {key: condition}) for row in rows]
+                mask[rows[~np.asarray(keep, dtype=bool)]] = False
+                continue
+            column = self._columns[key][:self._count]
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, operand in condition.items():
+                if op == "$eq":
+                    mask &= column == str(operand)
+                elif op == "$ne":
+                    mask &= column != str(operand)
+                elif op == "$in":
+                    mask &= np.isin(column, [str(value) for value in operand])
+                elif op == "$nin":
+                    mask &= ~np.isin(column, [str(value) for value in operand])
+                elif op in ("$gt", "$gte", "$lt", "$lte"):
+                    present = column != ""
+                    mask &= present
+                    compare = {"$gt": np.greater, "$gte": np.greater_equal,
+                               "$lt": np.less, "$lte": np.less_equal}[op]
+                    mask[present] &= compare(column[present], str(operand)).astype(bool)
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+    def query(self, vector, top_k=10, filter=None, namespace=""):
+        return self.query_batch([vector], top_k, filter, namespace)[0]
+
+    def query_batch(self, vectors, top_k=10, filter=None, namespace="", candidate_ids: Optional[Iterable[str]] = None):
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            mask = self._filter_mask(filter)
+            if candidate_ids is not None:
+                candidates = np.zeros_like(mask)
+                rows = [self._rows[vector_id] for vector_id in candidate_ids if vector_id in self._rows]
+                candidates[rows] = True
+                mask &= candidates
+            rows = np.flatnonzero(mask)
+            if len(rows) == 0:
+                return [[] for _ in queries]
+
+            scores = self._score(queries, None if len(rows) == self._count else rows)
+
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for query_scores, candidates in zip(scores, top):
+                ordered = candidates[np.argsort(-query_scores[candidates])]
+                results.append([
+                    VectorMatch(self._ids[rows[i]], float(query_scores[i]), self._metadata[rows[i]])
+                    for i in ordered
+                ])
+            return results
+
+    def _score(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Cosine scores of each query against ``rows`` (all rows if None)."""
+        count = self._count if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        # Score in blocks so int8 rows are widened a block at a time
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, count)
+            block = self._vectors[start:end] if rows is None else self._vectors[rows[start:end]]
+            scores[:, start:end] = queries @ block.T.astype(np.float32, copy=False)
+            if self._scales is not None:
+                block_scales = self._scales[start:end] if rows is None else self._scales[rows[start:end]]
+                scores[:, start:end] *= block_scales
+        return scores
+
+    def flush(self):
+        """Persist vectors and the id/metadata index to disk."""
+        with self._lock:
+            self._vectors.flush()
+            if self._scales is not None:
+                self._scales.flush()
+            tmp_path = os.path.join(self.path, "index.json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "dimension": self.dimension,
+                    "quantize": self.quantize,
+                    "ids": self._ids,
+                    "metadata": self._metadata,
+                }, f)
+            os.replace(tmp_path, os.path.join(self.path, "index.json"))
+            # Replaying the log over the new index would be harmless, so a crash here loses nothing
+            with suppress(FileNotFoundError):
+                os.remove(self._log_path)
+
+
+def combine_filters(*filters: Optional[dict]) -> Optional[dict]:
+    """AND metadata filters together, skipping empty ones."""
+    filters = [filter for filter in filters if filter]
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else {'$and': filters}
+
+
+def create_vector_store() -> VectorStore:
+    """Build the store selected by VECTOR_STORE_BACKEND."""
+    if settings.VECTOR_STORE_BACKEND == "pinecone":
+        return PineconeVectorStore()
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return LocalVectorStore(
+            os.path.join(settings.PROCESSED_DATA_PATH, "vector_store"),
+            dimension=settings.VECTOR_DIMENSION,
+            quantize=settings.VECTOR_STORE_QUANTIZE
+        )
+    raise ValueError(f"Unknown vector store backend: {settings.VECTOR_STORE_BACKEND}")
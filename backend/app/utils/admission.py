@@ -0,0 +1,134 @@
+import json
+from typing import Dict, Optional
+from ..core.config import ConfigurationError
+from .concurrency import ByteBudget
+from .metrics import UPLOAD_ADMISSIONS, UPLOAD_BUDGET_UTILIZATION, UPLOAD_IN_FLIGHT_BYTES
+
+# Boundaries and part headers around a single multipart file field
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def check_limits(limits: Dict[str, int], max_in_flight_bytes: int):
+    """
+    Fail unless every path's limit fits in the in-flight budget.
+
+    A larger request would still be admitted when nothing else is in
+    flight, and then hold every other upload off until it finished.
+    """
+    oversized = [f"{path} ({limit} bytes)" for path, limit in limits.items() if limit > max_in_flight_bytes]
+    if oversized:
+        raise ConfigurationError(
+            f"Upload limits of {', '.join(oversized)} exceed UPLOAD_MAX_IN_FLIGHT_BYTES ({max_in_flight_bytes} bytes)"
+        )
+
+
+async def _refuse(send, status: int, detail: str, headers: Optional[Dict[str, str]] = None):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"connection", b"close"),
+            *((name.lower().encode(), value.encode()) for name, value in (headers or {}).items()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class UploadAdmissionMiddleware:
+    """
+    ASGI middleware admitting upload requests by size before their body is read.
+
+    ``limits`` maps upload paths to their largest accepted request body. A
+    POST declaring a larger Content-Length gets 413, and one whose size
+    would take the bodies being received by this process over
+    ``max_in_flight_bytes`` gets 503 with Retry-After. Both are answered
+    before the application reads (or, with ``Expect: 100-continue``, the
+    client sends) a single body byte, so form parsing never spools a
+    request that would be refused. Requests without a Content-Length
+    reserve their path's limit; a body that outgrows its reservation is
+    cut off and answered with 413. Every limit must fit in the budget (see
+    ``check_limits``). A request's bytes stay reserved until its response
+    has been sent, which includes staging the files and writing their
+    metadata.
+    """
+
+    def __init__(self, app, limits: Dict[str, int], max_in_flight_bytes: int, retry_after: int = 5):
+        check_limits(limits, max_in_flight_bytes)
+        self.app = app
+        self.limits = limits
+        self.budget = ByteBudget(max_in_flight_bytes)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = _content_length(scope)
+        if declared is not None and declared > limit:
+            UPLOAD_ADMISSIONS.labels("too_large").inc()
+            await _refuse(send, 413, f"Request exceeds maximum upload size of {limit} bytes")
+            return
+        size = limit if declared is None else declared
+        if not self.budget.try_acquire(size):
+            UPLOAD_ADMISSIONS.labels("over_budget").inc()
+            await _refuse(
+                send, 503, "Too many uploads in progress",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            return
+        UPLOAD_ADMISSIONS.labels("admitted").inc()
+        self._record_usage()
+
+        received = 0
+        too_large = False
+        started = False
+
+        async def receive_within_size():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > size:
+                    # Stop reading; the application sees a disconnect
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_unless_cut_off(message):
+            nonlocal started
+            if too_large and not started:
+                return  # Replaced by the 413 below
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_within_size, send_unless_cut_off)
+        except Exception:
+            if not too_large or started:
+                raise
+        finally:
+            await self.budget.release(size)
+            self._record_usage()
+        if too_large and not started:
+            UPLOAD_ADMISSIONS.labels("too_large").inc()
+            await _refuse(send, 413, f"Request body exceeds {size} bytes")
+
+    def _record_usage(self):
+        UPLOAD_IN_FLIGHT_BYTES.set(self.budget.in_flight)
+        UPLOAD_BUDGET_UTILIZATION.set(self.budget.in_flight / self.budget.limit)
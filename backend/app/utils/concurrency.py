@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+
+
+def configure_io_executor(max_workers: int) -> ThreadPoolExecutor:
+    """(Re)create the shared I/O thread pool with the given size."""
+    global _io_executor
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=True)
+    _io_executor = ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix="finsight-io"
+    )
+    return _io_executor
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool used for blocking client calls."""
+    if _io_executor is None:
+        return configure_io_executor(settings.IO_MAX_WORKERS)
+    return _io_executor
+
+
+def shutdown_io_executor():
+    """Wait for in-flight blocking calls and release the pool threads."""
+    global _io_executor
+    if _io_executor is not None:
+        _io_executor.shutdown(wait=True)
+        _io_executor = None
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_io_executor(),
+        functools.partial(func, *args, **kwargs)
+    )
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def retry_blocking(
+    func: Callable[[], Any],
+    attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    retry_on: tuple = (Exception,)
+) -> Any:
+    """Call ``func()`` with exponential backoff and full jitter between attempts."""
+    for attempt in range(attempts):
+        try:
+            return func()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning("Attempt %d/%d failed (%s); retrying in %.2fs", attempt + 1, attempts, e, delay)
+            time.sleep(delay)
+
+
+async def retry_async(
+    func: Callable[[], Any],
+    attempts: int = 5,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+    retry_on: tuple = (Exception,)
+) -> Any:
+    """Await ``func()`` with exponential backoff and full jitter between attempts."""
+    for attempt in range(attempts):
+        try:
+            return await func()
+        except retry_on as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning("Attempt %d/%d failed (%s); retrying in %.2fs", attempt + 1, attempts, e, delay)
+            await asyncio.sleep(delay)
+
+
+class ByteBudget:
+    """
+    Bound the total size of in-flight transfers.
+
+    ``reserve(size)`` waits until ``size`` more bytes fit under ``limit``;
+    ``try_acquire(size)`` takes them only if they fit now. A single
+    transfer larger than the limit is admitted once nothing else is in
+    flight, so oversized objects are slow but never stuck.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    def _fits(self, size: int) -> bool:
+        return self.in_flight == 0 or self.in_flight + size <= self.limit
+
+    async def acquire(self, size: int):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._fits(size))
+            self.in_flight += size
+
+    def try_acquire(self, size: int) -> bool:
+        """Take ``size`` bytes without waiting; False if they do not fit."""
+        # No await between the check and the update, so this cannot race other tasks
+        if not self._fits(size):
+            return False
+        self.in_flight += size
+        return True
+
+    async def release(self, size: int):
+        async with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, size: int):
+        await self.acquire(size)
+        try:
+            yield
+        finally:
+            await self.release(size)
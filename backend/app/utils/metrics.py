@@ -0,0 +1,166 @@
+import time
+from typing import Dict, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Seconds; spans a cache hit (~1 ms) to a large upload or extraction
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 180, 600)
+# Bytes/second; 100 KB/s to 1 GB/s
+THROUGHPUT_BUCKETS = tuple(10 ** exponent * factor for exponent in range(5, 9) for factor in (1, 2.5, 5))
+
+STAGE_SECONDS = Histogram(
+    "finsight_stage_seconds", "Time spent in each pipeline stage",
+    ["pipeline", "stage"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "finsight_stage_errors_total", "Pipeline stages that raised, by exception type",
+    ["pipeline", "stage", "error"]
+)
+STAGE_IN_FLIGHT = Gauge(
+    "finsight_stage_in_flight", "Pipeline stages currently running",
+    ["pipeline", "stage"]
+)
+STAGE_BYTES = Counter(
+    "finsight_stage_bytes_total", "Bytes processed by each pipeline stage",
+    ["pipeline", "stage"]
+)
+STAGE_THROUGHPUT = Histogram(
+    "finsight_stage_throughput_bytes_per_second", "Per-call throughput of byte-moving stages",
+    ["pipeline", "stage"], buckets=THROUGHPUT_BUCKETS
+)
+UPLOAD_OUTCOMES = Counter(
+    "finsight_uploads_total", "Uploaded files by outcome (uploaded, duplicate, rejected, throttled, failed)",
+    ["outcome"]
+)
+UPLOAD_ADMISSIONS = Counter(
+    "finsight_upload_admissions_total", "Upload requests by admission outcome (admitted, too_large, over_budget)",
+    ["outcome"]
+)
+UPLOAD_IN_FLIGHT_BYTES = Gauge(
+    "finsight_upload_in_flight_bytes", "Bytes reserved by upload requests being received"
+)
+UPLOAD_BUDGET_UTILIZATION = Gauge(
+    "finsight_upload_budget_utilization", "Fraction of the upload in-flight byte budget reserved"
+)
+QUEUE_JOBS = Gauge(
+    "finsight_queue_jobs", "Jobs in the durable queue by stage, lane and state (queued, running, failed)",
+    ["stage", "lane", "state"]
+)
+QUEUE_OLDEST_SECONDS = Gauge(
+    "finsight_queue_oldest_seconds", "Age of the oldest queued job by stage and lane",
+    ["stage", "lane"]
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "finsight_queue_wait_seconds", "Time from enqueue until a job is claimed",
+    ["stage", "lane"], buckets=STAGE_BUCKETS
+)
+JOB_OUTCOMES = Counter(
+    "finsight_jobs_total", "Finished job attempts by outcome (done, retried, failed)",
+    ["stage", "outcome"]
+)
+REPORT_STORE_BYTES = Gauge(
+    "finsight_report_store_bytes", "Disk used by processed reports at the last eviction pass"
+)
+REPORT_STORE_EVICTIONS = Counter(
+    "finsight_report_store_evictions_total", "Processed reports deleted to stay under the size cap"
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "finsight_http_request_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=STAGE_BUCKETS
+)
+
+_StageKey = Tuple[str, str]
+_children: Dict[_StageKey, tuple] = {}
+
+
+def _stage_metrics(pipeline: str, stage: str) -> tuple:
+    # Resolving label children once keeps each timed call to a dict lookup
+    key = (pipeline, stage)
+    children = _children.get(key)
+    if children is None:
+        children = _children[key] = (
+            STAGE_SECONDS.labels(pipeline, stage),
+            STAGE_IN_FLIGHT.labels(pipeline, stage),
+            STAGE_BYTES.labels(pipeline, stage),
+            STAGE_THROUGHPUT.labels(pipeline, stage),
+        )
+    return children
+
+
+class StageTimer:
+    """
+    Times one pipeline stage; create it with ``track``.
+
+    Records duration, in-flight count and, if ``bytes`` is set on the span,
+    bytes processed and throughput; an exception is counted against the
+    stage by type and re-raised. Usable in sync and async code alike::
+
+        with track("upload", "stage_file") as span:
+            staged = await storage_service.stage_file(file)
+            span.bytes = staged.file_size
+    """
+
+    __slots__ = ("pipeline", "stage", "bytes", "seconds", "_start")
+
+    def __init__(self, pipeline: str, stage: str):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.bytes: Optional[int] = None
+        self.seconds = 0.0
+
+    def __enter__(self) -> "StageTimer":
+        _stage_metrics(self.pipeline, self.stage)[1].inc()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        seconds, in_flight, total_bytes, throughput = _stage_metrics(self.pipeline, self.stage)
+        in_flight.dec()
+        seconds.observe(self.seconds)
+        if exc_type is not None:
+            STAGE_ERRORS.labels(self.pipeline, self.stage, exc_type.__name__).inc()
+        elif self.bytes:
+            total_bytes.inc(self.bytes)
+            if self.seconds > 0:
+                throughput.observe(self.bytes / self.seconds)
+        return False
+
+
+def track(pipeline: str, stage: str) -> StageTimer:
+    return StageTimer(pipeline, stage)
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording request latency by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the scope; templates keep cardinality bounded
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """The default registry in Prometheus text format, and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
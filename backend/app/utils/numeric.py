@@ -0,0 +1,62 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Whitespace-free tokens of financial text, e.g. "$1,234", "(48,175)", "1.14%", "-"
+AMOUNT_TOKEN = r"^\(?[-−]?[\$€£]?\(?[-−]?\d[\d,]*(?:\.\d+)?\)?[-−]?$"
+PERCENT_TOKEN = r"^\(?[-−]?\d[\d,]*(?:\.\d+)?%\)?$"
+DASH_TOKEN = r"^[-–—]$"
+YEAR_TOKEN = r"^(?:19|20)\d{2}$"
+
+# "(Dollars in Thousands)", "in millions, except per share data", "($000s)", "000's omitted"
+SCALE_FACTORS = {'thousand': 1e3, 'million': 1e6, 'billion': 1e9, '000': 1e3}
+_SCALE_PATTERN = (
+    r"(?i)\bin\s+(?:[a-z$€£.]+\s+){0,2}?(thousand|million|billion)s?\b"
+    r"|\(\s*[\$€£]?\s*(000)'?s?\s*(?:omitted)?\s*\)"
+    r"|\b(000)'?s\s+omitted"
+)
+_SCALE_MARKER = re.sub(r"(?<!\\)\((?!\?)", "(?:", _SCALE_PATTERN)  # same, without capture groups
+
+# A cell is numeric if, after cleanup, it is an optionally signed decimal
+_NUMBER_PATTERN = r"^-?\d+(?:\.\d+)?$"
+
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """
+    Vectorized conversion of financial amount strings to floats.
+
+    Handles currency symbols and codes, thousands separators, parentheses
+    negatives (also when the closing parenthesis was split off), Unicode
+    minus signs and trailing minus signs; anything else becomes NaN.
+    """
+    text = values.astype("string").str.strip().str.replace("−", "-", regex=False)
+    negative = text.str.contains(r"^\(|-$|^[\$€£]?\s*-", regex=True)
+    cleaned = (
+        text.str.replace(r"\b(?:USD|EUR|GBP)\b|[\$€£,\s()]", "", regex=True)
+        .str.strip("-")
+    )
+    numeric = pd.to_numeric(cleaned.where(cleaned.str.match(_NUMBER_PATTERN)), errors="coerce")
+    return numeric.abs().where(~negative.fillna(False), -numeric.abs()).astype("float64")
+
+
+def parse_percentages(values: pd.Series) -> pd.Series:
+    """Vectorized conversion of "12.5%" / "(1.14%)" strings to floats in percent; else NaN."""
+    text = values.astype("string").str.strip()
+    return parse_amounts(text.where(text.str.match(PERCENT_TOKEN)).str.replace("%", "", regex=False))
+
+
+def detect_scale(text: pd.Series) -> pd.Series:
+    """
+    Vectorized detection of scale markers such as "(Dollars in Thousands)".
+
+    Returns the multiplier stated by the first marker in each element
+    (1e3, 1e6 or 1e9), or NaN where there is none.
+    """
+    text = text.astype("string")
+    # contains() runs in Arrow's native regex engine; extract() only on the few matches
+    marked = text.str.contains(_SCALE_MARKER, regex=True).fillna(False).to_numpy(dtype=bool)
+    groups = text[marked].str.extract(_SCALE_PATTERN)
+    unit = groups[0].str.lower().fillna(groups[1]).fillna(groups[2])
+    scale = np.full(len(text), np.nan)
+    scale[marked] = unit.map(SCALE_FACTORS).to_numpy(dtype="float64", na_value=np.nan)
+    return pd.Series(scale, index=text.index)
@@ -0,0 +1,75 @@
+import logging
+import os
+import random
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerMiddleware:
+    """
+    Opt-in sampling profiler (pyinstrument) for individual requests.
+
+    A request is profiled when it carries ``?profile=1`` or an
+    ``X-Profile: 1`` header, in which case the HTML report is returned in
+    place of the normal response, or at random with ``sample_rate``, in
+    which case the report is written to ``output_dir``. Requests that are
+    not profiled pay one dict lookup and one random draw.
+    """
+
+    def __init__(self, app, interval: float = 0.001, sample_rate: float = 0.0, output_dir: Optional[str] = None):
+        from pyinstrument import Profiler
+
+        self.app = app
+        self.profiler_class = Profiler
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        if b"profile=1" in scope.get("query_string", b""):
+            return True
+        return any(name == b"x-profile" and value == b"1" for name, value in scope.get("headers", ()))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        sampled = not requested and self.output_dir and random.random() < self.sample_rate
+        if not (requested or sampled):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiler_class(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            if requested:
+                async def discard(message):
+                    pass
+                await self.app(scope, receive, discard)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+
+        if requested:
+            body = profiler.output_html().encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/html; charset=utf-8"),
+                            (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+        else:
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}_{scope['method']}{scope['path'].replace('/', '_')}.html"
+            try:
+                with open(os.path.join(self.output_dir, name), "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            except OSError:
+                logger.exception("Could not write profile %s", name)
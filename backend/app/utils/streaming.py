@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+from typing import AsyncIterable, BinaryIO, Optional
+
+PDF_MAGIC = b"%PDF-"
+
+
+class UploadValidationError(ValueError):
+    """Raised when an uploaded stream is not an acceptable PDF."""
+
+
+class FileTooLargeError(UploadValidationError):
+    """Raised when an uploaded stream exceeds the configured size limit."""
+
+
+class HashingReader:
+    """
+    File-like wrapper that hashes and validates a stream while it is read.
+
+    The consumer (e.g. a resumable GCS upload) drives the reads, so the
+    SHA-256 digest, the PDF magic-byte check and the size limit are all
+    computed in the same pass that pushes the bytes to storage. Bytes are
+    hashed exactly once even if the consumer seeks back to retry a chunk.
+    """
+
+    def __init__(self, file: BinaryIO, max_size: Optional[int] = None):
+        self._file = file
+        self._max_size = max_size
+        self._sha256 = hashlib.sha256()
+        self._position = file.tell() if file.seekable() else 0
+        self._start = self._position
+        self._hashed = self._position
+        self._header = b""
+
+    @property
+    def bytes_read(self) -> int:
+        """Number of distinct bytes consumed from the underlying stream."""
+        return self._hashed - self._start
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        if data:
+            self._consume(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self._file.seekable()
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        self._position = self._file.seek(offset, whence)
+        return self._position
+
+    def hexdigest(self) -> str:
+        """Return the SHA-256 of everything read, validating the stream was a PDF."""
+        if len(self._header) < len(PDF_MAGIC):
+            raise UploadValidationError("File is empty or not a valid PDF")
+        return self._sha256.hexdigest()
+
+    def _consume(self, data: bytes):
+        start = self._position
+        end = start + len(data)
+        self._position = end
+        if end <= self._hashed:
+            return  # Re-read after a seek; already hashed
+        if start > self._hashed:
+            raise ValueError("HashingReader does not support skipping forward")
+
+        new_bytes = memoryview(data)[self._hashed - start:]
+        if len(self._header) < len(PDF_MAGIC):
+            self._header += bytes(new_bytes[:len(PDF_MAGIC) - len(self._header)])
+            if not PDF_MAGIC.startswith(self._header):
+                raise UploadValidationError("File content is not a valid PDF")
+
+        self._hashed = end
+        if self._max_size is not None and self.bytes_read > self._max_size:
+            raise FileTooLargeError(
+                f"File exceeds maximum upload size of {self._max_size} bytes"
+            )
+        self._sha256.update(new_bytes)
+
+
+class RequestBodyReader:
+    """
+    Blocking file-like view of a request body that is still arriving.
+
+    Meant to be read on an I/O thread (e.g. by ``stage_file``): each read
+    pulls chunks from the async ``body`` iterator on ``loop``, so the body
+    is never spooled. Only unread chunks and the previous read are held,
+    the latter so a resumable upload can seek back to retry its last
+    chunk; seeking further back or forward raises.
+    """
+
+    def __init__(self, body: AsyncIterable[bytes], loop: asyncio.AbstractEventLoop):
+        self._body = body.__aiter__()
+        self._loop = loop
+        self._window = bytearray()  # Received bytes from _window_start on
+        self._window_start = 0
+        self._read_start = 0  # Start of the previous read, kept for rewinds
+        self._position = 0
+        self._exhausted = False
+
+    def read(self, size: int = -1) -> bytes:
+        # Everything before the previous read can no longer be asked for again
+        del self._window[:self._read_start - self._window_start]
+        self._window_start = self._read_start
+        self._read_start = self._position
+
+        offset = self._position - self._window_start
+        while not self._exhausted and (size < 0 or len(self._window) - offset < size):
+            chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self._loop).result()
+            if chunk is None:
+                self._exhausted = True
+            else:
+                self._window += chunk
+        end = len(self._window) if size < 0 else offset + size
+        data = bytes(self._window[offset:end])
+        self._position += len(data)
+        return data
+
+    async def _next_chunk(self) -> Optional[bytes]:
+        try:
+            return await self._body.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence != 0 or not self._window_start <= offset <= self._window_start + len(self._window):
+            raise ValueError("RequestBodyReader can only seek back into the previous read")
+        self._position = offset
+        return self._position
@@ -0,0 +1,89 @@
+"""
+Backfill: run every PDF already in the bucket through the pipeline.
+
+Walks the bucket listing page by page, reconciles each page against the
+Firestore ``pdf_files`` index and queues extraction (then embedding and
+loading) on the bulk lane, with workers running in this process. Legacy
+objects outside ``objects/`` are hashed and copied to their
+content-addressed path first. Progress is checkpointed after every page,
+so re-running the same command resumes an interrupted backfill.
+
+    python scripts/backfill.py --prefix uploads/ --prefix objects/
+    python scripts/backfill.py --reindex --restart  # Re-process files already done
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.api.deps import get_extraction_service, get_firestore_service, get_storage_service, services
+from backend.app.core.config import settings
+from backend.app.services.backfill import Backfill
+from backend.app.utils.concurrency import shutdown_io_executor
+
+
+async def report_progress(backfill: Backfill, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        print(json.dumps(await backfill.progress()), flush=True)
+
+
+async def backfill(args):
+    settings.require("Backfill", "PROCESSED_DATA_PATH")
+    checkpoint_path = args.checkpoint or os.path.join(settings.PROCESSED_DATA_PATH, "backfill.json")
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    runner = Backfill(
+        await get_storage_service(),
+        await get_firestore_service(),
+        await get_extraction_service(),
+        checkpoint_path,
+        page_size=args.page_size,
+        max_in_flight_bytes=args.max_in_flight_mb * 1024 * 1024 if args.max_in_flight_mb else None,
+        downloads=args.downloads,
+        reindex=args.reindex
+    )
+    reporter = asyncio.create_task(report_progress(runner, args.report_seconds))
+    try:
+        stats = await runner.run(args.prefix or ["objects/"])
+        listed = time.monotonic() - runner.started
+        print(f"\n📦 Listed {stats.listed} objects ({stats.listed_bytes / 1e9:,.2f} GB) in {listed:,.0f} s: "
+              f"{stats.queued} queued, {stats.up_to_date} up to date, {stats.recorded} new metadata documents, "
+              f"{stats.invalid} invalid, {stats.failed} failed")
+        if not args.no_wait:
+            await runner.wait_until_drained()
+            elapsed = time.monotonic() - runner.started
+            print(f"✅ Pipeline drained after {elapsed:,.0f} s ({stats.queued / elapsed:,.2f} files/s)")
+    finally:
+        reporter.cancel()
+        print(json.dumps(await runner.progress()))
+        # Flushes buffered report rows and the lexical index
+        await services.shutdown()
+        shutdown_io_executor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--prefix", action="append", help="Bucket prefix to walk, repeatable (default: objects/)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: PROCESSED_DATA_PATH/backfill.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    parser.add_argument("--reindex", action="store_true", help="Also re-process files that are already done")
+    parser.add_argument("--page-size", type=int, help="Objects per listing page")
+    parser.add_argument("--max-in-flight-mb", type=int, help="Legacy object bytes being hashed at once")
+    parser.add_argument("--downloads", type=int, help="Legacy objects hashed at once")
+    parser.add_argument("--report-seconds", type=float, default=30, help="Progress report interval")
+    parser.add_argument("--no-wait", action="store_true", help="Exit once everything is queued")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(backfill(args))
+
+
+if __name__ == "__main__":
+    main()
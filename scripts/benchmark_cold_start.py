@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark for the API.
+
+Measures, over ``--runs`` fresh interpreters: the time to import the app,
+the time from launching uvicorn until ``/health`` first answers, and which
+heavy client libraries were loaded by then (they should load on first use,
+not at startup). No cloud credentials are needed.
+
+    python scripts/benchmark_cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEAVY_MODULES = [
+    "google.cloud.storage", "google.cloud.firestore", "google.cloud.bigquery",
+    "pdfplumber", "pandas", "numpy", "openai", "pinecone", "sentence_transformers",
+]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import backend.app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def time_first_health(timeout: float = 60) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("Server did not become healthy")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [time_import() for _ in range(args.runs)]
+    health = [time_first_health() for _ in range(args.runs)]
+
+    print(f"\n⏱️  Cold start over {args.runs} runs")
+    print("-" * 50)
+    print(f"import app        median {statistics.median(i['seconds'] for i in imports) * 1000:8.1f} ms")
+    print(f"first /health     median {statistics.median(health) * 1000:8.1f} ms  (max {max(health) * 1000:.1f} ms)")
+    loaded = sorted({module for result in imports for module in result["loaded"]})
+    print(f"heavy libraries loaded at startup: {', '.join(loaded) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
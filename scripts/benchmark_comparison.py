@@ -0,0 +1,120 @@
+"""
+Throughput benchmark for the vectorized report comparison engine.
+
+Builds a synthetic base report with ``--line-items`` numeric line items and
+``--versions`` revisions of it (a few percent of values changed, some items
+added or removed), then compares the base against all versions with
+compare_line_items and with a per-item Python loop as the baseline.
+Turning page text and normalized table values into line items is timed
+separately.
+
+    python scripts/benchmark_comparison.py --line-items 50000 --versions 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.comparison import (
+    LINE_ITEM_KEY, compare_line_items, line_items_from_pages, line_items_from_tables
+)
+from backend.app.services.tables import table_values
+
+COLUMNS_PER_LINE = 5
+
+
+def make_report(line_items: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    lines = line_items // COLUMNS_PER_LINE
+    return pd.DataFrame({
+        'page_number': np.repeat(np.arange(lines) // 50 + 1, COLUMNS_PER_LINE),
+        'line_item': np.repeat([f"Account {i % 2000}" for i in range(lines)], COLUMNS_PER_LINE),
+        'column': np.tile(np.arange(COLUMNS_PER_LINE), lines),
+        'occurrence': np.repeat(np.arange(lines) // 2000, COLUMNS_PER_LINE),
+        'value': rng.normal(0, 5_000_000, lines * COLUMNS_PER_LINE).round(),
+    })
+
+
+def make_version(base: pd.DataFrame, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    version = base.copy()
+    changed = rng.random(len(version)) < 0.05
+    version.loc[changed, "value"] *= rng.uniform(0.5, 1.5, changed.sum())
+    version = version[rng.random(len(version)) > 0.005]
+    added = base.sample(frac=0.005, random_state=seed).assign(occurrence=lambda frame: frame["occurrence"] + 1000)
+    return pd.concat([version, added], ignore_index=True)
+
+
+def compare_loop(base: pd.DataFrame, versions: dict, threshold: float) -> int:
+    """Baseline: dict lookups and per-item Python arithmetic."""
+    base_values = {tuple(key): value for *key, value in base[[*LINE_ITEM_KEY, "value"]].itertuples(index=False)}
+    material = 0
+    for frame in versions.values():
+        values = {tuple(key): value for *key, value in frame[[*LINE_ITEM_KEY, "value"]].itertuples(index=False)}
+        for key in base_values.keys() | values.keys():
+            old, new = base_values.get(key), values.get(key)
+            if old is None or new is None:
+                material += abs(new if old is None else old) >= threshold
+            elif new != old:
+                _ = (new - old) / abs(old) * 100 if old else None
+                material += abs(new - old) >= threshold
+    return material
+
+
+def make_pages(base: pd.DataFrame):
+    """Pages whose text lines and single table both hold the report's line items."""
+    lines = base.groupby(["page_number", "line_item", "occurrence"], sort=False)["value"]
+    pages = {}
+    for (page_number, line_item, _), values in lines:
+        amounts = [f"({-value:,.0f})" if value < 0 else f"${value:,.0f}" for value in values]
+        pages.setdefault(page_number, []).append([line_item, *amounts])
+    return [
+        {'page_number': page_number, 'text': "\n".join(" ".join(row) for row in rows), 'tables': [rows]}
+        for page_number, rows in pages.items()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--line-items", type=int, default=50000)
+    parser.add_argument("--versions", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=1_000_000)
+    args = parser.parse_args()
+
+    base = make_report(args.line_items)
+    versions = {f"v{i}": make_version(base, seed=i + 1) for i in range(args.versions)}
+    print(f"\n📊 Comparing {len(base)} line items against {args.versions} versions")
+    print("-" * 50)
+
+    start = time.perf_counter()
+    differences = compare_line_items(base, versions, args.threshold)
+    vectorized = time.perf_counter() - start
+    material = int(differences["material"].sum())
+    print(f"vectorized  {vectorized:8.3f}s  {len(differences) / vectorized:12.0f} items/s  {material} material")
+
+    start = time.perf_counter()
+    looped = compare_loop(base, versions, args.threshold)
+    loop = time.perf_counter() - start
+    print(f"loop        {loop:8.3f}s  {len(differences) / loop:12.0f} items/s  {looped} material")
+    print(f"speedup     {loop / vectorized:8.1f}x")
+
+    pages = make_pages(base)
+    start = time.perf_counter()
+    parsed = line_items_from_pages(pages)
+    elapsed = time.perf_counter() - start
+    print(f"parse text  {elapsed:8.3f}s  {len(parsed) / elapsed:12.0f} items/s  ({len(pages)} pages)")
+
+    values = table_values(pages)  # Done once at extraction; comparisons read it from tables.parquet
+    start = time.perf_counter()
+    parsed = line_items_from_tables(values)
+    elapsed = time.perf_counter() - start
+    print(f"tables      {elapsed:8.3f}s  {len(parsed) / elapsed:12.0f} items/s  ({len(values)} table values)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Composite upload benchmark against a local GCS emulator.
+
+Stages one large synthetic PDF through ``StorageService.stage_file`` with
+an increasing number of parts (1 part = the single resumable stream) and
+reports throughput for each. Afterwards it interrupts a composite upload
+halfway and times the retry, which skips the parts already uploaded.
+
+Start an emulator and point the client at it, e.g. with fake-gcs-server:
+
+    docker run -d -p 4443:4443 fsouza/fake-gcs-server -scheme http
+    STORAGE_EMULATOR_HOST=http://localhost:4443 \\
+        python scripts/benchmark_composite_uploads.py --size-mb 512 --parts 1 2 4 8 16 32
+"""
+import argparse
+import hashlib
+import math
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "benchmark")
+
+from backend.app.services.storage import StorageService  # noqa: E402
+
+ALIGNMENT = 256 * 1024  # Part sizes are kept to multiples of the GCS chunk granularity
+
+
+class InterruptedReader:
+    """File wrapper that fails once ``limit`` bytes have been read, like a dropped connection."""
+
+    def __init__(self, file, limit: int):
+        self._file = file
+        self._limit = limit
+
+    def read(self, size: int = -1) -> bytes:
+        if self._file.tell() >= self._limit:
+            raise ConnectionError("Simulated crash")
+        return self._file.read(size)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def make_source(size: int) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as source:
+        source.write(b"%PDF-1.7\n")
+        remaining = size - 9
+        while remaining > 0:
+            block = os.urandom(min(remaining, 8 * 1024 * 1024))
+            source.write(block)
+            remaining -= len(block)
+        return source.name
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def part_size_for(size: int, parts: int) -> int:
+    return math.ceil(size / parts / ALIGNMENT) * ALIGNMENT
+
+
+def stage(service: StorageService, path: str) -> tuple:
+    with open(path, "rb") as source:
+        start = time.perf_counter()
+        staged = service.stage_file(source, max_size=os.path.getsize(path))
+        return staged, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--parts", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--parallelism", type=int, default=8, help="Parts in flight per upload")
+    parser.add_argument("--bucket", default="finsight-benchmark")
+    args = parser.parse_args()
+
+    if not os.environ.get("STORAGE_EMULATOR_HOST"):
+        parser.error("STORAGE_EMULATOR_HOST is not set; this benchmark only runs against an emulator")
+
+    size = args.size_mb * 1024 * 1024
+    path = make_source(size)
+    expected_hash = file_sha256(path)
+    try:
+        probe = StorageService(args.bucket)
+        if not probe.bucket.exists():
+            probe.storage_client.create_bucket(args.bucket)
+
+        print(f"\n⏱️  Staging a {args.size_mb} MB file (parallelism {args.parallelism})")
+        print("-" * 64)
+        baseline = None
+        for parts in args.parts:
+            part_size = part_size_for(size, parts)
+            service = StorageService(
+                args.bucket,
+                part_size=part_size,
+                parallelism=min(parts, args.parallelism),
+                composite_threshold=0 if parts > 1 else size + 1
+            )
+            staged, seconds = stage(service, path)
+            stored = service.bucket.get_blob(staged.blob_name)
+            assert staged.file_hash == expected_hash and stored.size == size, "Staged object does not match"
+            service.discard_staged(staged)
+
+            baseline = baseline or seconds
+            label = "single stream" if parts == 1 else f"{parts} x {part_size / 2**20:.1f} MB"
+            print(f"{label:>16}  {seconds:7.2f} s  {size / seconds / 1e6:8.1f} MB/s  {baseline / seconds:5.2f}x")
+
+        # Crash halfway through a composite upload, then retry the same file
+        parts = max(args.parts)
+        service = StorageService(
+            args.bucket,
+            part_size=part_size_for(size, parts),
+            parallelism=min(parts, args.parallelism),
+            composite_threshold=0
+        )
+        with open(path, "rb") as source:
+            try:
+                service.stage_file(InterruptedReader(source, size // 2), max_size=size)
+            except ConnectionError:
+                pass
+        staged, seconds = stage(service, path)
+        assert staged.file_hash == expected_hash
+        service.discard_staged(staged)
+        print(f"{'resumed retry':>16}  {seconds:7.2f} s  (after a crash at 50% with {parts} parts)")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+"""
+End-to-end benchmark of the API with local stand-ins for the cloud services.
+
+Runs the FastAPI app in-process (over ASGI, with the real extraction,
+embedding and loading pipeline) against a bucket in a local directory, an
+in-memory Firestore and InMemoryVectorIndex with simulated embeddings.
+Pass ``--emulators`` to use the GCS and Firestore emulators instead
+(``STORAGE_EMULATOR_HOST`` / ``FIRESTORE_EMULATOR_HOST``). A synthetic
+corpus of PDFs is uploaded concurrently; the benchmark reports upload
+latency percentiles, pipeline throughput until every file is processed,
+peak memory (API process and extraction workers) and cold start.
+
+Results are written as JSON to ``--output-dir`` (one file per run, named
+by time and commit) and compared with the previous run there, so
+regressions between commits show up as deltas.
+
+    python scripts/benchmark_e2e.py --documents 50 --pages 4 12 --concurrency 8
+"""
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend.app.core.config import settings
+from backend.app.services.dedup import DedupCache
+from backend.app.services.firestore import DuplicateFileError, FirestoreService
+from backend.app.services.storage import (
+    STAGING_PREFIX, DuplicateObjectError, StagedUpload, StorageService, object_path
+)
+from backend.app.utils.streaming import HashingReader
+
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "benchmark_results")
+LINE_ITEMS = [
+    "Net patient revenue", "Other operating revenue", "Salaries and wages", "Employee benefits",
+    "Supplies", "Purchased services", "Depreciation and amortization", "Interest expense",
+    "Operating income", "Investment income", "Cash and cash equivalents", "Accounts receivable",
+]
+
+
+# --- Synthetic corpus ----------------------------------------------------
+
+
+def _pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(page_count: int, seed: int) -> bytes:
+    """A text-only PDF of financial statement pages, unique per ``seed``."""
+    rng = random.Random(seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_number in range(1, page_count + 1):
+        lines = [f"Report {seed} - Statement of operations (in thousands) - page {page_number}", ""]
+        for item in rng.sample(LINE_ITEMS, 10):
+            current, prior = rng.randint(1_000, 9_999_999), rng.randint(1_000, 9_999_999)
+            change = (current - prior) / prior * 100
+            prior_text = f"({prior:,})" if rng.random() < 0.2 else f"{prior:,}"
+            lines.append(f"{item} {current:,} {prior_text} {change:.1f}%")
+        stream = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({_pdf_text(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {page_count} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_corpus(directory: str, documents: int, min_pages: int, max_pages: int, seed: int):
+    """Write the corpus to ``directory``; returns ``[(path, page_count)]``."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(documents):
+        page_count = rng.randint(min_pages, max_pages)
+        path = os.path.join(directory, f"report_{i:05d}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(page_count, seed * 1_000_003 + i))
+        corpus.append((path, page_count))
+    return corpus
+
+
+# --- Stand-ins -------------------------------------------------------------
+
+
+class LocalBlob:
+    def __init__(self, path: str):
+        self.path = path
+
+    def download_to_filename(self, destination: str):
+        shutil.copyfile(self.path, destination)
+
+
+class LocalBucket:
+    def __init__(self, root: str):
+        self.root = root
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(os.path.join(self.root, name))
+
+
+class LocalStorageService(StorageService):
+    """StorageService over a local directory, with an optional per-chunk latency."""
+
+    def __init__(self, root: str, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        self.chunk_size = 256 * 1024
+        self.bucket = LocalBucket(root)
+
+    def _path(self, name: str) -> str:
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def stage_file(self, file, max_size=None, size=None):
+        reader = HashingReader(file, max_size=max_size or settings.MAX_UPLOAD_SIZE)
+        name = f"{STAGING_PREFIX}/{uuid.uuid4().hex}"
+        try:
+            with open(self._path(name), "wb") as out:
+                while True:
+                    data = reader.read(self.chunk_size)
+                    if not data:
+                        break
+                    out.write(data)
+                    time.sleep(self.latency)
+            return StagedUpload(name, reader.hexdigest(), reader.bytes_read)
+        except Exception:
+            os.remove(self._path(name))
+            raise
+
+    def commit_staged(self, staged, file_name):
+        storage_path = object_path(staged.file_hash)
+        time.sleep(self.latency)
+        try:
+            os.link(self._path(staged.blob_name), self._path(storage_path))
+        except FileExistsError:
+            raise DuplicateObjectError(storage_path)
+        finally:
+            os.remove(self._path(staged.blob_name))
+        return storage_path
+
+    def discard_staged(self, staged):
+        os.remove(self._path(staged.blob_name))
+
+    def generate_signed_url(self, storage_path, expiration_minutes=30, method="GET", download_name=None):
+        return f"file://{self._path(storage_path)}"
+
+
+class InMemoryFirestoreService(FirestoreService):
+    """The ``pdf_files`` operations of FirestoreService over a dict."""
+
+    def __init__(self):
+        self.docs = {}
+        self.dedup_cache = DedupCache()
+        self.write_buffer = None
+
+    async def check_duplicate(self, file_hash):
+        return file_hash in self.docs
+
+    async def check_duplicates(self, file_hashes):
+        return {file_hash for file_hash in file_hashes if file_hash in self.docs}
+
+    async def store_file_metadata(self, file_hash, metadata):
+        if file_hash in self.docs:
+            raise DuplicateFileError(file_hash)
+        self.docs[file_hash] = {**metadata, 'created_at': datetime.datetime.now()}
+
+    async def store_many_file_metadata(self, items):
+        duplicates = {file_hash for file_hash in items if file_hash in self.docs}
+        for file_hash, metadata in items.items():
+            if file_hash not in duplicates:
+                self.docs[file_hash] = {**metadata, 'created_at': datetime.datetime.now()}
+        return duplicates
+
+    async def get_many_file_metadata(self, file_hashes):
+        return {file_hash: self.docs[file_hash] for file_hash in file_hashes if file_hash in self.docs}
+
+    async def update_many_file_metadata(self, items):
+        for file_hash, fields in items.items():
+            self.docs.setdefault(file_hash, {}).update(fields)
+
+    async def add_aliases(self, aliases):
+        for file_hash, names in aliases.items():
+            known = self.docs[file_hash].setdefault('aliases', [])
+            known.extend(name for name in names if name not in known)
+
+    async def list_files(self, limit=50, cursor=None, file_name=None, status=None, company_name=None,
+                         created_after=None, created_before=None):
+        docs = sorted(
+            ({'file_hash': file_hash, **doc} for file_hash, doc in self.docs.items()
+             if (not file_name or file_name in doc.get('aliases', []))
+             and (not status or doc.get('status') == status)
+             and (not company_name or doc.get('company_name') == company_name)
+             and (not created_after or doc['created_at'] >= created_after)
+             and (not created_before or doc['created_at'] < created_before)),
+            key=lambda doc: doc['created_at'],
+            reverse=True
+        )
+        if cursor:
+            hashes = [doc['file_hash'] for doc in docs]
+            if cursor not in hashes:
+                raise ValueError(f"Invalid cursor: {cursor}")
+            docs = docs[hashes.index(cursor) + 1:]
+        return docs[:limit], (docs[limit - 1]['file_hash'] if len(docs) > limit else None)
+
+    async def update_processing_status(self, file_hash, status, message, **fields):
+        self.docs.setdefault(file_hash, {}).update(
+            status=status.value if hasattr(status, "value") else status,
+            status_message=message,
+            status_updated_at=datetime.datetime.now(),
+            **fields
+        )
+
+    async def get_file_metadata(self, file_hash):
+        return self.docs.get(file_hash)
+
+    async def warm_dedup_cache(self):
+        pass
+
+
+def install_stand_ins(args, work_dir: str):
+    """Point the settings at ``work_dir`` and register the stand-ins with the service container."""
+    from backend.app.api.deps import services
+    from backend.app.services.storage import AsyncStorageService
+
+    settings.PDF_STORAGE_PATH = os.path.join(work_dir, "pdfs")
+    settings.PROCESSED_DATA_PATH = os.path.join(work_dir, "processed")
+    settings.LOADER_SINK = "sqlite"
+    settings.EMBEDDING_ENABLED = args.embeddings
+    settings.JOB_POLL_SECONDS = 0.1
+    if args.workers:
+        settings.EXTRACTION_WORKERS = args.workers
+    if not args.emulators:
+        settings.GOOGLE_CLOUD_PROJECT = settings.GOOGLE_CLOUD_PROJECT or "benchmark"
+        storage = LocalStorageService(os.path.join(work_dir, "bucket"), latency=args.storage_latency)
+        services.get("storage", lambda: AsyncStorageService(storage))
+        services.get("firestore", InMemoryFirestoreService)
+    if args.embeddings:
+        from benchmark_embeddings import SimulatedEmbeddingBackend
+        from backend.app.services.embeddings import EmbeddingCache, EmbeddingPipeline
+        from backend.app.services.vector_index import InMemoryVectorIndex
+        from backend.app.services.vector_store import PineconeVectorStore
+
+        dimension = 256
+        services.get("embedding_pipeline", lambda: EmbeddingPipeline(
+            SimulatedEmbeddingBackend(dimension, args.embedding_latency),
+            PineconeVectorStore(InMemoryVectorIndex(dimension)),
+            EmbeddingCache(os.path.join(settings.PROCESSED_DATA_PATH, "embedding_cache.sqlite"))
+        ))
+
+
+# --- Measurements ----------------------------------------------------------
+
+
+class MemorySampler:
+    """Peak RSS of this process, and of it plus its worker processes, sampled from /proc."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_total = 0
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self, pid) -> int:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except (OSError, IndexError, ValueError):
+            return 0
+
+    async def run(self):
+        while True:
+            total = self._rss("self") + sum(self._rss(child.pid) for child in multiprocessing.active_children())
+            self.peak_total = max(self.peak_total, total)
+            await asyncio.sleep(self.interval)
+
+    def result(self) -> dict:
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        return {
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6,
+            'peak_rss_with_workers_mb': self.peak_total / 1e6 or None,
+        }
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {}
+    p50, p90, p99 = np.percentile(np.asarray(samples) * 1000, [50, 90, 99])
+    return {'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': max(samples) * 1000}
+
+
+async def upload_corpus(client, corpus, concurrency: int, stream: bool = False) -> dict:
+    """Upload every file; a 429 or 503 is retried after a short pause and counted."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, hashes, outcomes = [], [], {}
+
+    async def upload(path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        async with semaphore:
+            while True:
+                started = time.perf_counter()
+                if stream:
+                    response = await client.post(
+                        "/api/v1/pdf/upload/stream", params={'file_name': os.path.basename(path)},
+                        content=data, headers={'content-type': "application/pdf"}
+                    )
+                else:
+                    response = await client.post(
+                        "/api/v1/pdf/upload/", files={'file': (os.path.basename(path), data, "application/pdf")}
+                    )
+                outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+                if response.status_code not in (429, 503):
+                    break
+                await asyncio.sleep(0.2)
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - started)
+            hashes.append(response.json()['file_hash'])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(path) for path, _ in corpus))
+    elapsed = time.perf_counter() - started
+    return {
+        'hashes': hashes,
+        'result': {
+            **percentiles(latencies),
+            'uploads_per_second': len(latencies) / elapsed,
+            'status_codes': {str(code): count for code, count in sorted(outcomes.items())},
+        },
+    }
+
+
+async def wait_for_pipeline(firestore_service, hashes, timeout: float) -> dict:
+    pending = set(hashes)
+    statuses = {}
+    deadline = time.perf_counter() + timeout
+    while pending and time.perf_counter() < deadline:
+        for file_hash, doc in (await firestore_service.get_many_file_metadata(list(pending))).items():
+            if doc.get('status') in ("done", "failed"):
+                statuses[file_hash] = doc
+                pending.discard(file_hash)
+        await asyncio.sleep(0.1)
+    return {
+        'done': sum(doc['status'] == "done" for doc in statuses.values()),
+        'failed': sum(doc['status'] == "failed" for doc in statuses.values()),
+        'timed_out': len(pending),
+        'pages': sum(doc.get('page_count') or 0 for doc in statuses.values()),
+    }
+
+
+async def run_pipeline(args, corpus) -> dict:
+    import httpx
+    from backend.app.api.deps import get_firestore_service, services
+    from backend.app.main import app
+    from backend.app.utils.concurrency import shutdown_io_executor
+
+    sampler = MemorySampler()
+    sampling = asyncio.create_task(sampler.run())
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=600) as client:
+            started = time.perf_counter()
+            uploads = await upload_corpus(client, corpus, args.concurrency, args.stream_uploads)
+            pipeline = await wait_for_pipeline(await get_firestore_service(), uploads['hashes'], args.timeout)
+            elapsed = time.perf_counter() - started
+    finally:
+        await services.shutdown()
+        shutdown_io_executor()
+        sampling.cancel()
+    return {
+        'upload': uploads['result'],
+        'pipeline': {
+            **pipeline,
+            'seconds': elapsed,
+            'documents_per_second': pipeline['done'] / elapsed,
+            'pages_per_second': pipeline['pages'] / elapsed,
+        },
+        'memory': sampler.result(),
+    }
+
+
+def measure_cold_start(runs: int) -> dict:
+    from benchmark_cold_start import time_first_health, time_import
+
+    imports = [time_import()['seconds'] for _ in range(runs)]
+    health = [time_first_health() for _ in range(runs)]
+    return {
+        'import_ms': statistics.median(imports) * 1000,
+        'first_health_ms': statistics.median(health) * 1000,
+    }
+
+
+# --- Results ---------------------------------------------------------------
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict):
+    print(f"\nChange against {baseline['commit']} ({baseline['timestamp']}):")
+    before = flatten(baseline['results'])
+    for name, value in flatten(current['results']).items():
+        if before.get(name):
+            print(f"  {name:<42} {before[name]:>12,.2f} -> {value:>12,.2f}  ({(value / before[name] - 1) * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--pages", type=int, nargs=2, default=[4, 12], metavar=("MIN", "MAX"))
+    parser.add_argument("--concurrency", type=int, default=8, help="Uploads in flight")
+    parser.add_argument("--stream-uploads", action="store_true", help="Send raw bodies to /upload/stream")
+    parser.add_argument("--workers", type=int, help="Extraction processes (default: EXTRACTION_WORKERS)")
+    parser.add_argument("--no-embeddings", dest="embeddings", action="store_false", help="Skip the embed stage")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="Seconds per simulated request")
+    parser.add_argument("--storage-latency", type=float, default=0.0, help="Seconds per simulated GCS chunk")
+    parser.add_argument("--emulators", action="store_true", help="Use the GCS/Firestore emulators from the env")
+    parser.add_argument("--cold-start-runs", type=int, default=3, help="0 to skip")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds to wait for the pipeline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--baseline", help="Result file to compare with (default: the last run with this config)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        corpus_dir = os.path.join(work_dir, "corpus")
+        os.makedirs(corpus_dir)
+        corpus = make_corpus(corpus_dir, args.documents, args.pages[0], args.pages[1], args.seed)
+        corpus_bytes = sum(os.path.getsize(path) for path, _ in corpus)
+        print(f"\n🔄 {len(corpus)} PDFs, {sum(pages for _, pages in corpus)} pages, "
+              f"{corpus_bytes / 1e6:,.1f} MB, {args.concurrency} uploads in flight")
+        install_stand_ins(args, work_dir)
+        results = asyncio.run(run_pipeline(args, corpus))
+    if args.cold_start_runs:
+        results['cold_start'] = measure_cold_start(args.cold_start_runs)
+
+    record = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec="seconds"),
+        'config': {key: value for key, value in vars(args).items() if key not in ("output_dir", "baseline")},
+        'results': results,
+    }
+    print(json.dumps(results, indent=2))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    previous = sorted(glob.glob(os.path.join(args.output_dir, "*.json")), reverse=True)
+    output_path = os.path.join(
+        args.output_dir, f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{record['commit']}.json"
+    )
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    print(f"\n📄 Results written to {output_path}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    for path in previous:
+        # Only runs with the same configuration are comparable
+        with open(path, encoding="utf-8") as f:
+            candidate = json.load(f)
+        if baseline is None and candidate['config'] == record['config']:
+            baseline = candidate
+    if baseline is not None:
+        compare(record, baseline)
+
+
+if __name__ == "__main__":
+    main()
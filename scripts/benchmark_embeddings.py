@@ -0,0 +1,112 @@
+"""
+Throughput benchmark for the batched, cached embedding pipeline.
+
+Uses a simulated embedding API (fixed latency per request) or a local
+sentence-transformers model, and the in-memory index stand-in, so it runs
+without OpenAI or Pinecone. The second pass over the same corpus shows the
+effect of the persistent embedding cache.
+
+    python scripts/benchmark_embeddings.py --chunks 20000 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.embeddings import (
+    Chunk, EmbeddingBackend, EmbeddingCache, EmbeddingPipeline, SentenceTransformerBackend
+)
+from backend.app.services.vector_index import InMemoryVectorIndex
+
+
+class SimulatedEmbeddingBackend(EmbeddingBackend):
+    """Deterministic pseudo-embeddings with a fixed per-request latency."""
+
+    model_name = "simulated"
+
+    def __init__(self, dimension: int, latency: float):
+        self.dimension = dimension
+        self.latency = latency
+        self.requests = 0
+
+    async def embed(self, texts):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        seeds = [int(hashlib.sha256(text.encode()).hexdigest()[:8], 16) for text in texts]
+        return np.stack([
+            np.random.default_rng(seed).standard_normal(self.dimension, dtype=np.float32)
+            for seed in seeds
+        ])
+
+
+def make_chunks(count: int, duplicate_ratio: float):
+    """Synthetic chunks where a share of the texts is repeated boilerplate."""
+    rng = np.random.default_rng(0)
+    boilerplate = [f"Boilerplate disclosure paragraph {i}" for i in range(50)]
+    chunks = []
+    for i in range(count):
+        if rng.random() < duplicate_ratio:
+            text = boilerplate[i % len(boilerplate)]
+        else:
+            text = f"Line item {i}: revenue {rng.integers(1e6)} expense {rng.integers(1e6)}"
+        content_hash = hashlib.sha256(text.encode()).hexdigest()
+        chunks.append(Chunk(f"doc-{i}", text, content_hash, {'text': text}))
+    return chunks
+
+
+async def run(backend, chunks, concurrency: int, batch_size: int, cache_path: str):
+    index = InMemoryVectorIndex(dimension=backend.dimension)
+    cache = EmbeddingCache(cache_path)
+    pipeline = EmbeddingPipeline(
+        backend, index, cache,
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+        upsert_concurrency=concurrency
+    )
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        await pipeline.index_chunks(chunks)
+        timings.append(time.perf_counter() - start)
+    cache.close()
+    return timings, pipeline.embedded_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per simulated API request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--model", help="Use this sentence-transformers model instead of the simulated API")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.duplicate_ratio)
+    unique = len({chunk.content_hash for chunk in chunks})
+    print(f"\n🔄 {len(chunks)} chunks ({unique} unique), batch size {args.batch_size}")
+    print("-" * 50)
+    for concurrency in args.concurrency:
+        if args.model:
+            backend = SentenceTransformerBackend(args.model)
+        else:
+            backend = SimulatedEmbeddingBackend(1536, args.latency)
+        with tempfile.TemporaryDirectory() as tmp:
+            (cold, warm), embedded = asyncio.run(
+                run(backend, chunks, concurrency, args.batch_size, os.path.join(tmp, "cache.sqlite"))
+            )
+        print(
+            f"concurrency={concurrency:>2}  cold {len(chunks) / cold:9.0f} chunks/s"
+            f"  cached {len(chunks) / warm:9.0f} chunks/s  embedded {embedded}"
+        )
+
+
+if __name__ == "__main__":
+    main()
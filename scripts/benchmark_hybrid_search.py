@@ -0,0 +1,121 @@
+"""
+Recall/latency benchmark for hybrid (BM25 + vector) search.
+
+Builds a LocalVectorStore and a BM25Index over a synthetic corpus of
+chunks: each has a topic (a cluster of embeddings and of words) and a
+unique account number. Two query sets are run, each with one relevant
+chunk: "semantic" queries whose embedding is close to the chunk's and
+whose words are shared by the whole topic, and "exact" queries naming the
+account number, whose embedding only knows the topic. Vector-only,
+BM25-only, hybrid and hybrid with a lexical prefilter are compared.
+
+    python scripts/benchmark_hybrid_search.py --documents 10000 --queries 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.lexical_index import BM25Index
+from backend.app.services.search import HybridSearch
+from backend.app.services.vector_store import LocalVectorStore
+
+COMMON_WORDS = "the of and total net for year ended in thousands as at group company".split()
+TOPICS = 64
+TOPIC_WORDS = 12
+
+
+def make_corpus(count: int, dimension: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((TOPICS, dimension), dtype=np.float32)
+    labels = rng.integers(0, TOPICS, count)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((count, dimension), dtype=np.float32)
+    topic_words = [[f"term{topic}x{word}" for word in range(TOPIC_WORDS)] for topic in range(TOPICS)]
+    texts = []
+    for i, label in enumerate(labels):
+        words = list(rng.choice(topic_words[label], 20)) + list(rng.choice(COMMON_WORDS, 40))
+        words.insert(int(rng.integers(0, len(words))), f"{4000 + i % 900}-{i:05d}")
+        texts.append(" ".join(words))
+    return rng, centers, labels, vectors, topic_words, texts
+
+
+def make_queries(rng, centers, labels, vectors, topic_words, count: int):
+    targets = rng.choice(len(vectors), count, replace=False)
+    semantic, exact = [], []
+    for target in targets:
+        label = labels[target]
+        embedding = vectors[target] + 0.1 * rng.standard_normal(vectors.shape[1], dtype=np.float32)
+        semantic.append((" ".join(rng.choice(topic_words[label], 3)), embedding, str(target)))
+        embedding = centers[label] + 0.5 * rng.standard_normal(vectors.shape[1], dtype=np.float32)
+        exact.append((f"balance of account {4000 + target % 900}-{target:05d}", embedding, str(target)))
+    return semantic, exact
+
+
+def run(search, queries, top_k: int):
+    latencies, hits = [], 0
+    for text, embedding, target in queries:
+        started = time.perf_counter()
+        matches = search(text, embedding, top_k)
+        latencies.append(time.perf_counter() - started)
+        hits += any(match.id == target for match in matches)
+    return hits / len(queries), latencies
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200, help="Queries per query set")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--prefilter", type=int, default=500, help="BM25 candidates scored by the prefiltered run")
+    args = parser.parse_args()
+
+    rng, centers, labels, vectors, topic_words, texts = make_corpus(args.documents, args.dimension)
+    query_sets = make_queries(rng, centers, labels, vectors, topic_words, args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalVectorStore(os.path.join(tmp, "vectors"), dimension=args.dimension)
+        lexical = BM25Index(os.path.join(tmp, "lexical"))
+        started = time.perf_counter()
+        for start in range(0, args.documents, 5000):
+            rows = range(start, min(start + 5000, args.documents))
+            store.upsert([(str(i), vectors[i], {}) for i in rows])
+            lexical.add((str(i), texts[i], {}) for i in rows)
+        lexical.flush()
+        lexical = BM25Index(lexical.path)  # Search the memory-mapped postings
+        index_ms = (time.perf_counter() - started) * 1000
+        size = sum(
+            os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(lexical.path) for name in names
+        )
+
+        methods = {
+            "vector": lambda text, embedding, k: store.query(embedding, k),
+            "bm25": lambda text, embedding, k: lexical.search(text, k),
+            "hybrid": HybridSearch(store, lexical, prefilter_candidates=0, rrf_k=60).search,
+            f"hybrid prefilter {args.prefilter}": HybridSearch(
+                store, lexical, prefilter_candidates=args.prefilter, rrf_k=60
+            ).search,
+        }
+        print(f"\n🔎 {args.documents} chunks x {args.dimension} dims, {args.queries} queries per set, top-{args.top_k}")
+        print(f"BM25 index: {size / 1024:,.0f} KB on disk, built with the vector store in {index_ms:,.0f} ms")
+        print("-" * 96)
+        for name, search in methods.items():
+            results = [run(search, queries, args.top_k) for queries in query_sets]
+            latencies = results[0][1] + results[1][1]
+            print(
+                f"{name:<24} p50 {percentile_ms(latencies, 50):7.3f} ms  p99 {percentile_ms(latencies, 99):7.3f} ms"
+                f"  recall@{args.top_k} semantic {results[0][0]:.3f}  exact {results[1][0]:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Ingestion throughput benchmark for the bulk report loader.
+
+Loads synthetic financial_reports rows into the local SQLite sink through
+BulkLoader at several batch sizes (batch size 1 is the row-by-row baseline)
+and times NDJSON vs Parquet serialization of one load-job batch. The
+Parquet batch is checked against the column types BigQuery's staging
+table declares (scripts/setup_gcp.py).
+
+    python scripts/benchmark_loader.py --rows 20000 --batch-sizes 1 100 1000 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.bigquery_loader import BulkLoader, SQLiteSink, serialize_rows
+
+# financial_reports as created by scripts/setup_gcp.py
+SCHEMA = {
+    'report_id': 'STRING',
+    'report_date': 'DATE',
+    'report_type': 'STRING',
+    'company_name': 'STRING',
+    'extracted_data': 'JSON',
+    'upload_timestamp': 'TIMESTAMP',
+    'source_file_path': 'STRING',
+}
+# Parquet physical/logical types a BigQuery load accepts for each staged column
+EXPECTED_PARQUET_TYPES = {
+    'STRING': "string",
+    'JSON': "string",
+    'DATE': "date32[day]",
+    'TIMESTAMP': "timestamp[us, tz=UTC]",
+}
+
+
+def make_rows(count: int):
+    base = date(2024, 1, 1)
+    return [
+        {
+            'report_id': f"{i:064x}",
+            'report_date': base + timedelta(days=i % 365),
+            'report_type': None,  # Not set on uploads; the column must still be typed
+            'company_name': f"Company {i % 50}",
+            'extracted_data': {'page_count': 40, 'tables': [{'page_number': 1, 'tables': [[["Revenue", f"{i * 1000:,}"]]]}]},
+            'upload_timestamp': datetime(2024, 9, 1, 12, 0, 0),
+            'source_file_path': f"uploads/2024/09/01/{i:064x}/report.pdf",
+        }
+        for i in range(count)
+    ]
+
+
+def check_parquet(rows):
+    """Fail unless a Parquet batch has the staging table's column types and round-trips its values."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(serialize_rows(rows, "PARQUET", SCHEMA))
+    for name, field_type in SCHEMA.items():
+        actual = str(table.schema.field(name).type)
+        assert actual == EXPECTED_PARQUET_TYPES[field_type], f"{name}: {actual} for a {field_type} column"
+    first = table.slice(0, 1).to_pylist()[0]
+    assert first['report_date'] == rows[0]['report_date']
+    assert first['upload_timestamp'].replace(tzinfo=None) == rows[0]['upload_timestamp']
+    assert first['extracted_data'].startswith('{"page_count"')
+
+
+async def load(rows, batch_size: int, path: str) -> float:
+    sink = SQLiteSink(path)
+    loader = BulkLoader(sink, 'financial_reports', max_rows=batch_size, flush_interval=3600)
+    start = time.perf_counter()
+    for row in rows:
+        await loader.add(row)
+    await loader.flush()
+    # Replaying the same rows must not create duplicates
+    await loader.add_many(rows[:batch_size])
+    await loader.flush()
+    elapsed = time.perf_counter() - start
+    assert sink.count('financial_reports') == len(rows)
+    sink.close()
+    return len(rows) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    print(f"\n🔄 Loading {args.rows} rows into the SQLite sink")
+    print("-" * 50)
+    for batch_size in args.batch_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows_per_sec = asyncio.run(load(rows, batch_size, os.path.join(tmp, "reports.sqlite")))
+        print(f"batch={batch_size:>6}  {rows_per_sec:10.0f} rows/s")
+
+    batch = rows[:max(args.batch_sizes)]
+    check_parquet(batch)
+    print("Parquet batch matches the financial_reports staging types")
+    for source_format in ("NEWLINE_DELIMITED_JSON", "PARQUET"):
+        start = time.perf_counter()
+        size = len(serialize_rows(batch, source_format, SCHEMA).getvalue())
+        elapsed = time.perf_counter() - start
+        print(f"{source_format:<24} {len(batch) / elapsed:10.0f} rows/s  {size / len(batch):6.0f} bytes/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Read-latency benchmark for the memory-mapped processed report store.
+
+Extracts a PDF (the first test PDF by default) into a temporary store,
+then times random page reads, whole-report reads and table reads from the
+store against scanning ``pages.jsonl`` and re-parsing the PDF.
+
+    python scripts/benchmark_report_store.py --reads 2000
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.extraction import extract_page_range, extract_to_jsonl
+from backend.app.services.report_store import ReportStore
+from backend.app.services.tables import table_values, write_tables
+
+DEFAULT_PDFS = os.path.join(os.path.dirname(__file__), "..", "data", "test", "pdfs", "*.pdf")
+
+
+def timed(function, samples) -> np.ndarray:
+    """Per-call latencies in microseconds."""
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        function(sample)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return np.asarray(latencies)
+
+
+def report(name: str, latencies: np.ndarray):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name:<28} p50 {p50:>12,.1f} µs   p99 {p99:>12,.1f} µs   ({len(latencies)} calls)")
+
+
+def scan_jsonl(pages_path: str, page_number: int) -> str:
+    with open(pages_path, encoding="utf-8") as f:
+        for line in f:
+            page = json.loads(line)
+            if page['page_number'] == page_number:
+                return page['text']
+
+
+def load_jsonl(pages_path: str) -> list:
+    with open(pages_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("pdf", nargs="?", help="PDF to extract (default: first of data/test/pdfs)")
+    parser.add_argument("--reads", type=int, default=2000, help="Random page reads per method")
+    parser.add_argument("--reparse-reads", type=int, default=20, help="Random pages re-parsed with pdfplumber")
+    args = parser.parse_args()
+
+    pdf_path = args.pdf or sorted(glob.glob(DEFAULT_PDFS))[0]
+    with open(pdf_path, "rb") as f:
+        file_hash = hashlib.sha256(f.read()).hexdigest()
+
+    with tempfile.TemporaryDirectory() as tmp, ProcessPoolExecutor() as executor:
+        store = ReportStore(tmp)
+        os.makedirs(store.report_dir(file_hash))
+        page_count = extract_to_jsonl(pdf_path, store.pages_path(file_hash), executor).page_count
+        write_tables(store.pages_path(file_hash), store.tables_path(file_hash))
+        built = store.build(file_hash)
+        print(f"\n📚 {os.path.basename(pdf_path)}: {page_count} pages, {built / 1024:,.0f} KB text index")
+        print("-" * 90)
+
+        rng = random.Random(0)
+        pages = [rng.randint(1, page_count) for _ in range(args.reads)]
+        report("store open (cold)", timed(lambda _: ReportStore(tmp).open(file_hash), range(50)))
+        opened = store.open(file_hash)
+        report("store page_bytes (0-copy)", timed(opened.page_bytes, pages))
+        report("store page_text", timed(opened.page_text, pages))
+        report("store open + page_text", timed(lambda page: store.open(file_hash).page_text(page), pages))
+        report("pages.jsonl scan", timed(lambda page: scan_jsonl(store.pages_path(file_hash), page), pages[:200]))
+        report(
+            "re-parse page (pdfplumber)",
+            timed(lambda page: extract_page_range(pdf_path, page - 1, page), pages[:args.reparse_reads])
+        )
+
+        print()
+        report("store all pages", timed(lambda _: list(opened.pages()), range(50)))
+        report("store all chunks", timed(lambda _: list(opened.chunks()), range(50)))
+        report("pages.jsonl all pages", timed(lambda _: load_jsonl(store.pages_path(file_hash)), range(20)))
+        report("re-parse all pages", timed(lambda _: extract_page_range(pdf_path, 0, page_count), range(1)))
+
+        print()
+        report("store tables (mmap Parquet)", timed(lambda _: opened.tables(), range(50)))
+        report(
+            "re-normalize tables",
+            timed(lambda _: table_values(load_jsonl(store.pages_path(file_hash))), range(5))
+        )
+
+
+if __name__ == "__main__":
+    main()
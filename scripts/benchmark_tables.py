@@ -0,0 +1,142 @@
+"""
+Benchmark for table normalization on a 500-page book.
+
+Extracts the test corpus once (or reads an existing ``pages.jsonl``),
+repeats its pages up to ``--pages`` to build a book, then normalizes every
+table with the vectorized table_values and with a per-token Python loop as
+the baseline. Also times writing and reading the result as Parquet.
+
+    python scripts/benchmark_tables.py --pages 500
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.extraction import extract_to_jsonl
+from backend.app.services.tables import read_tables, table_frames, table_values
+from backend.app.utils.numeric import (
+    _SCALE_PATTERN, AMOUNT_TOKEN, DASH_TOKEN, PERCENT_TOKEN, SCALE_FACTORS, YEAR_TOKEN
+)
+
+DEFAULT_PDFS = os.path.join(os.path.dirname(__file__), "..", "data", "test", "pdfs", "*.pdf")
+
+
+def load_source_pages(args, tmp: str) -> list:
+    paths = [args.pages_jsonl] if args.pages_jsonl else []
+    if not paths:
+        with ProcessPoolExecutor() as executor:
+            for i, pdf_path in enumerate(sorted(glob.glob(DEFAULT_PDFS))):
+                paths.append(os.path.join(tmp, f"{i}.jsonl"))
+                extract_to_jsonl(pdf_path, paths[-1], executor)
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.extend(json.loads(line) for line in f)
+    return pages
+
+
+def make_book(source: list, page_count: int) -> list:
+    return [
+        {**source[i % len(source)], 'page_number': i + 1}
+        for i in range(page_count)
+    ]
+
+
+def normalize_loop(pages: list) -> list:
+    """Baseline: the same normalization with a regex match and float() per token."""
+    amount, percent, dash, year = (
+        re.compile(pattern) for pattern in (AMOUNT_TOKEN, PERCENT_TOKEN, DASH_TOKEN, YEAR_TOKEN)
+    )
+    scale_pattern = re.compile(_SCALE_PATTERN)
+
+    def scale_of(texts):
+        for text in texts:
+            match = scale_pattern.search(text or "")
+            if match:
+                return SCALE_FACTORS[next(unit for unit in match.groups() if unit).lower()]
+        return None
+
+    def number(token):
+        negative = token.startswith("(") or token.endswith(("-", "−")) or token.lstrip("($€£").startswith(("-", "−"))
+        value = float(re.sub(r"[^\d.]", "", token))
+        return -value if negative else value
+
+    rows = []
+    for page in pages:
+        page_scale = scale_of([page.get('text', "")])
+        for table_index, table in enumerate(page.get('tables') or []):
+            scale = scale_of(cell for row in table for cell in row) or page_scale or 1.0
+            for row_index, row in enumerate(table):
+                tokens = [token for cell in row if cell for token in cell.split()]
+                numbers = [t for t in tokens if dash.match(t) or amount.match(t) or percent.match(t)]
+                if not numbers or all(dash.match(t) for t in numbers):
+                    continue
+                label = " ".join(t for t in tokens if t not in numbers)
+                header = all(year.match(t) for t in numbers)
+                for column, token in enumerate(numbers):
+                    if percent.match(token):
+                        rows.append((page['page_number'], table_index, row_index, column, label, token,
+                                     "percent", number(token.replace("%", "")), 1.0))
+                    elif header:
+                        rows.append((page['page_number'], table_index, row_index, column, label, token,
+                                     "year", float(token), 1.0))
+                    else:
+                        value = 0.0 if dash.match(token) else number(token)
+                        rows.append((page['page_number'], table_index, row_index, column, label, token,
+                                     "amount", value * scale, scale))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--pages-jsonl", help="Use already extracted pages instead of the test corpus")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        book = make_book(load_source_pages(args, tmp), args.pages)
+        cells = sum(len(row) for page in book for table in page.get('tables') or [] for row in table)
+        print(f"\n📊 Normalizing the tables of a {len(book)}-page book ({cells} cells)")
+        print("-" * 60)
+
+        start = time.perf_counter()
+        values = table_values(book)
+        vectorized = time.perf_counter() - start
+        print(f"vectorized   {vectorized:8.3f}s  {len(book) / vectorized:8.0f} pages/s  {len(values)} values")
+
+        start = time.perf_counter()
+        looped = normalize_loop(book)
+        loop = time.perf_counter() - start
+        print(f"python loop  {loop:8.3f}s  {len(book) / loop:8.0f} pages/s  {len(looped)} values")
+        print(f"speedup      {loop / vectorized:8.1f}x")
+        mismatched = (values["value"].to_numpy() != [row[7] for row in looped]).sum() if len(looped) == len(values) else "n/a"
+        print(f"mismatched values: {mismatched}")
+
+        start = time.perf_counter()
+        frames = table_frames(values)
+        print(f"table frames {time.perf_counter() - start:8.3f}s  {len(frames)} DataFrames")
+
+        parquet_path = os.path.join(tmp, "tables.parquet")
+        start = time.perf_counter()
+        values.to_parquet(parquet_path, index=False)
+        written = time.perf_counter() - start
+        start = time.perf_counter()
+        read_tables(parquet_path)
+        read = time.perf_counter() - start
+        json_size = len(values.to_json(orient="records"))
+        print(
+            f"parquet      write {written * 1000:.0f} ms, read {read * 1000:.0f} ms, "
+            f"{os.path.getsize(parquet_path) / 1024:.0f} KB (JSON records: {json_size / 1024:.0f} KB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
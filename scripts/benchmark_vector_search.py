@@ -0,0 +1,114 @@
+"""
+Recall/latency benchmark for the local vector store against brute force.
+
+Builds a LocalVectorStore (float32 and int8) over synthetic clustered
+embeddings and compares its top-k against an exact full-sort search, both
+unfiltered and with the company / report date prefilter the query API
+applies (against a full sort of the matching vectors).
+
+    python scripts/benchmark_vector_search.py --vectors 50000 --queries 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from datetime import date
+
+from backend.app.services.query import document_filter
+from backend.app.services.vector_store import LocalVectorStore
+
+COMPANIES = ["acme", "globex", "initech", "umbrella"]
+REPORT_DATES = [date(2020 + year, 12, 31) for year in range(5)]
+
+
+def document_of(i: int) -> dict:
+    """The document fields the pipeline copies into chunk metadata, as the API receives them."""
+    return {'company_name': COMPANIES[i % len(COMPANIES)], 'report_date': REPORT_DATES[i // 7 % len(REPORT_DATES)]}
+
+
+def make_data(count: int, dimension: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((64, dimension), dtype=np.float32)
+    labels = rng.integers(0, len(centers), count)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((count, dimension), dtype=np.float32)
+    query_labels = rng.integers(0, len(centers), queries)
+    query_vectors = centers[query_labels] + 0.5 * rng.standard_normal((queries, dimension), dtype=np.float32)
+    return vectors, query_vectors
+
+
+def brute_force(vectors: np.ndarray, queries: np.ndarray, top_k: int):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normalized.T
+    return np.argsort(-scores, axis=1)[:, :top_k]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def run(store: LocalVectorStore, queries: np.ndarray, expected: np.ndarray, top_k: int, batch: int, filter=None):
+    latencies = []
+    hits = 0
+    for start in range(0, len(queries), batch):
+        query_batch = queries[start:start + batch]
+        started = time.perf_counter()
+        results = store.query_batch(query_batch, top_k=top_k, filter=filter)
+        latencies.append((time.perf_counter() - started) / len(query_batch))
+        for matches, truth in zip(results, expected[start:start + batch]):
+            hits += len({int(match.id) for match in matches} & set(truth.tolist()))
+    return hits / expected.size, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=1, help="Queries scored per call")
+    args = parser.parse_args()
+
+    vectors, queries = make_data(args.vectors, args.dimension, args.queries)
+    started = time.perf_counter()
+    expected = brute_force(vectors, queries, args.top_k)
+    brute_ms = (time.perf_counter() - started) / len(queries) * 1000
+    selected = document_of(0)
+    filter = document_filter(**selected)
+    subset = np.asarray([i for i in range(len(vectors)) if document_of(i) == selected])
+    expected_filtered = subset[brute_force(vectors[subset], queries, args.top_k)]
+
+    print(f"\n🔄 {args.vectors} x {args.dimension} vectors, {args.queries} queries, top-{args.top_k}")
+    print("-" * 50)
+    print(f"brute force        {brute_ms:8.3f} ms/query (full sort)")
+    for quantize in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = LocalVectorStore(tmp, dimension=args.dimension, quantize=quantize)
+            for start in range(0, len(vectors), 5000):
+                store.upsert([
+                    (str(i), vectors[i], document_filter(**document_of(i)))
+                    for i in range(start, min(start + 5000, len(vectors)))
+                ])
+            recall, latencies = run(store, queries, expected, args.top_k, args.batch)
+            filtered_recall, filtered_latencies = run(
+                store, queries, expected_filtered, args.top_k, args.batch, filter=filter
+            )
+        label = "local int8" if quantize else "local float32"
+        print(
+            f"{label:<18} p50 {percentile_ms(latencies, 50):7.3f} ms  p99 {percentile_ms(latencies, 99):7.3f} ms"
+            f"  recall@{args.top_k} {recall:.3f}"
+        )
+        print(
+            f"{'  + prefilter':<18} p50 {percentile_ms(filtered_latencies, 50):7.3f} ms"
+            f"  p99 {percentile_ms(filtered_latencies, 99):7.3f} ms  recall@{args.top_k} {filtered_recall:.3f}"
+            f"  ({len(subset)} of {len(vectors)} vectors match)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,35 @@
 from google.cloud import storage, bigquery
 import os
+import sys
+import uuid
+from datetime import date, datetime
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend.app.services.bigquery_loader import serialize_rows, staging_schema
+
+
+def verify_parquet_load(client, dataset: str):
+    """Load one Parquet row into a scratch table typed like the loader's staging tables."""
+    schema = client.get_table(f"{dataset}.financial_reports").schema
+    row = {
+        'report_id': "verify",
+        'report_date': date.today(),
+        'report_type': None,
+        'company_name': "Verify",
+        'extracted_data': {'page_count': 1, 'tables': []},
+        'upload_timestamp': datetime.now(),
+        'source_file_path': "verify.pdf",
+    }
+    buffer = serialize_rows([row], "PARQUET", {field.name: field.field_type for field in schema})
+    table = f"{dataset}._verify_parquet_{uuid.uuid4().hex}"
+    job_config = bigquery.LoadJobConfig(source_format="PARQUET", schema=staging_schema(schema))
+    try:
+        client.load_table_from_file(buffer, table, job_config=job_config).result()
+    finally:
+        client.delete_table(table, not_found_ok=True)
+
 def verify_gcp_setup():
     load_dotenv()
     
@@ -32,6 +60,12 @@ def verify_gcp_setup():
         bigquery_client = bigquery.Client()
         datasets = list(bigquery_client.list_datasets(max_results=1))
         print("✅ Successfully connected to BigQuery")
+
+        # Test that loader Parquet batches match the staging column types
+        verify_parquet_load(
+            bigquery_client, f"{os.getenv('GOOGLE_CLOUD_PROJECT')}.{os.getenv('BIGQUERY_DATASET')}"
+        )
+        print("✅ Parquet batch loaded into a typed staging table")
         
     except Exception as e:
         print(f"❌ Error testing GCP access: {str(e)}")
@@ -1,39 +1,52 @@
-from google.cloud import storage
+from google.cloud import firestore
 from google.oauth2 import service_account
 import os
 from dotenv import load_dotenv
 
+PAGE_SIZE = 200
+
 def list_uploaded_files():
-    """List all uploaded PDFs in the GCS bucket."""
+    """List all uploaded PDFs from the Firestore file index."""
     load_dotenv()
-    
-    print("\n🔍 Checking uploaded files in GCS...")
-    
-    # Load credentials
-    credentials = service_account.Credentials.from_service_account_file(
-        os.getenv('GOOGLE_APPLICATION_CREDENTIALS'),
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    
+
+    print("\n🔍 Checking uploaded files in the file index...")
+
+    # Load credentials, falling back to application default credentials
+    credentials = None
+    if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
+        credentials = service_account.Credentials.from_service_account_file(
+            os.getenv('GOOGLE_APPLICATION_CREDENTIALS'),
+            scopes=["https://www.googleapis.com/auth/cloud-platform"]
+        )
+
     # Initialize client
-    storage_client = storage.Client(
+    db = firestore.Client(
         credentials=credentials,
         project=os.getenv('GOOGLE_CLOUD_PROJECT')
     )
-    
-    bucket = storage_client.bucket(os.getenv('GCP_STORAGE_BUCKET'))
-    
-    # List all files in the uploads directory
-    blobs = bucket.list_blobs(prefix='uploads/')
-    
+
+    # Page through the index instead of listing every object in the bucket
+    query = db.collection('pdf_files').order_by('created_at', direction=firestore.Query.DESCENDING)
+    last = None
+
     print("\nUploaded files:")
     print("-" * 50)
-    for blob in blobs:
-        print(f"📄 Path: {blob.name}")
-        print(f"   Size: {blob.size // 1024} KB")
-        print(f"   Created: {blob.time_created}")
-        print(f"   URL: {blob.public_url}")
-        print("-" * 50)
+    while True:
+        page = query.start_after(last) if last else query
+        docs = list(page.limit(PAGE_SIZE).stream())
+        for doc in docs:
+            metadata = doc.to_dict()
+            print(f"📄 Name: {metadata.get('file_name')}")
+            if len(metadata.get('aliases', [])) > 1:
+                print(f"   Also uploaded as: {', '.join(metadata['aliases'][1:])}")
+            print(f"   Path: {metadata.get('storage_path')}")
+            print(f"   Size: {(metadata.get('file_size') or 0) // 1024} KB")
+            print(f"   Created: {metadata.get('created_at')}")
+            print(f"   Status: {metadata.get('status')}")
+            print("-" * 50)
+        if len(docs) < PAGE_SIZE:
+            break
+        last = docs[-1]
 
 if __name__ == "__main__":
-    list_uploaded_files() 
\ No newline at end of file
+    list_uploaded_files()